@@ -1,10 +1,14 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from fastapi import Depends, HTTPException, status, Request
 from passlib.context import CryptContext
 from jose import JWTError, jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.core.database import get_db
+from app.core.password_pool import password_pool
+from app.core.user_cache import user_cache
 from app.models.models import User
 import os
 from dotenv import load_dotenv
@@ -14,8 +18,16 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
+# bcrypt work factor; hashes made with a different factor are replaced on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -23,6 +35,14 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """Verify on the password pool; returns (valid, new hash to store or None)"""
+    return await password_pool.run(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    """Hash on the password pool so the event loop keeps serving requests"""
+    return await password_pool.run(pwd_context.hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None, user_session_duration: Optional[int] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -35,8 +55,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None, u
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user_optional(request: Request, db: Session = Depends(get_db)) -> Optional[User]:
-    """Get current user from cookie, returns None if not authenticated"""
+def get_token_username(request: Request) -> Optional[str]:
+    """Username (`sub`) from the access_token cookie, or None if missing/invalid"""
     token = request.cookies.get("access_token")
     if not token:
         return None
@@ -52,12 +72,47 @@ def get_current_user_optional(request: Request, db: Session = Depends(get_db)) -
     except JWTError:
         return None
     
+    return username
+
+def get_current_user_optional(request: Request, db: Session = Depends(get_db)):
+    """Get a read-only snapshot of the current user from cookie, returns None if not authenticated
+    
+    Served from `user_cache`, so it may lag the database by up to USER_CACHE_TTL
+    seconds; use get_current_user/get_admin_user for writes and permission checks.
+    """
+    username = get_token_username(request)
+    if username is None:
+        return None
+    
+    snapshot = user_cache.get(username)
+    if snapshot is not None:
+        return snapshot
+    
+    version = user_cache.version(username)
     user = db.query(User).filter(User.username == username).first()
-    return user
+    return user_cache.store(username, user, version)
+
+async def get_current_user_optional_async(request: Request, db: AsyncSession):
+    """Async-session variant of get_current_user_optional for the public read paths"""
+    username = get_token_username(request)
+    if username is None:
+        return None
+    
+    snapshot = user_cache.get(username)
+    if snapshot is not None:
+        return snapshot
+    
+    version = user_cache.version(username)
+    user = await db.scalar(select(User).where(User.username == username))
+    return user_cache.store(username, user, version)
 
 def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
-    """Get current user from cookie, raises exception if not authenticated"""
-    user = get_current_user_optional(request, db)
+    """Get current user from cookie, raises exception if not authenticated
+    
+    Always loads the row, so writes and admin checks never see a cached user.
+    """
+    username = get_token_username(request)
+    user = db.query(User).filter(User.username == username).first() if username else None
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -8,8 +9,70 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./blog.db")
 
+# SQLite connection profile, applied to every new connection. WAL lets
+# readers run alongside the single writer, and busy_timeout makes writers
+# wait for the lock instead of failing with "database is locked".
+# Set SQLITE_PRAGMA_PROFILE=off to keep SQLite's defaults.
+SQLITE_PRAGMA_PROFILE = os.getenv("SQLITE_PRAGMA_PROFILE", "production").lower()
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL").upper()
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY").upper()
+
+_JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+_SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+_TEMP_STORES = {"DEFAULT", "FILE", "MEMORY"}
+
+def get_sqlite_pragmas() -> dict:
+    """Configured pragma values, in the order they are applied"""
+    if SQLITE_JOURNAL_MODE not in _JOURNAL_MODES:
+        raise ValueError(f"Invalid SQLITE_JOURNAL_MODE: {SQLITE_JOURNAL_MODE}")
+    if SQLITE_SYNCHRONOUS not in _SYNCHRONOUS_MODES:
+        raise ValueError(f"Invalid SQLITE_SYNCHRONOUS: {SQLITE_SYNCHRONOUS}")
+    if SQLITE_TEMP_STORE not in _TEMP_STORES:
+        raise ValueError(f"Invalid SQLITE_TEMP_STORE: {SQLITE_TEMP_STORE}")
+    return {
+        # busy_timeout first so the journal_mode switch itself waits for locks
+        "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+        "journal_mode": SQLITE_JOURNAL_MODE,
+        "synchronous": SQLITE_SYNCHRONOUS,
+        # Negative cache_size is in KiB rather than pages
+        "cache_size": -SQLITE_CACHE_SIZE_KB,
+        "mmap_size": SQLITE_MMAP_SIZE,
+        "temp_store": SQLITE_TEMP_STORE,
+    }
+
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+def get_async_database_url(url: str) -> str:
+    """Async driver URL for the same database (sqlite -> sqlite+aiosqlite)"""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    return url
+
+# Async engine for the public read paths; admin code keeps the sync session
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or get_async_database_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL)
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in get_sqlite_pragmas().items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+if engine.dialect.name == "sqlite" and SQLITE_PRAGMA_PROFILE != "off":
+    get_sqlite_pragmas()  # Fail fast on invalid values
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+    if async_engine.dialect.name == "sqlite":
+        event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: async sessions cannot lazily refresh attributes after a commit
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -18,4 +81,8 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
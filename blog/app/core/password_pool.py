@@ -0,0 +1,87 @@
+"""
+Bounded thread pool for password hashing.
+
+bcrypt is deliberately slow (~250ms at the default work factor) and would
+otherwise run inside `async def` handlers, stalling every request on the
+worker. Hash and verify calls run on `PASSWORD_HASH_WORKERS` dedicated
+threads (bcrypt releases the GIL while hashing). At most
+`PASSWORD_HASH_MAX_QUEUE` calls may wait for a thread; beyond that, new
+calls are rejected with 503 + Retry-After instead of piling up behind a
+login burst.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from fastapi import HTTPException, status
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "16"))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "2"))
+
+T = TypeVar("T")
+
+
+class PasswordHashPool:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.completed = 0
+        self.rejected = 0
+        self.peak_queue_depth = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Calls waiting for a thread (not yet running)"""
+        return max(0, self._pending - self.workers)
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """Run `func(*args)` on the pool, or raise 503 when the queue is full"""
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many sign-in attempts in progress, please retry shortly",
+                    headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)}
+                )
+            self._pending += 1
+            self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+            executor = self._executor
+
+        try:
+            return await asyncio.get_event_loop().run_in_executor(executor, func, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self.completed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": min(self._pending, self.workers),
+                "queue_depth": self.queue_depth,
+                "peak_queue_depth": self.peak_queue_depth,
+                "completed": self.completed,
+                "rejected": self.rejected
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+# Singleton instance
+password_pool = PasswordHashPool()
@@ -0,0 +1,101 @@
+"""
+Process-wide Settings snapshot cache.
+
+Settings is read on nearly every request (template context, timezone
+formatting, comment limits). The snapshot is loaded once per process and
+revalidated against `settings.updated_at` at most every
+`SETTINGS_CACHE_CHECK_INTERVAL` seconds, so a save in one uvicorn worker is
+picked up by the others without a full row load per request.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Optional
+
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.models.models import Settings
+
+SETTINGS_CACHE_CHECK_INTERVAL = float(os.getenv("SETTINGS_CACHE_CHECK_INTERVAL", "2"))
+
+
+class SettingsCache:
+    def __init__(self, check_interval: float = SETTINGS_CACHE_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self.version = 0
+        self._lock = threading.Lock()
+        self._snapshot: Optional[SimpleNamespace] = None
+        self._stamp: Optional[datetime] = None
+        self._loaded = False
+        self._checked_at = 0.0
+
+    def get(self, db: Optional[Session] = None) -> Optional[SimpleNamespace]:
+        """Return the current settings snapshot, revalidating it if the check interval passed"""
+        if self._loaded and time.monotonic() - self._checked_at < self.check_interval:
+            return self._snapshot
+
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._loaded and time.monotonic() - self._checked_at < self.check_interval:
+                return self._snapshot
+
+            own_session = db is None
+            if own_session:
+                db = SessionLocal()
+            try:
+                stamp_row = db.query(Settings.id, Settings.updated_at).order_by(Settings.id).first()
+                stamp = stamp_row.updated_at if stamp_row else None
+                row_id = stamp_row.id if stamp_row else None
+                current_id = self._snapshot.id if self._snapshot is not None else None
+                if not self._loaded or stamp != self._stamp or row_id != current_id:
+                    self._store(db.query(Settings).filter(Settings.id == row_id).first() if row_id else None)
+                self._checked_at = time.monotonic()
+            except Exception as e:
+                print(f"Settings cache refresh error: {e}")
+            finally:
+                if own_session:
+                    db.close()
+
+        return self._snapshot
+
+    def publish(self, settings: Settings) -> None:
+        """Write-through: replace the snapshot with a freshly committed Settings row"""
+        with self._lock:
+            self._store(settings)
+            self._checked_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Force the next `get` to reload from the database"""
+        with self._lock:
+            self._loaded = False
+
+    @property
+    def revision(self) -> str:
+        """Stable across workers (row id + updated_at), unlike the per-process `version` counter"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return "none"
+        return f"{snapshot.id}:{self._stamp.isoformat() if self._stamp else ''}"
+
+    @staticmethod
+    def touch(settings: Settings) -> None:
+        """Stamp the row so other workers notice the change on their next check"""
+        settings.updated_at = datetime.utcnow()
+
+    def _store(self, settings: Optional[Settings]) -> None:
+        if settings is None:
+            self._snapshot = None
+            self._stamp = None
+        else:
+            values = {column.key: getattr(settings, column.key) for column in Settings.__table__.columns}
+            self._snapshot = SimpleNamespace(**values)
+            self._stamp = settings.updated_at
+        self.version += 1
+        self._loaded = True
+
+
+# Singleton instance
+settings_cache = SettingsCache()
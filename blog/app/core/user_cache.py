@@ -0,0 +1,110 @@
+"""
+Process-wide cache of authenticated-user snapshots.
+
+Every logged-in page view resolves the access_token `sub` to a user row just
+to render the header (username, avatar, admin link) and the viewer part of
+the ETag. Snapshots of that row are kept in a small LRU for at most
+`USER_CACHE_TTL` seconds. Writes in this process (admin toggle, delete,
+profile and password changes) call `invalidate`, which bumps the
+username's version so an in-flight load cannot store a pre-change row; the
+TTL bounds how long another worker can serve a stale snapshot.
+
+Snapshots are read-only and never carry the password hash. Routes that
+write to the user or check permissions (`get_current_user`,
+`get_admin_user`) always load the row from the database.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Dict, Optional, Tuple
+
+from app.models.models import User
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "1024"))
+
+# Columns copied into a snapshot; hashed_password stays out on purpose
+SNAPSHOT_FIELDS = ("id", "username", "email", "is_admin", "profile_image", "session_duration", "created_at", "updated_at")
+
+
+class UserCache:
+    def __init__(self, ttl: float = USER_CACHE_TTL, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # username -> (version, expires_at, snapshot)
+        self._entries: "OrderedDict[str, Tuple[int, float, SimpleNamespace]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def version(self, username: str) -> int:
+        """Current version for `username`; take it before loading the row and pass it to `store`"""
+        with self._lock:
+            return self._versions.get(username, 0)
+
+    def get(self, username: str) -> Optional[SimpleNamespace]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                self.misses += 1
+                return None
+            version, expires_at, snapshot = entry
+            if version != self._versions.get(username, 0) or time.monotonic() >= expires_at:
+                del self._entries[username]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return snapshot
+
+    def store(self, username: str, user: Optional[User], version: int) -> Optional[SimpleNamespace]:
+        """Snapshot `user` and cache it unless `username` was invalidated since `version` was read"""
+        if user is None:
+            return None
+        snapshot = SimpleNamespace(**{field: getattr(user, field) for field in SNAPSHOT_FIELDS})
+        if not self.enabled:
+            return snapshot
+        with self._lock:
+            if version != self._versions.get(username, 0):
+                return snapshot
+            self._entries[username] = (version, time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, username: str) -> None:
+        """Drop the snapshot for `username`; call after committing a change to that user"""
+        with self._lock:
+            self._versions[username] = self._versions.get(username, 0) + 1
+            self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            for username in self._entries:
+                self._versions[username] = self._versions.get(username, 0) + 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# Singleton instance
+user_cache = UserCache()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Float, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -34,6 +34,12 @@ class Category(Base):
 
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        # Homepage, archive and listings: published posts, newest first
+        Index("ix_posts_published_created", "is_published", "created_at"),
+        Index("ix_posts_category_published_created", "category_id", "is_published", "created_at"),
+        Index("ix_posts_author_created", "author_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(200), nullable=False)
@@ -49,6 +55,7 @@ class Post(Base):
     deleted_at = Column(DateTime(timezone=True), nullable=True)
     show_updated_date = Column(Boolean, default=True)
     reading_time = Column(Integer, nullable=True)
+    like_count = Column(Integer, default=0, server_default="0", nullable=False)  # Maintained by like_counter
     author_id = Column(Integer, ForeignKey("users.id"))
     category_id = Column(Integer, ForeignKey("categories.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -72,6 +79,10 @@ class Tag(Base):
 
 class PostTag(Base):
     __tablename__ = "post_tags"
+    __table_args__ = (
+        Index("ix_post_tags_post_tag", "post_id", "tag_id"),
+        Index("ix_post_tags_tag_post", "tag_id", "post_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     post_id = Column(Integer, ForeignKey("posts.id"))
@@ -82,6 +93,13 @@ class PostTag(Base):
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        # Thread roots of a post; the implicit trailing rowid also serves the id keyset
+        Index("ix_comments_post_thread", "post_id", "is_approved", "parent_id", "created_at"),
+        Index("ix_comments_parent_approved", "parent_id", "is_approved"),
+        Index("ix_comments_approved_created", "is_approved", "created_at"),
+        Index("ix_comments_user_id", "user_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, nullable=False)
@@ -98,6 +116,10 @@ class Comment(Base):
 
 class PostLike(Base):
     __tablename__ = "post_likes"
+    __table_args__ = (
+        UniqueConstraint("user_id", "post_id", name="uq_post_likes_user_post"),
+        Index("ix_post_likes_post_user", "post_id", "user_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -137,6 +159,16 @@ class MediaFolder(Base):
 
 class Media(Base):
     __tablename__ = "media"
+    __table_args__ = (
+        Index("ix_media_folder_created", "folder_id", "created_at"),
+        Index("ix_media_created", "created_at"),
+        Index("ix_media_file_hash", "file_hash"),
+        Index("ix_media_file_size", "file_size"),
+        # Covers the per-folder count/size GROUP BY without touching table rows
+        Index("ix_media_folder_size", "folder_id", "file_size"),
+        Index("ix_media_missing", "is_missing"),
+        Index("ix_media_blob", "blob_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String(200), nullable=False)
@@ -150,10 +182,52 @@ class Media(Base):
     width = Column(Integer, nullable=True)  # Image width
     height = Column(Integer, nullable=True)  # Image height
     file_hash = Column(String(64), nullable=True)  # SHA256 hash for duplicate detection
+    perceptual_hash = Column(String(16), nullable=True)  # 64-bit dHash (hex) for near-duplicate detection
+    is_missing = Column(Boolean, default=False, nullable=False, server_default="0")  # Set by the media scanner
+    blob_id = Column(Integer, ForeignKey("media_blobs.id"), nullable=True)  # NULL: legacy row owning its file
     folder_id = Column(Integer, ForeignKey("media_folders.id"), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     folder = relationship("MediaFolder", back_populates="media_files")
+    blob = relationship("MediaBlob", back_populates="media_files")
+    variants = relationship("MediaVariant", back_populates="media", cascade="all, delete-orphan", order_by="MediaVariant.width")
+
+class MediaBlob(Base):
+    __tablename__ = "media_blobs"
+    __table_args__ = (
+        Index("ix_media_blobs_sha256", "sha256"),
+        Index("ix_media_blobs_source_sha256", "source_sha256"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), nullable=False)  # Digest of the stored bytes
+    source_sha256 = Column(String(64), nullable=True)  # Digest as uploaded, when optimization rewrote it
+    path = Column(String(300), nullable=False, unique=True)
+    file_size = Column(Integer, nullable=False)
+    mime_type = Column(String(100), nullable=False)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    ref_count = Column(Integer, nullable=False, default=1, server_default="1")  # Media rows pointing here
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    media_files = relationship("Media", back_populates="blob")
+
+class MediaVariant(Base):
+    __tablename__ = "media_variants"
+    __table_args__ = (
+        UniqueConstraint("media_id", "width", name="uq_media_variant_width"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    media_id = Column(Integer, ForeignKey("media.id"), nullable=False, index=True)
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+    filename = Column(String(200), nullable=False)  # Under uploads/media/variants
+    file_size = Column(Integer, nullable=False)
+    mime_type = Column(String(100), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    media = relationship("Media", back_populates="variants")
 
 class Settings(Base):
     __tablename__ = "settings"
@@ -201,6 +275,10 @@ class Avatar(Base):
 class AIUsage(Base):
     """AI kullanım verilerini saklamak için model"""
     __tablename__ = "ai_usage"
+    __table_args__ = (
+        Index("ix_ai_usage_user_type", "user_id", "usage_type"),
+        Index("ix_ai_usage_user_created", "user_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -4,10 +4,23 @@ from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.auth import get_admin_user
+from app.core.settings_cache import settings_cache
+from app.core.user_cache import user_cache
+from app.core.password_pool import password_pool
 from app.models.models import Post, Category, User, Settings, Page, Comment, PostLike, AIUsage, AIPreferences
 from app.utils.helpers import generate_slug, calculate_reading_time, format_datetime_for_site
 from app.utils.ai_content import ai_generator
-from app.utils.image_optimizer import optimize_uploaded_image
+from app.utils.image_workers import image_processor
+from app.utils.image_cache import derivative_cache
+from app.utils.modern_formats import sibling_encoder
+from app.utils.perceptual_hash import perceptual_index
+from app.utils.sidebar import sidebar_provider
+from app.utils.search_engine import search_engine
+from app.utils.suggestion_index import suggestion_index
+from app.utils.like_counter import like_counter
+from app.utils.page_cache import page_cache, SIDEBAR_TAG
+from app.utils.http_cache import site_version_cache
+from app.utils.db_maintenance import db_maintenance
 from datetime import datetime, timedelta
 from typing import Optional, List
 import os
@@ -20,7 +33,7 @@ templates = Jinja2Templates(directory="templates")
 
 def get_admin_template_context(request: Request, admin_user: User, db: Session):
     """Get common admin template context including timezone helper"""
-    site_settings = db.query(Settings).first()
+    site_settings = settings_cache.get(db)
     return {
         "request": request,
         "admin_user": admin_user,
@@ -111,7 +124,7 @@ async def admin_posts(request: Request, admin_user: User = Depends(get_admin_use
             joinedload(Post.author)
         ).order_by(Post.created_at.desc()).all()
         
-        site_settings = db.query(Settings).first()
+        site_settings = settings_cache.get(db)
         return templates.TemplateResponse("admin/posts.html", {
             "request": request,
             "admin_user": admin_user,
@@ -136,7 +149,7 @@ async def admin_posts(request: Request, admin_user: User = Depends(get_admin_use
 async def new_post_form(request: Request, admin_user: User = Depends(get_admin_user), db: Session = Depends(get_db)):
     try:
         categories = db.query(Category).all()
-        site_settings = db.query(Settings).first()
+        site_settings = settings_cache.get(db)
         return templates.TemplateResponse("admin/post_form.html", {
             "request": request,
             "admin_user": admin_user,
@@ -146,7 +159,7 @@ async def new_post_form(request: Request, admin_user: User = Depends(get_admin_u
         })
     except Exception as e:
         print(f"Error loading new post form: {e}")
-        site_settings = db.query(Settings).first()
+        site_settings = settings_cache.get(db)
         return templates.TemplateResponse("admin/post_form.html", {
             "request": request,
             "admin_user": admin_user,
@@ -179,7 +192,7 @@ async def upload_featured_image(
         upload_dir.mkdir(parents=True, exist_ok=True)
         
         # Optimize image for featured images (hero size)
-        optimized_bytes, extension = optimize_uploaded_image(
+        optimized_bytes, extension = await image_processor.optimize_bytes(
             file_content,
             featured_image.filename,
             max_width=1920,  # Hero image size
@@ -272,12 +285,17 @@ async def create_post(
                 tag = Tag(name=tag_name.strip(), slug=tag_slug)
                 db.add(tag)
                 db.commit()
+                suggestion_index.upsert("tag", tag.id, tag.name)
             
             # Create post-tag relationship
             post_tag = PostTag(post_id=post.id, tag_id=tag.id)
             db.add(post_tag)
     
+    search_engine.index_post(db, post)
     db.commit()
+    sidebar_provider.invalidate()
+    suggestion_index.sync_post(post)
+    page_cache.purge_post(post)
     
     return RedirectResponse(url="/admin/posts", status_code=303)
 
@@ -325,6 +343,9 @@ async def update_post(
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
+    # Pages showing the old category/tags must be purged as well
+    previous_cache_tags = page_cache.post_tags(post)
+    
     # Action'a göre publish durumunu belirle
     is_published = action == "publish"
     is_draft = action == "draft"
@@ -360,12 +381,17 @@ async def update_post(
                 tag = Tag(name=tag_name.strip(), slug=tag_slug)
                 db.add(tag)
                 db.commit()
+                suggestion_index.upsert("tag", tag.id, tag.name)
             
             # Create post-tag relationship
             post_tag = PostTag(post_id=post.id, tag_id=tag.id)
             db.add(post_tag)
     
+    search_engine.index_post(db, post)
     db.commit()
+    sidebar_provider.invalidate()
+    suggestion_index.sync_post(post)
+    page_cache.purge_post(post, previous_cache_tags)
     
     return RedirectResponse(url="/admin/posts", status_code=303)
 
@@ -379,6 +405,8 @@ async def delete_post(post_id: int, admin_user: User = Depends(get_admin_user),
         # Delete related records first to avoid foreign key constraints
         from app.models.models import PostTag, Comment, PostLike
         
+        cache_tags = page_cache.post_tags(post)
+        
         # Delete post tags
         db.query(PostTag).filter(PostTag.post_id == post_id).delete()
         
@@ -391,7 +419,11 @@ async def delete_post(post_id: int, admin_user: User = Depends(get_admin_user),
         # Soft delete - move to deleted items
         post.is_deleted = True
         post.deleted_at = datetime.now()
+        search_engine.remove_post(db, post.id)
         db.commit()
+        sidebar_provider.invalidate()
+        suggestion_index.remove("post", post_id)
+        page_cache.purge_tags(*cache_tags)
         
         return RedirectResponse(url="/admin/posts", status_code=303)
     except Exception as e:
@@ -402,7 +434,7 @@ async def delete_post(post_id: int, admin_user: User = Depends(get_admin_user),
 @router.get("/categories", response_class=HTMLResponse)
 async def admin_categories(request: Request, admin_user: User = Depends(get_admin_user), db: Session = Depends(get_db)):
     categories = db.query(Category).all()
-    site_settings = db.query(Settings).first()
+    site_settings = settings_cache.get(db)
     return templates.TemplateResponse("admin/categories.html", {
         "request": request,
         "admin_user": admin_user,
@@ -435,6 +467,9 @@ async def create_category(
     
     db.add(category)
     db.commit()
+    sidebar_provider.invalidate()
+    suggestion_index.upsert("category", category.id, category.name)
+    page_cache.purge_tags("categories", SIDEBAR_TAG)
     
     return RedirectResponse(url="/admin/categories?success=created", status_code=303)
 
@@ -477,6 +512,9 @@ async def edit_category(
     category.is_default = is_default
     
     db.commit()
+    sidebar_provider.invalidate()
+    suggestion_index.upsert("category", category_id, name)
+    page_cache.purge_tags(f"category:{category_id}", "categories", "home", "archive", SIDEBAR_TAG)
     
     return RedirectResponse(url="/admin/categories?success=updated", status_code=303)
 
@@ -513,6 +551,9 @@ async def delete_category(
     # Delete the category
     db.delete(category)
     db.commit()
+    sidebar_provider.invalidate()
+    suggestion_index.remove("category", category_id)
+    page_cache.purge_tags(f"category:{category_id}", f"category:{replacement_category}", "categories", "home", "archive", SIDEBAR_TAG)
     
     return RedirectResponse(url="/admin/categories?success=deleted", status_code=303)
 
@@ -535,7 +576,7 @@ async def get_categories_api(admin_user: User = Depends(get_admin_user), db: Ses
 async def admin_pages(request: Request, admin_user: User = Depends(get_admin_user), db: Session = Depends(get_db)):
     from app.models.models import Page
     pages = db.query(Page).order_by(Page.created_at.desc()).all()
-    site_settings = db.query(Settings).first()
+    site_settings = settings_cache.get(db)
     return templates.TemplateResponse("admin/pages.html", {
         "request": request,
         "admin_user": admin_user,
@@ -545,7 +586,7 @@ async def admin_pages(request: Request, admin_user: User = Depends(get_admin_use
 
 @router.get("/pages/new", response_class=HTMLResponse)
 async def new_page_form(request: Request, admin_user: User = Depends(get_admin_user), db: Session = Depends(get_db)):
-    site_settings = db.query(Settings).first()
+    site_settings = settings_cache.get(db)
     return templates.TemplateResponse("admin/page_form.html", {
         "request": request,
         "admin_user": admin_user,
@@ -832,7 +873,7 @@ async def generate_ai_seo(
 @router.get("/ai-assistant", response_class=HTMLResponse)
 async def ai_assistant_dashboard(request: Request, admin_user: User = Depends(get_admin_user), db: Session = Depends(get_db)):
     """Merkezi AI yardımı sayfası - Tüm AI özelliklerini tek yerden yönetme"""
-    site_settings = db.query(Settings).first()
+    site_settings = settings_cache.get(db)
     
     # Gerçek AI kullanım istatistikleri
     total_usage = db.query(AIUsage).filter(AIUsage.user_id == admin_user.id).count()
@@ -1007,7 +1048,7 @@ async def save_ai_preferences(
 @router.get("/profile", response_class=HTMLResponse)
 async def admin_profile(request: Request, admin_user: User = Depends(get_admin_user), db: Session = Depends(get_db)):
     """Admin profile page with admin-specific settings"""
-    settings = db.query(Settings).first()
+    settings = settings_cache.get(db)
     
     # Get admin stats
     total_posts = db.query(Post).filter(Post.author_id == admin_user.id).count()
@@ -1045,7 +1086,8 @@ async def admin_settings(request: Request, admin_user: User = Depends(get_admin_
         "admin_user": admin_user,
         "site_settings": settings,
         "settings": settings,
-        "avatars": avatars
+        "avatars": avatars,
+        "database_profile": db_maintenance.status()
     })
 
 @router.post("/settings/save")
@@ -1078,8 +1120,11 @@ async def save_settings(
     settings.ai_prompt = ai_prompt if ai_prompt else "Write a blog post about the given topic"
     settings.ai_content_length = ai_content_length
     settings.ai_content_type = ai_content_type
+    settings_cache.touch(settings)
     
     db.commit()
+    settings_cache.publish(settings)
+    page_cache.clear()
     
     return RedirectResponse(url="/admin/settings?success=1", status_code=303)
 
@@ -1093,6 +1138,7 @@ async def admin_customize(request: Request, admin_user: User = Depends(get_admin
         settings = Settings()
         db.add(settings)
         db.commit()
+        settings_cache.publish(settings)
     
     return templates.TemplateResponse("admin/customize.html", {
         "request": request,
@@ -1194,8 +1240,11 @@ async def save_customization(
     settings.hero_secondary_button_link = hero_secondary_button_link.strip() if hero_secondary_button_link.strip() else "/register"
     settings.hero_primary_button_enabled = hero_primary_button_enabled
     settings.hero_secondary_button_enabled = hero_secondary_button_enabled
+    settings_cache.touch(settings)
     
     db.commit()
+    settings_cache.publish(settings)
+    page_cache.clear()
     
     return RedirectResponse(url="/admin/customize?success=1", status_code=303)
 
@@ -1205,7 +1254,7 @@ async def save_customization(
 async def admin_tags(request: Request, admin_user: User = Depends(get_admin_user), db: Session = Depends(get_db)):
     from app.models.models import Tag
     tags = db.query(Tag).all()
-    site_settings = db.query(Settings).first()
+    site_settings = settings_cache.get(db)
     return templates.TemplateResponse("admin/tags.html", {
         "request": request,
         "admin_user": admin_user,
@@ -1231,6 +1280,7 @@ async def create_tag(
     
     db.add(tag)
     db.commit()
+    suggestion_index.upsert("tag", tag.id, tag.name)
     
     return RedirectResponse(url="/admin/tags", status_code=303)
 
@@ -1241,7 +1291,7 @@ async def edit_tag(
     admin_user: User = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
-    from app.models.models import Tag
+    from app.models.models import Tag, PostTag
     tag = db.query(Tag).filter(Tag.id == tag_id).first()
     if not tag:
         raise HTTPException(status_code=404, detail="Tag not found")
@@ -1251,20 +1301,31 @@ async def edit_tag(
         tag.slug = generate_slug(name, db, model=Tag, exclude_id=tag_id)
     
     tag.name = name
+    search_engine.index_posts(db, [row.post_id for row in db.query(PostTag.post_id).filter(PostTag.tag_id == tag_id).all()])
     
     db.commit()
+    sidebar_provider.invalidate()
+    suggestion_index.upsert("tag", tag_id, name)
+    # The sidebar tag list on cached pages shows the tag's name and slug link
+    page_cache.purge_tags(f"tag:{tag_id}", SIDEBAR_TAG)
     
     return RedirectResponse(url="/admin/tags", status_code=303)
 
 @router.post("/tags/{tag_id}/delete")
 async def delete_tag(tag_id: int, admin_user: User = Depends(get_admin_user), db: Session = Depends(get_db)):
-    from app.models.models import Tag
+    from app.models.models import Tag, PostTag
     tag = db.query(Tag).filter(Tag.id == tag_id).first()
     if not tag:
         raise HTTPException(status_code=404, detail="Tag not found")
     
+    tagged_post_ids = [row.post_id for row in db.query(PostTag.post_id).filter(PostTag.tag_id == tag_id).all()]
     db.delete(tag)
+    db.flush()
+    search_engine.index_posts(db, tagged_post_ids)
     db.commit()
+    sidebar_provider.invalidate()
+    suggestion_index.remove("tag", tag_id)
+    page_cache.purge_tags(f"tag:{tag_id}", SIDEBAR_TAG)
     
     return RedirectResponse(url="/admin/tags", status_code=303)
 
@@ -1296,7 +1357,7 @@ async def admin_deleted(request: Request, admin_user: User = Depends(get_admin_u
             if 0 <= days_left <= 3:
                 expiring_soon_count += 1
     
-    site_settings = db.query(Settings).first()
+    site_settings = settings_cache.get(db)
     return templates.TemplateResponse("admin/deleted.html", {
         "request": request,
         "admin_user": admin_user,
@@ -1317,7 +1378,11 @@ async def restore_post(post_id: int, admin_user: User = Depends(get_admin_user),
     
     post.is_deleted = False
     post.deleted_at = None
+    search_engine.index_post(db, post)
     db.commit()
+    sidebar_provider.invalidate()
+    suggestion_index.sync_post(post)
+    page_cache.purge_post(post)
     
     return RedirectResponse(url="/admin/deleted?restored=post", status_code=303)
 
@@ -1341,8 +1406,13 @@ async def permanent_delete_post(post_id: int, admin_user: User = Depends(get_adm
     if not post:
         raise HTTPException(status_code=404, detail="Silinmiş yazı bulunamadı")
     
+    cache_tags = page_cache.post_tags(post)
+    search_engine.remove_post(db, post.id)
     db.delete(post)
     db.commit()
+    sidebar_provider.invalidate()
+    suggestion_index.remove("post", post_id)
+    page_cache.purge_tags(*cache_tags)
     
     return RedirectResponse(url="/admin/deleted?deleted=post", status_code=303)
 
@@ -1358,6 +1428,21 @@ async def permanent_delete_page(page_id: int, admin_user: User = Depends(get_adm
     
     return RedirectResponse(url="/admin/deleted?deleted=page", status_code=303)
 
+@router.get("/api/cache/stats")
+async def page_cache_stats(admin_user: User = Depends(get_admin_user)):
+    """Page and user cache hit/miss counters and worker pool load for this process"""
+    return JSONResponse({
+        "success": True,
+        "page_cache": page_cache.stats(),
+        "site_version": site_version_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "password_pool": password_pool.stats(),
+        "image_processor": image_processor.stats(),
+        "image_derivatives": derivative_cache.stats(),
+        "modern_format_jobs": sibling_encoder.pending,
+        "perceptual_index": perceptual_index.stats()
+    })
+
 # API Routes for Media Gallery
 @router.get("/api/media")
 async def get_media_files(admin_user: User = Depends(get_admin_user), db: Session = Depends(get_db)):
@@ -1513,6 +1598,7 @@ async def toggle_user_admin_status(
         
         user.is_admin = is_admin
         db.commit()
+        user_cache.invalidate(user.username)
         
         action = "promoted to admin" if is_admin else "removed from admin"
         return JSONResponse({"success": True, "message": f"User {user.username} {action}"})
@@ -1537,6 +1623,7 @@ async def delete_user(
     
     try:
         # Delete user's likes
+        liked_post_ids = [row.post_id for row in db.query(PostLike.post_id).filter(PostLike.user_id == user_id).all()]
         db.query(PostLike).filter(PostLike.user_id == user_id).delete()
         
         # Delete user's comments
@@ -1550,6 +1637,9 @@ async def delete_user(
         # Delete the user
         db.delete(user)
         db.commit()
+        user_cache.invalidate(user.username)
+        for post_id in liked_post_ids:
+            like_counter.add(post_id, -1)
         
         return JSONResponse({"success": True, "message": f"User {user.username} deleted successfully"})
         
@@ -4,15 +4,17 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from app.core.database import get_db
-from app.core.auth import verify_password, create_access_token, get_password_hash, ACCESS_TOKEN_EXPIRE_MINUTES
-from app.models.models import User, Settings
+from app.core.auth import verify_password_async, create_access_token, get_password_hash_async, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.user_cache import user_cache
+from app.core.settings_cache import settings_cache
+from app.models.models import User
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
 def get_template_context(request: Request, db: Session):
     """Get common template context including site settings"""
-    site_settings = db.query(Settings).first()
+    site_settings = settings_cache.get(db)
     return {
         "request": request,
         "site_settings": site_settings
@@ -26,11 +28,18 @@ async def login_page(request: Request, db: Session = Depends(get_db)):
 @router.post("/login")
 async def login(request: Request, username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
     user = db.query(User).filter(User.username == username).first()
-    if not user or not verify_password(password, user.hashed_password):
+    valid, new_hash = await verify_password_async(password, user.hashed_password) if user else (False, None)
+    if not valid:
         context = get_template_context(request, db)
         context["error"] = "Invalid username or password"
         return templates.TemplateResponse("blog/login.html", context)
     
+    # Transparently move the stored hash to the configured work factor
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
+        user_cache.invalidate(user.username)
+    
     # Use user's preferred session duration or default
     session_duration = user.session_duration if user.session_duration else ACCESS_TOKEN_EXPIRE_MINUTES
     access_token = create_access_token(
@@ -62,7 +71,7 @@ async def register(request: Request, username: str = Form(...), email: str = For
         context["error"] = "Email already exists"
         return templates.TemplateResponse("blog/register.html", context)
     
-    hashed_password = get_password_hash(password)
+    hashed_password = await get_password_hash_async(password)
     user = User(username=username, email=email, hashed_password=hashed_password)
     db.add(user)
     db.commit()
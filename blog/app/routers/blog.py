@@ -1,88 +1,85 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from app.core.database import get_db
-from app.core.auth import get_current_user_optional
-from app.models.models import Post, Category, Page, Tag, PostTag, Settings
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.core.database import get_async_db
+from app.core.auth import get_current_user_optional_async
+from app.core.settings_cache import settings_cache
+from app.models.models import Post, Category, Page, Tag, PostTag
 from app.utils.helpers import format_datetime_for_site
+from app.utils.sidebar import sidebar_provider
+from app.utils.page_cache import page_cache, SIDEBAR_TAG
+from app.utils.sitemap import sitemap_generator
+from app.utils.http_cache import site_version, make_etag, viewer_key, not_modified, set_validators, finalize
 from typing import Optional
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
-def get_template_context(request: Request, db: Session, current_user=None):
+async def get_template_context(request: Request, db: AsyncSession, current_user=None):
     """Get common template context including site settings"""
-    site_settings = db.query(Settings).first()
+    site_settings = await db.run_sync(settings_cache.get)
     context = {
         "request": request,
         "site_settings": site_settings,
-        "format_datetime": lambda dt, fmt="%d.%m.%Y %H:%M": format_datetime_for_site(dt, db, fmt) if dt else ""
+        # The settings snapshot was just revalidated, so formatting needs no session
+        "format_datetime": lambda dt, fmt="%d.%m.%Y %H:%M": format_datetime_for_site(dt, None, fmt) if dt else ""
     }
     if current_user is not None:
         context["current_user"] = current_user
     return context
 
 @router.get("/post/{slug}", response_class=HTMLResponse)
-async def post_detail(request: Request, slug: str, db: Session = Depends(get_db)):
+async def post_detail(request: Request, slug: str, db: AsyncSession = Depends(get_async_db)):
+    cached = page_cache.get(request)
+    if cached:
+        return finalize(request, cached)
+    
     try:
-        post = db.query(Post).filter(Post.slug == slug, Post.is_published == True).first()
+        post = await db.scalar(
+            select(Post)
+            .options(selectinload(Post.author), selectinload(Post.category), selectinload(Post.tags))
+            .where(Post.slug == slug, Post.is_published == True)
+        )
         if not post:
             raise HTTPException(status_code=404, detail="Post not found")
         
-        current_user = get_current_user_optional(request, db)
+        current_user = await get_current_user_optional_async(request, db)
+        
+        # Answer revalidations before rendering anything
+        site_token = await db.run_sync(site_version)
+        etag = make_etag("post", post.id, post.updated_at, site_token, viewer_key(current_user))
+        unchanged = not_modified(request, etag, private=current_user is not None)
+        if unchanged:
+            return unchanged
         
         # Get context with settings
-        context = get_template_context(request, db, current_user)
+        context = await get_template_context(request, db, current_user)
         
         # Get sidebar data safely
-        categories_data = []
-        popular_posts = []
-        tags = []
-        
-        try:
-            # Get categories with post counts
-            categories = db.query(Category).all()
-            for category in categories:
-                post_count = db.query(Post).filter(
-                    Post.category_id == category.id,
-                    Post.is_published == True
-                ).count()
-                categories_data.append({
-                    'id': category.id,
-                    'name': category.name,
-                    'slug': category.slug,
-                    'post_count': post_count
-                })
-        except:
-            categories_data = []
-        
-        try:
-            # Get popular posts (recent published posts)
-            popular_posts = db.query(Post).filter(
-                Post.is_published == True
-            ).order_by(Post.created_at.desc()).limit(5).all()
-        except:
-            popular_posts = []
-        
         try:
-            # Get all tags
-            tags = db.query(Tag).all()
-        except:
-            tags = []
+            sidebar = await db.run_sync(sidebar_provider.get)
+        except Exception as e:
+            print(f"Sidebar data error: {e}")
+            sidebar = {"categories": [], "popular_posts": [], "tags": []}
         
         # Add post data and sidebar data for template
         context.update({
             "post": post,
             "related_posts": [],
-            "categories": categories_data,
-            "popular_posts": popular_posts,
-            "tags": tags,
+            "categories": sidebar["categories"],
+            "popular_posts": sidebar["popular_posts"],
+            "tags": sidebar["tags"],
             "archives": []
         })
         
-        return templates.TemplateResponse("blog/post_detail.html", context)
+        response = templates.TemplateResponse("blog/post_detail.html", context)
+        set_validators(response, etag, private=current_user is not None)
+        cache_tags = [f"post:{post.id}", f"category:{post.category_id}", SIDEBAR_TAG]
+        cache_tags.extend(f"tag:{post_tag.tag_id}" for post_tag in post.tags)
+        return page_cache.store(request, response, cache_tags)
         
     except HTTPException:
         raise
@@ -93,32 +90,29 @@ async def post_detail(request: Request, slug: str, db: Session = Depends(get_db)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/categories", response_class=HTMLResponse)
-async def categories_list(request: Request, db: Session = Depends(get_db)):
+async def categories_list(request: Request, db: AsyncSession = Depends(get_async_db)):
+    cached = page_cache.get(request)
+    if cached:
+        return finalize(request, cached)
+    
     try:
-        # Get categories with post counts
-        categories = db.query(Category).all()
+        current_user = await get_current_user_optional_async(request, db)
+        
+        site_token = await db.run_sync(site_version)
+        etag = make_etag("categories", site_token, viewer_key(current_user))
+        unchanged = not_modified(request, etag, private=current_user is not None)
+        if unchanged:
+            return unchanged
         
-        # Safely add post count to each category
-        categories_data = []
-        for category in categories:
-            post_count = db.query(Post).filter(
-                Post.category_id == category.id,
-                Post.is_published == True
-            ).count()
-            
-            categories_data.append({
-                'id': category.id,
-                'name': category.name,
-                'slug': category.slug,
-                'description': category.description,
-                'post_count': post_count
-            })
+        # Get categories with post counts (single GROUP BY, cached)
+        categories_data = (await db.run_sync(sidebar_provider.get))["categories"]
         
-        current_user = get_current_user_optional(request, db)
-        context = get_template_context(request, db, current_user)
+        context = await get_template_context(request, db, current_user)
         context["categories"] = categories_data
         
-        return templates.TemplateResponse("blog/categories.html", context)
+        response = templates.TemplateResponse("blog/categories.html", context)
+        set_validators(response, etag, private=current_user is not None)
+        return page_cache.store(request, response, ["categories", SIDEBAR_TAG])
         
     except Exception as e:
         print(f"Categories page error: {e}")
@@ -127,16 +121,30 @@ async def categories_list(request: Request, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/category/{slug}", response_class=HTMLResponse)
-async def category_posts(request: Request, slug: str, db: Session = Depends(get_db)):
+async def category_posts(request: Request, slug: str, db: AsyncSession = Depends(get_async_db)):
+    cached = page_cache.get(request)
+    if cached:
+        return finalize(request, cached)
+    
     try:
-        category = db.query(Category).filter(Category.slug == slug).first()
+        category = await db.scalar(select(Category).where(Category.slug == slug))
         if not category:
             raise HTTPException(status_code=404, detail="Category not found")
         
-        posts = db.query(Post).filter(
-            Post.category_id == category.id,
-            Post.is_published == True
-        ).order_by(Post.created_at.desc()).all()
+        current_user = await get_current_user_optional_async(request, db)
+        
+        site_token = await db.run_sync(site_version)
+        etag = make_etag("category", category.id, site_token, viewer_key(current_user))
+        unchanged = not_modified(request, etag, private=current_user is not None)
+        if unchanged:
+            return unchanged
+        
+        posts = (await db.scalars(
+            select(Post)
+            .options(selectinload(Post.author))
+            .where(Post.category_id == category.id, Post.is_published == True)
+            .order_by(Post.created_at.desc())
+        )).all()
         
         # Clean HTML from excerpts in backend
         from app.utils.helpers import strip_html_tags
@@ -146,55 +154,26 @@ async def category_posts(request: Request, slug: str, db: Session = Depends(get_
             else:
                 post.clean_excerpt = ""
         
-        current_user = get_current_user_optional(request, db)
-        
         # Get context with settings
-        context = get_template_context(request, db, current_user)
+        context = await get_template_context(request, db, current_user)
         
         # Get sidebar data safely
-        categories_data = []
-        popular_posts = []
-        tags = []
-        
-        try:
-            # Get categories with post counts
-            categories = db.query(Category).all()
-            for cat in categories:
-                post_count = db.query(Post).filter(
-                    Post.category_id == cat.id,
-                    Post.is_published == True
-                ).count()
-                categories_data.append({
-                    'id': cat.id,
-                    'name': cat.name,
-                    'slug': cat.slug,
-                    'post_count': post_count
-                })
-        except:
-            categories_data = []
-        
         try:
-            # Get popular posts (recent published posts)
-            popular_posts = db.query(Post).filter(
-                Post.is_published == True
-            ).order_by(Post.created_at.desc()).limit(5).all()
-        except:
-            popular_posts = []
-        
-        try:
-            # Get all tags
-            tags = db.query(Tag).all()
-        except:
-            tags = []
+            sidebar = await db.run_sync(sidebar_provider.get)
+        except Exception as e:
+            print(f"Sidebar data error: {e}")
+            sidebar = {"categories": [], "popular_posts": [], "tags": []}
         
         context.update({
             "category": category,
             "posts": posts,
-            "categories": categories_data,
-            "popular_posts": popular_posts,
-            "tags": tags
+            "categories": sidebar["categories"],
+            "popular_posts": sidebar["popular_posts"],
+            "tags": sidebar["tags"]
         })
-        return templates.TemplateResponse("blog/category_posts.html", context)
+        response = templates.TemplateResponse("blog/category_posts.html", context)
+        set_validators(response, etag, private=current_user is not None)
+        return page_cache.store(request, response, [f"category:{category.id}", SIDEBAR_TAG])
         
     except HTTPException:
         raise
@@ -204,63 +183,86 @@ async def category_posts(request: Request, slug: str, db: Session = Depends(get_
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@router.get("/{slug}", response_class=HTMLResponse)
-async def page_detail(request: Request, slug: str, db: Session = Depends(get_db)):
-    page = db.query(Page).filter(Page.slug == slug, Page.is_published == True).first()
-    if not page:
-        raise HTTPException(status_code=404, detail="Page not found")
-    
-    current_user = get_current_user_optional(request, db)
-    
-    context = get_template_context(request, db, current_user)
-    context["page"] = page
-    return templates.TemplateResponse("blog/page_detail.html", context)
-
 @router.get("/tag/{slug}", response_class=HTMLResponse)
-async def tag_posts(request: Request, slug: str, db: Session = Depends(get_db)):
-    tag = db.query(Tag).filter(Tag.slug == slug).first()
+async def tag_posts(request: Request, slug: str, db: AsyncSession = Depends(get_async_db)):
+    cached = page_cache.get(request)
+    if cached:
+        return finalize(request, cached)
+    
+    tag = await db.scalar(select(Tag).where(Tag.slug == slug))
     if not tag:
         raise HTTPException(status_code=404, detail="Tag not found")
     
-    # Get posts with this tag
-    posts = db.query(Post).join(PostTag).filter(
-        PostTag.tag_id == tag.id,
-        Post.is_published == True
-    ).order_by(Post.created_at.desc()).all()
+    current_user = await get_current_user_optional_async(request, db)
     
-    current_user = get_current_user_optional(request, db)
+    site_token = await db.run_sync(site_version)
+    etag = make_etag("tag", tag.id, site_token, viewer_key(current_user))
+    unchanged = not_modified(request, etag, private=current_user is not None)
+    if unchanged:
+        return unchanged
+    
+    # Get posts with this tag
+    posts = (await db.scalars(
+        select(Post)
+        .join(PostTag, PostTag.post_id == Post.id)
+        .options(selectinload(Post.category))
+        .where(PostTag.tag_id == tag.id, Post.is_published == True)
+        .order_by(Post.created_at.desc())
+    )).all()
     
-    context = get_template_context(request, db, current_user)
+    context = await get_template_context(request, db, current_user)
     context.update({
         "tag": tag,
         "posts": posts
     })
-    return templates.TemplateResponse("blog/tag_posts.html", context)
+    response = templates.TemplateResponse("blog/tag_posts.html", context)
+    set_validators(response, etag, private=current_user is not None)
+    return page_cache.store(request, response, [f"tag:{tag.id}"])
 
 @router.get("/about", response_class=HTMLResponse)
-async def about_page(request: Request, db: Session = Depends(get_db)):
-    current_user = get_current_user_optional(request, db)
+async def about_page(request: Request, db: AsyncSession = Depends(get_async_db)):
+    current_user = await get_current_user_optional_async(request, db)
     
-    context = get_template_context(request, db, current_user)
-    return templates.TemplateResponse("blog/about.html", context)
+    site_token = await db.run_sync(site_version)
+    etag = make_etag("about", site_token, viewer_key(current_user))
+    unchanged = not_modified(request, etag, private=current_user is not None)
+    if unchanged:
+        return unchanged
+    
+    context = await get_template_context(request, db, current_user)
+    response = templates.TemplateResponse("blog/about.html", context)
+    return set_validators(response, etag, private=current_user is not None)
 
 @router.get("/archive/{year}/{month}", response_class=HTMLResponse)
-async def archive_posts(request: Request, year: str, month: str, db: Session = Depends(get_db)):
+async def archive_posts(request: Request, year: str, month: str, db: AsyncSession = Depends(get_async_db)):
     """Show posts from a specific month and year"""
-    from sqlalchemy import func
+    cached = page_cache.get(request)
+    if cached:
+        return finalize(request, cached)
+    
+    current_user = await get_current_user_optional_async(request, db)
     
-    posts = db.query(Post).filter(
-        func.strftime('%Y', Post.created_at) == year,
-        func.strftime('%m', Post.created_at) == month,
-        Post.is_published == True
-    ).order_by(Post.created_at.desc()).all()
+    site_token = await db.run_sync(site_version)
+    etag = make_etag("archive", year, month, site_token, viewer_key(current_user))
+    unchanged = not_modified(request, etag, private=current_user is not None)
+    if unchanged:
+        return unchanged
     
-    current_user = get_current_user_optional(request, db)
+    posts = (await db.scalars(
+        select(Post)
+        .options(selectinload(Post.category))
+        .where(
+            func.strftime('%Y', Post.created_at) == year,
+            func.strftime('%m', Post.created_at) == month,
+            Post.is_published == True
+        )
+        .order_by(Post.created_at.desc())
+    )).all()
     
     month_names = ['', 'Ocak', 'Şubat', 'Mart', 'Nisan', 'Mayıs', 'Haziran', 
                    'Temmuz', 'Ağustos', 'Eylül', 'Ekim', 'Kasım', 'Aralık']
     
-    context = get_template_context(request, db, current_user)
+    context = await get_template_context(request, db, current_user)
     context.update({
         "posts": posts,
         "year": year,
@@ -268,81 +270,48 @@ async def archive_posts(request: Request, year: str, month: str, db: Session = D
         "month_name": month_names[int(month)],
         "archive_title": f"{month_names[int(month)]} {year} Arşivi"
     })
-    return templates.TemplateResponse("blog/archive.html", context)
+    response = templates.TemplateResponse("blog/archive.html", context)
+    set_validators(response, etag, private=current_user is not None)
+    return page_cache.store(request, response, ["archive"])
 
 @router.get("/sitemap.xml")
-async def sitemap(request: Request, db: Session = Depends(get_db)):
-    """Generate XML sitemap for SEO"""
-    from fastapi.responses import Response
-    
-    # Get all published posts
-    posts = db.query(Post).filter(Post.is_published == True).all()
-    categories = db.query(Category).all()
-    pages = db.query(Page).filter(Page.is_published == True).all()
-    tags = db.query(Tag).all()
-    
+async def sitemap(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Sitemap index pointing at the cached shards"""
     base_url = str(request.base_url).rstrip('/')
+    shards = await db.run_sync(sitemap_generator.list_shards)
     
-    sitemap_xml = f'''<?xml version="1.0" encoding="UTF-8"?>
-<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
-    <url>
-        <loc>{base_url}/</loc>
-        <changefreq>daily</changefreq>
-        <priority>1.0</priority>
-    </url>
-    <url>
-        <loc>{base_url}/about</loc>
-        <changefreq>monthly</changefreq>
-        <priority>0.8</priority>
-    </url>
-    <url>
-        <loc>{base_url}/categories</loc>
-        <changefreq>weekly</changefreq>
-        <priority>0.8</priority>
-    </url>'''
-    
-    # Add posts
-    for post in posts:
-        sitemap_xml += f'''
-    <url>
-        <loc>{base_url}/post/{post.slug}</loc>
-        <lastmod>{post.updated_at.strftime('%Y-%m-%d') if post.updated_at else post.created_at.strftime('%Y-%m-%d')}</lastmod>
-        <changefreq>monthly</changefreq>
-        <priority>0.9</priority>
-    </url>'''
-    
-    # Add categories
-    for category in categories:
-        sitemap_xml += f'''
-    <url>
-        <loc>{base_url}/category/{category.slug}</loc>
-        <changefreq>weekly</changefreq>
-        <priority>0.7</priority>
-    </url>'''
-    
-    # Add pages
-    for page in pages:
-        sitemap_xml += f'''
-    <url>
-        <loc>{base_url}/page/{page.slug}</loc>
-        <lastmod>{page.updated_at.strftime('%Y-%m-%d') if page.updated_at else page.created_at.strftime('%Y-%m-%d')}</lastmod>
-        <changefreq>monthly</changefreq>
-        <priority>0.6</priority>
-    </url>'''
+    etag = make_etag("sitemap", base_url, sitemap_generator.gzip_enabled, *(shard.fingerprint for shard in shards))
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
     
-    # Add tags
-    for tag in tags:
-        sitemap_xml += f'''
-    <url>
-        <loc>{base_url}/tag/{tag.slug}</loc>
-        <changefreq>weekly</changefreq>
-        <priority>0.5</priority>
-    </url>'''
+    response = StreamingResponse(sitemap_generator.index_chunks(shards, base_url), media_type="application/xml")
+    return set_validators(response, etag)
+
+@router.get("/sitemap-{name}.xml")
+async def sitemap_shard(request: Request, name: str, db: AsyncSession = Depends(get_async_db)):
+    """A single sitemap shard (at most 50,000 URLs)"""
+    return await _sitemap_shard_response(request, name, db, gzipped=False)
+
+@router.get("/sitemap-{name}.xml.gz")
+async def sitemap_shard_gzip(request: Request, name: str, db: AsyncSession = Depends(get_async_db)):
+    """Gzip-compressed sitemap shard"""
+    return await _sitemap_shard_response(request, name, db, gzipped=True)
+
+async def _sitemap_shard_response(request: Request, name: str, db: AsyncSession, gzipped: bool):
+    shard = await db.run_sync(sitemap_generator.get_shard, name)
+    if not shard:
+        raise HTTPException(status_code=404, detail="Sitemap not found")
     
-    sitemap_xml += '''
-</urlset>'''
+    base_url = str(request.base_url).rstrip('/')
+    etag = make_etag("sitemap", name, base_url, gzipped, shard.fingerprint)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
     
-    return Response(content=sitemap_xml, media_type="application/xml")
+    chunks = sitemap_generator.shard_chunks(shard, base_url, gzipped=gzipped)
+    response = StreamingResponse(chunks, media_type="application/gzip" if gzipped else "application/xml")
+    return set_validators(response, etag)
 
 @router.get("/robots.txt")
 async def robots_txt(request: Request):
@@ -359,4 +328,24 @@ Disallow: /uploads/
 Sitemap: {base_url}/sitemap.xml
 """
     
-    return Response(content=robots_content, media_type="text/plain")
\ No newline at end of file
+    return finalize(request, Response(content=robots_content, media_type="text/plain"))
+
+# Catch-all page route must stay last so it does not shadow the routes above
+@router.get("/{slug}", response_class=HTMLResponse)
+async def page_detail(request: Request, slug: str, db: AsyncSession = Depends(get_async_db)):
+    page = await db.scalar(select(Page).where(Page.slug == slug, Page.is_published == True))
+    if not page:
+        raise HTTPException(status_code=404, detail="Page not found")
+    
+    current_user = await get_current_user_optional_async(request, db)
+    
+    site_token = await db.run_sync(site_version)
+    etag = make_etag("page", page.id, page.updated_at, site_token, viewer_key(current_user))
+    unchanged = not_modified(request, etag, private=current_user is not None)
+    if unchanged:
+        return unchanged
+    
+    context = await get_template_context(request, db, current_user)
+    context["page"] = page
+    response = templates.TemplateResponse("blog/page_detail.html", context)
+    return set_validators(response, etag, private=current_user is not None)
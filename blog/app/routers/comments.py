@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Form
+from fastapi import APIRouter, Depends, HTTPException, Request, Form, Query
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_db, get_async_db
 from app.core.auth import get_current_user, get_admin_user, get_current_user_optional
-from app.models.models import Comment, Post, User, Settings
+from app.core.settings_cache import settings_cache
+from app.models.models import Comment, Post, User
+from app.utils.comment_loader import load_comment_threads, count_approved_comments, DEFAULT_THREADS_PER_PAGE, MAX_THREADS_PER_PAGE
+from app.utils.http_cache import comments_version, make_etag, not_modified, set_validators
 from datetime import datetime
 from typing import Optional
 
@@ -24,7 +29,7 @@ async def add_comment(
         raise HTTPException(status_code=404, detail="Post not found")
     
     # Check comment character limit
-    settings = db.query(Settings).first()
+    settings = settings_cache.get(db)
     comment_limit = settings.comment_limit if settings else 500
     
     if len(content.strip()) > comment_limit:
@@ -68,7 +73,7 @@ async def reply_to_comment(
         raise HTTPException(status_code=404, detail="Parent comment not found")
     
     # Check comment character limit
-    settings = db.query(Settings).first()
+    settings = settings_cache.get(db)
     comment_limit = settings.comment_limit if settings else 500
     
     if len(content.strip()) > comment_limit:
@@ -92,50 +97,35 @@ async def reply_to_comment(
 
 @router.get("/api/post/{slug}/comments")
 async def get_post_comments(
+    request: Request,
     slug: str, 
-    db: Session = Depends(get_db)
+    cursor: Optional[int] = Query(None, description="Last top-level comment id of the previous page"),
+    limit: int = Query(DEFAULT_THREADS_PER_PAGE, ge=1, le=MAX_THREADS_PER_PAGE, description="Threads per page"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get approved comments for a post"""
-    post = db.query(Post).filter(Post.slug == slug, Post.is_published == True).first()
-    if not post:
+    """Get approved comment threads for a post, paginated by top-level comment"""
+    post_id = await db.scalar(select(Post.id).where(Post.slug == slug, Post.is_published == True))
+    if not post_id:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    # Get only parent comments (not replies)
-    parent_comments = db.query(Comment).filter(
-        Comment.post_id == post.id,
-        Comment.is_approved == True,
-        Comment.parent_id == None
-    ).order_by(Comment.created_at.asc()).all()
-    
-    def format_comment(comment):
-        # Get replies for this comment
-        replies = db.query(Comment).filter(
-            Comment.parent_id == comment.id,
-            Comment.is_approved == True
-        ).order_by(Comment.created_at.asc()).all()
-        
-        return {
-            "id": comment.id,
-            "content": comment.content,
-            "user": {
-                "username": comment.user.username,
-                "profile_image": comment.user.profile_image
-            },
-            "created_at": comment.created_at.strftime("%d.%m.%Y %H:%M"),
-            "replies": [{
-                "id": reply.id,
-                "content": reply.content,
-                "user": {
-                    "username": reply.user.username,
-                    "profile_image": reply.user.profile_image
-                },
-                "created_at": reply.created_at.strftime("%d.%m.%Y %H:%M")
-            } for reply in replies]
-        }
-    
-    return JSONResponse({
-        "comments": [format_comment(comment) for comment in parent_comments]
-    })
+    comments_token = await db.run_sync(comments_version, post_id)
+    etag = make_etag("comments", cursor, limit, comments_token)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    
+    threads, next_cursor = await db.run_sync(load_comment_threads, post_id, after_id=cursor, limit=limit)
+    
+    response = {
+        "comments": threads,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
+    }
+    # Total is only needed once, when the first page is rendered
+    if cursor is None:
+        response["total"] = await db.run_sync(count_approved_comments, post_id)
+    
+    return set_validators(JSONResponse(response), etag)
 
 # Admin routes for comment management
 admin_router = APIRouter(prefix="/admin", tags=["admin-comments"])
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
+from app.models.models import Media
+from app.utils.image_cache import derivative_cache, DERIVATIVE_FORMATS
+from app.utils.image_workers import ImageJobTimeout
+import os
+
+router = APIRouter(tags=["images"])
+
+# Derivatives of a media id never change content (the source file is immutable)
+DERIVATIVE_CACHE_CONTROL = "public, max-age=604800"
+
+@router.get("/img/{media_id:int}/{width:int}x{height:int}.{extension}")
+async def image_derivative(media_id: int, width: int, height: int, extension: str, db: AsyncSession = Depends(get_async_db)):
+    """Resized copy of a media image, from the derivative cache"""
+    extension = extension.lower()
+    if not derivative_cache.is_allowed(width, height, extension):
+        raise HTTPException(status_code=404, detail="Image size not available")
+    
+    media = await db.get(Media, media_id)
+    if not media or not derivative_cache.supports(media) or not os.path.exists(media.file_path):
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    try:
+        path = await derivative_cache.get(media, width, height, extension)
+    except ImageJobTimeout:
+        raise HTTPException(status_code=503, detail="Image is still being processed", headers={"Retry-After": "5"})
+    except Exception as e:
+        print(f"Image derivative error ({media_id} {width}x{height}.{extension}): {e!r}")
+        raise HTTPException(status_code=500, detail="Image could not be processed")
+    
+    return FileResponse(
+        path,
+        media_type=DERIVATIVE_FORMATS[extension][1],
+        headers={"Cache-Control": DERIVATIVE_CACHE_CONTROL}
+    )
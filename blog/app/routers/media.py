@@ -1,20 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, File, UploadFile, Form
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.auth import get_admin_user
-from app.models.models import Media, User, MediaFolder
-from app.utils.helpers import format_file_size, format_datetime_for_site, calculate_file_hash, check_duplicate_media
-from app.utils.image_optimizer import optimize_uploaded_image, PRESETS
-import os
-import uuid
+from app.models.models import Media, MediaVariant, User, MediaFolder
+from app.utils.helpers import format_file_size, format_datetime_for_site, calculate_file_hash, check_duplicate_media, get_media_folder_stats
+from app.utils.image_optimizer import read_image_size, PRESETS
+from app.utils.image_workers import image_processor
+from app.utils.media_variants import generate_variants, variant_index, VARIANT_DIR
+from app.utils.modern_formats import sibling_encoder
+from app.utils.blob_store import find_blob, acquire_blob, store_blob, media_for_blob, release_blob, delete_media_files, blob_store_stats
+from app.utils.image_cache import derivative_cache
+from app.utils.media_scanner import media_scanner
+from app.utils.media_library import load_media_page, InvalidCursor, DEFAULT_MEDIA_PER_PAGE, MAX_MEDIA_PER_PAGE
+from app.utils.upload_stream import stage_upload, stage_bytes, hash_upload, UploadTooLarge
+from app.utils.perceptual_hash import find_similar_media, perceptual_index
+import asyncio
 import shutil
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple
 import mimetypes
-import io
-from PIL import Image
 
 router = APIRouter(prefix="/admin", tags=["media"])
 templates = Jinja2Templates(directory="templates")
@@ -22,6 +29,8 @@ templates = Jinja2Templates(directory="templates")
 # Allowed file extensions and max size
 ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.heic', '.heif', '.bmp', '.tiff', '.svg', '.pdf', '.doc', '.docx'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+# Picker grid thumbnails come from the /img derivative endpoint
+PICKER_THUMB_SIZE = "300x300"
 
 @router.get("/media", response_class=HTMLResponse)
 async def media_gallery(request: Request, folder_id: int = None, admin_user: User = Depends(get_admin_user), db: Session = Depends(get_db)):
@@ -32,34 +41,21 @@ async def media_gallery(request: Request, folder_id: int = None, admin_user: Use
         if not current_folder:
             folder_id = None  # Invalid folder ID, reset to root
     
-    # Get folders in current location
-    if folder_id:
-        # Get subfolders (if we implement nested folders later)
-        folders_in_current = []
-        # Get media files in current folder
-        all_media_files = db.query(Media).filter(Media.folder_id == folder_id).order_by(Media.created_at.desc()).all()
-    else:
-        # Get root level folders and unassigned media files
-        folders_in_current = db.query(MediaFolder).order_by(MediaFolder.name).all()
-        all_media_files = db.query(Media).filter(Media.folder_id == None).order_by(Media.created_at.desc()).all()
-    
-    # Filter out media files that don't exist on filesystem
-    media_files = []
-    for media in all_media_files:
-        if os.path.exists(media.file_path):
-            media_files.append(media)
-        else:
-            # File doesn't exist, optionally remove from database
-            # For now, we just skip showing it
-            continue
-    
     # Get all folders for sidebar/operations
     all_folders = db.query(MediaFolder).order_by(MediaFolder.name).all()
     
-    # Calculate statistics
-    total_files = len(media_files)
-    total_size = sum(media.file_size for media in media_files)
-    image_files = len([media for media in media_files if media.mime_type.startswith('image/')])
+    # Get folders in current location (subfolders if we implement nested folders later)
+    folders_in_current = [] if folder_id else all_folders
+    
+    # Only the first page is rendered; the grid loads the rest from /media/search
+    media_files, next_cursor = load_media_page(db, folder_id=folder_id)
+    
+    # Calculate statistics for the whole current folder in SQL
+    folder_stats = get_media_folder_stats(db)
+    total_files, total_size = folder_stats.get(folder_id, (0, 0))
+    image_files = db.query(func.count(Media.id)).filter(
+        Media.folder_id == folder_id, Media.is_missing == False, Media.mime_type.like('image/%')
+    ).scalar()
     other_files = total_files - image_files
     
     # Convert total size to readable format
@@ -75,16 +71,9 @@ async def media_gallery(request: Request, folder_id: int = None, admin_user: Use
     
     total_size_formatted = format_file_size(total_size)
     
-    # Calculate folder statistics for folders in current view
-    for folder in folders_in_current:
-        folder.file_count = db.query(Media).filter(Media.folder_id == folder.id).count()
-        folder.total_size = sum(media.file_size for media in db.query(Media).filter(Media.folder_id == folder.id).all())
-        folder.total_size_formatted = format_file_size(folder.total_size)
-    
-    # Calculate statistics for all folders (for sidebar)
+    # Folder statistics (folders_in_current is the same list as all_folders)
     for folder in all_folders:
-        folder.file_count = db.query(Media).filter(Media.folder_id == folder.id).count()
-        folder.total_size = sum(media.file_size for media in db.query(Media).filter(Media.folder_id == folder.id).all())
+        folder.file_count, folder.total_size = folder_stats.get(folder.id, (0, 0))
         folder.total_size_formatted = format_file_size(folder.total_size)
     
     return templates.TemplateResponse("admin/media.html", {
@@ -95,6 +84,7 @@ async def media_gallery(request: Request, folder_id: int = None, admin_user: Use
         "all_folders": all_folders,
         "current_folder": current_folder,
         "folder_id": folder_id,
+        "next_cursor": next_cursor,
         "format_datetime": lambda dt, fmt="%d.%m.%Y %H:%M": format_datetime_for_site(dt, db, fmt) if dt else "",
         "stats": {
             "total_files": total_files,
@@ -111,14 +101,18 @@ async def check_duplicate(
     admin_user: User = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
-    """Check if uploaded file is a duplicate"""
+    """Check if uploaded file is a duplicate, or (images) looks like an existing one"""
+    staged = None
     try:
-        # Read file content
-        file_content = await file.read()
-        
-        # Calculate hash
-        file_hash = calculate_file_hash(file_content)
-        file_size = len(file_content)
+        if (file.content_type or "").startswith("image/"):
+            # Images are staged (streamed and hashed the same way) so the perceptual hash can read the file
+            upload_dir = Path("uploads/media")
+            upload_dir.mkdir(parents=True, exist_ok=True)
+            staged = await stage_upload(file, upload_dir, MAX_FILE_SIZE)
+            file_hash, file_size = staged.sha256, staged.size
+        else:
+            # Hash while streaming instead of reading the whole file
+            file_hash, file_size = await hash_upload(file)
         
         # Check for duplicate
         duplicate = check_duplicate_media(file_hash, file_size, db)
@@ -126,25 +120,182 @@ async def check_duplicate(
         if duplicate:
             return JSONResponse({
                 "is_duplicate": True,
-                "duplicate_file": {
-                    "id": duplicate.id,
-                    "filename": duplicate.filename,
-                    "original_name": duplicate.original_name,
-                    "title": duplicate.title or duplicate.original_name,
-                    "file_size": format_file_size(duplicate.file_size),
-                    "url": f"/uploads/media/{duplicate.filename}",
-                    "created_at": duplicate.created_at.strftime('%d.%m.%Y %H:%M') if duplicate.created_at else ""
-                }
-            })
-        else:
-            return JSONResponse({
-                "is_duplicate": False,
-                "file_hash": file_hash,
-                "file_size": file_size
+                "duplicate_file": _duplicate_item(duplicate)
             })
+        
+        # Resized or re-encoded copies of existing images
+        similar = []
+        if staged is not None:
+            try:
+                perceptual_hash = await image_processor.perceptual_hash(staged.path)
+                similar = find_similar_media(db, perceptual_hash)
+            except Exception as hash_error:
+                print(f"Benzer resim kontrolü hatası: {hash_error!r}")
+        
+        return JSONResponse({
+            "is_duplicate": False,
+            "file_hash": file_hash,
+            "file_size": file_size,
+            "similar_files": [{**_duplicate_item(media), "distance": distance} for media, distance in similar]
+        })
             
     except Exception as e:
         return JSONResponse({"success": False, "error": str(e)})
+    finally:
+        if staged is not None:
+            staged.discard()
+
+def _duplicate_item(media: Media) -> dict:
+    return {
+        "id": media.id,
+        "filename": media.filename,
+        "original_name": media.original_name,
+        "title": media.title or media.original_name,
+        "file_size": format_file_size(media.file_size),
+        "url": f"/uploads/media/{media.filename}",
+        "created_at": media.created_at.strftime('%d.%m.%Y %H:%M') if media.created_at else ""
+    }
+
+def _upload_entry(media: Media) -> dict:
+    return {
+        "id": media.id,
+        "filename": media.filename,
+        "original_name": media.original_name,
+        "file_size": format_file_size(media.file_size),
+        "url": f"/uploads/media/{media.filename}"
+    }
+
+def _upload_skipped(file: UploadFile, reason: str) -> Tuple[str, dict]:
+    return "skipped", {"name": file.filename, "reason": reason}
+
+async def _store_upload(file: UploadFile, upload_dir: Path, folder_id, force_upload: bool, batch_hashes: set, db: Session) -> Tuple[str, dict]:
+    """
+    Stage, optimize and record one uploaded file.
+    
+    Returns ("stored", JSON entry), ("skipped", {"name", "reason"}) or
+    ("failed", {"name", "error"}); a failure rolls back only this file's
+    uncommitted rows.
+    """
+    staged = None
+    try:
+        # Validate file extension
+        file_ext = Path(file.filename).suffix.lower()
+        if file_ext not in ALLOWED_EXTENSIONS:
+            return _upload_skipped(file, "Desteklenmeyen dosya türü")
+        
+        # Stream to a temp file, hashing and enforcing the size limit on the way
+        try:
+            staged = await stage_upload(file, upload_dir, MAX_FILE_SIZE)
+        except UploadTooLarge:
+            return _upload_skipped(file, "Dosya boyutu sınırı aşıldı")
+        source_hash = staged.sha256
+        
+        # Get MIME type
+        mime_type, _ = mimetypes.guess_type(file.filename)
+        if not mime_type:
+            mime_type = "application/octet-stream"
+                
+        # Generate title from filename
+        auto_title = Path(file.filename).stem.replace('-', ' ').replace('_', ' ').title()
+        media_fields = {
+            "original_name": file.filename,
+            "title": auto_title,
+            "folder_id": folder_id if folder_id else None
+        }
+        
+        # Check for duplicate if not force upload (also within this batch)
+        if not force_upload:
+            if source_hash in batch_hashes or check_duplicate_media(source_hash, staged.size, db):
+                # Skip duplicate file
+                return _upload_skipped(file, "Aynı dosya zaten yüklü")
+            batch_hashes.add(source_hash)
+        
+        # Content already stored (forced duplicate): share its blob, nothing is written or processed
+        blob = find_blob(db, source_hash)
+        if blob is not None and acquire_blob(db, blob):
+            media = media_for_blob(db, blob, **media_fields)
+            db.commit()
+            variant_index.invalidate()
+            return "stored", _upload_entry(media)
+        
+        # Resim optimizasyonu (sadece resimler için)
+        processed_ext = file_ext
+        
+        if mime_type.startswith('image/') and file_ext in ['.jpg', '.jpeg', '.png', '.webp']:
+            try:
+                # Resmi işlemci havuzunda optimize et
+                original_size = staged.size
+                new_ext, optimized_size, optimized_hash = await image_processor.optimize_file(
+                    staged.path,
+                    file.filename,
+                    max_width=1920,  # Medium-large boyut
+                    max_height=1080,
+                    quality=85
+                )
+                staged.mark_rewritten(optimized_size, optimized_hash)
+                processed_ext = new_ext
+                
+                # Optimize edilmiş MIME type
+                if new_ext == '.jpg':
+                    mime_type = 'image/jpeg'
+                elif new_ext == '.png':
+                    mime_type = 'image/png'
+                elif new_ext == '.webp':
+                    mime_type = 'image/webp'
+                    
+                print(f"Resim optimize edildi: {original_size} -> {staged.size} bytes")
+                
+            except Exception as opt_error:
+                print(f"Resim optimizasyon hatası: {opt_error!r}")
+                # Optimizasyon başarısızsa orijinal dosyayı kullan
+                processed_ext = file_ext
+        
+        # Extract image metadata from the stored file's header
+        image_width, image_height = None, None
+        if mime_type.startswith('image/'):
+            image_width, image_height = read_image_size(staged.path)
+        if image_width:
+            # Only near-duplicate lookup depends on the hash; the upload goes through without it
+            try:
+                media_fields["perceptual_hash"] = await image_processor.perceptual_hash(staged.path)
+            except Exception as hash_error:
+                print(f"Algısal hash hatası: {hash_error!r}")
+        
+        # The optimized output may already be stored under another upload's source digest;
+        # otherwise move it into the content-addressed store. No awaits until the commit,
+        # so concurrent uploads of this batch never see each other's uncommitted rows.
+        blob = find_blob(db, staged.sha256) if staged.sha256 != source_hash else None
+        if blob is None or not acquire_blob(db, blob):
+            blob = store_blob(db, staged, processed_ext, mime_type, image_width, image_height, source_sha256=source_hash)
+        stored = blob.ref_count == 1
+        media = media_for_blob(db, blob, **media_fields)
+        db.commit()
+        
+        if not stored:
+            variant_index.invalidate()
+            return "stored", _upload_entry(media)
+        perceptual_index.invalidate()
+        
+        # Responsive widths are generated once per stored file, right after it is stored
+        variants = []
+        try:
+            variants = await generate_variants(media, db)
+        except Exception as variant_error:
+            print(f"Varyant oluşturma hatası: {variant_error!r}")
+        sibling_encoder.schedule([Path(media.file_path)] + [VARIANT_DIR / variant.filename for variant in variants])
+        
+        return "stored", _upload_entry(media)
+        
+    except Exception as e:
+        # The session is shared by the whole batch: leave it usable for the other files.
+        # Only this file's rows can be pending, since no upload awaits between flush and commit.
+        db.rollback()
+        print(f"Dosya yükleme hatası ({file.filename}): {e!r}")
+        return "failed", {"name": file.filename, "error": str(e)}
+    finally:
+        if staged is not None:
+            staged.discard()
+        await file.close()
 
 @router.post("/media/upload")
 async def upload_media(
@@ -155,127 +306,31 @@ async def upload_media(
     admin_user: User = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
-    uploaded_files = []
-    
     # Create uploads directory if it doesn't exist
     upload_dir = Path("uploads/media")
     upload_dir.mkdir(parents=True, exist_ok=True)
     
-    for file in files:
-        try:
-            # Validate file extension
-            file_ext = Path(file.filename).suffix.lower()
-            if file_ext not in ALLOWED_EXTENSIONS:
-                continue
-            
-            # Validate file size
-            file_content = await file.read()
-            if len(file_content) > MAX_FILE_SIZE:
-                continue
-            
-            # Get MIME type
-            mime_type, _ = mimetypes.guess_type(file.filename)
-            if not mime_type:
-                mime_type = "application/octet-stream"
-                
-            # Extract image metadata if it's an image
-            image_width, image_height = None, None
-            if mime_type.startswith('image/'):
-                try:
-                    with Image.open(io.BytesIO(file_content)) as img:
-                        image_width, image_height = img.size
-                except Exception:
-                    pass
-                    
-            # Generate title from filename
-            auto_title = Path(file.filename).stem.replace('-', ' ').replace('_', ' ').title()
-            
-            # Calculate file hash for duplicate detection
-            file_hash = calculate_file_hash(file_content)
-            
-            # Check for duplicate if not force upload
-            if not force_upload:
-                duplicate = check_duplicate_media(file_hash, len(file_content), db)
-                if duplicate:
-                    # Skip duplicate file
-                    continue
-            
-            # Resim optimizasyonu (sadece resimler için)
-            processed_content = file_content
-            processed_ext = file_ext
-            
-            if mime_type.startswith('image/') and file_ext in ['.jpg', '.jpeg', '.png', '.webp']:
-                try:
-                    # Resmi optimize et
-                    optimized_bytes, new_ext = optimize_uploaded_image(
-                        file_content, 
-                        file.filename,
-                        max_width=1920,  # Medium-large boyut
-                        max_height=1080,
-                        quality=85
-                    )
-                    processed_content = optimized_bytes
-                    processed_ext = new_ext
-                    
-                    # Optimize edilmiş MIME type
-                    if new_ext == '.jpg':
-                        mime_type = 'image/jpeg'
-                    elif new_ext == '.png':
-                        mime_type = 'image/png'
-                    elif new_ext == '.webp':
-                        mime_type = 'image/webp'
-                        
-                    print(f"Resim optimize edildi: {len(file_content)} -> {len(processed_content)} bytes")
-                    
-                except Exception as opt_error:
-                    print(f"Resim optimizasyon hatası: {opt_error}")
-                    # Optimizasyon başarısızsa orijinal dosyayı kullan
-                    processed_content = file_content
-                    processed_ext = file_ext
-            
-            # Generate unique filename with processed extension
-            unique_filename = f"{uuid.uuid4()}{processed_ext}"
-            file_path = upload_dir / unique_filename
-            
-            # Save processed file
-            with open(file_path, "wb") as buffer:
-                buffer.write(processed_content)
-            
-            # Recalculate hash for processed content (in case image was optimized)
-            final_file_hash = calculate_file_hash(processed_content)
-            
-            # Save to database
-            media = Media(
-                filename=unique_filename,
-                original_name=file.filename,
-                title=auto_title,
-                file_path=str(file_path),
-                file_size=len(processed_content),  # Processed size
-                mime_type=mime_type,
-                width=image_width,
-                height=image_height,
-                file_hash=final_file_hash,
-                folder_id=folder_id if folder_id else None
-            )
-            
-            db.add(media)
-            db.commit()
-            
-            uploaded_files.append({
-                "id": media.id,
-                "filename": media.filename,
-                "original_name": media.original_name,
-                "file_size": format_file_size(media.file_size),
-                "url": f"/uploads/media/{unique_filename}"
-            })
-            
-        except Exception as e:
-            continue
-    
-    return JSONResponse({
-        "success": True,
-        "files": uploaded_files
-    })
+    # Files are processed concurrently so image jobs fan out across the worker pool;
+    # the session is only touched between awaits, never concurrently
+    batch_hashes = set()
+    results = await asyncio.gather(*(
+        _store_upload(file, upload_dir, folder_id, force_upload, batch_hashes, db) for file in files
+    ))
+    outcomes = {"stored": [], "skipped": [], "failed": []}
+    for status, payload in results:
+        outcomes[status].append(payload)
+    uploaded_files, skipped, failed = outcomes["stored"], outcomes["skipped"], outcomes["failed"]
+    
+    # Skips (duplicates, type, size) are expected; failures are reported as an error
+    response = {
+        "success": not failed,
+        "files": uploaded_files,
+        "skipped": skipped,
+        "failed": failed
+    }
+    if failed:
+        response["error"] = f"{len(failed)} dosya yüklenemedi: " + ", ".join(problem["name"] for problem in failed)
+    return JSONResponse(response)
 
 @router.post("/media/upload-url")
 async def upload_from_url(
@@ -315,10 +370,6 @@ async def upload_from_url(
         upload_dir = Path("uploads/media")
         upload_dir.mkdir(parents=True, exist_ok=True)
         
-        # Generate unique filename
-        unique_filename = f"{uuid.uuid4()}{file_ext}"
-        file_path = upload_dir / unique_filename
-        
         # Download file to memory first
         downloaded_chunks = []
         total_size = 0
@@ -334,26 +385,38 @@ async def upload_from_url(
         
         # Combine chunks
         file_content = b''.join(downloaded_chunks)
+        source_hash = calculate_file_hash(file_content)
         
         # Get MIME type
-        mime_type, _ = mimetypes.guess_type(str(file_path))
+        mime_type, _ = mimetypes.guess_type(f"downloaded{file_ext}")
         if not mime_type:
             mime_type = "application/octet-stream"
             
-        # Extract image metadata if it's an image
-        image_width, image_height = None, None
-        if mime_type.startswith('image/'):
-            try:
-                with Image.open(io.BytesIO(file_content)) as img:
-                    image_width, image_height = img.size
-            except Exception:
-                pass
-                
         # Generate title from URL filename
         auto_title = Path(parsed_url.path).stem.replace('-', ' ').replace('_', ' ').title()
         if not auto_title or auto_title == '':
             auto_title = "Downloaded Image"
         
+        media_fields = {
+            "original_name": Path(parsed_url.path).name or "downloaded_file",
+            "title": auto_title,
+            "alt_text": alt_text
+        }
+        
+        def uploaded(media: Media) -> JSONResponse:
+            return JSONResponse({
+                "success": True,
+                "file": {**_upload_entry(media), "alt_text": alt_text}
+            })
+        
+        # Already downloaded before: share the stored blob instead of processing it again
+        blob = find_blob(db, source_hash)
+        if blob is not None and acquire_blob(db, blob):
+            media = media_for_blob(db, blob, **media_fields)
+            db.commit()
+            variant_index.invalidate()
+            return uploaded(media)
+        
         # Resim optimizasyonu (sadece resimler için)
         processed_content = file_content
         processed_ext = file_ext
@@ -361,7 +424,7 @@ async def upload_from_url(
         if mime_type.startswith('image/') and file_ext in ['.jpg', '.jpeg', '.png', '.webp']:
             try:
                 # URL'den indirilen resmi optimize et
-                optimized_bytes, new_ext = optimize_uploaded_image(
+                optimized_bytes, new_ext = await image_processor.optimize_bytes(
                     file_content, 
                     f"downloaded{file_ext}",
                     max_width=1920,
@@ -381,53 +444,45 @@ async def upload_from_url(
                 
                 print(f"URL resmi optimize edildi: {len(file_content)} -> {len(processed_content)} bytes")
                 
-                # Update filename with new extension
-                unique_filename = f"{uuid.uuid4()}{processed_ext}"
-                file_path = upload_dir / unique_filename
-                
             except Exception as opt_error:
                 print(f"URL resim optimizasyon hatası: {opt_error}")
                 # Optimizasyon başarısızsa orijinal dosyayı kullan
                 processed_content = file_content
         
-        # Save processed file
-        with open(file_path, "wb") as f:
-            f.write(processed_content)
-        
-        file_size = len(processed_content)
-        
-        # Calculate hash for processed content
-        final_file_hash = calculate_file_hash(processed_content)
-        
-        # Save to database
-        original_name = Path(parsed_url.path).name or "downloaded_file"
-        media = Media(
-            filename=unique_filename,
-            original_name=original_name,
-            title=auto_title,
-            file_path=str(file_path),
-            file_size=file_size,
-            mime_type=mime_type,
-            width=image_width,
-            height=image_height,
-            file_hash=final_file_hash,
-            alt_text=alt_text
-        )
+        staged = stage_bytes(processed_content, upload_dir)
+        try:
+            # Extract image metadata from the stored (optimized) file's header
+            image_width, image_height = None, None
+            if mime_type.startswith('image/'):
+                image_width, image_height = read_image_size(staged.path)
+            if image_width:
+                try:
+                    media_fields["perceptual_hash"] = await image_processor.perceptual_hash(staged.path)
+                except Exception as hash_error:
+                    print(f"URL resmi algısal hash hatası: {hash_error!r}")
+            
+            blob = find_blob(db, staged.sha256) if staged.sha256 != source_hash else None
+            if blob is None or not acquire_blob(db, blob):
+                blob = store_blob(db, staged, processed_ext, mime_type, image_width, image_height, source_sha256=source_hash)
+            stored = blob.ref_count == 1
+            media = media_for_blob(db, blob, **media_fields)
+            db.commit()
+        finally:
+            staged.discard()
         
-        db.add(media)
-        db.commit()
+        if not stored:
+            variant_index.invalidate()
+            return uploaded(media)
+        perceptual_index.invalidate()
         
-        return JSONResponse({
-            "success": True,
-            "file": {
-                "id": media.id,
-                "filename": media.filename,
-                "original_name": media.original_name,
-                "file_size": format_file_size(media.file_size),
-                "url": f"/uploads/media/{unique_filename}",
-                "alt_text": alt_text
-            }
-        })
+        variants = []
+        try:
+            variants = await generate_variants(media, db)
+        except Exception as variant_error:
+            print(f"URL resmi varyant hatası: {variant_error!r}")
+        sibling_encoder.schedule([Path(media.file_path)] + [VARIANT_DIR / variant.filename for variant in variants])
+        
+        return uploaded(media)
         
     except Exception as e:
         return JSONResponse({"success": False, "error": str(e)})
@@ -462,16 +517,17 @@ async def delete_media(
     if not media:
         raise HTTPException(status_code=404, detail="Media not found")
     
-    # Delete file from filesystem
-    try:
-        if os.path.exists(media.file_path):
-            os.unlink(media.file_path)
-    except:
-        pass
+    file_path = Path(media.file_path)
+    variant_files = [variant.filename for variant in media.variants]
     
-    # Delete from database
+    # Delete from database (variant rows cascade); the file goes with the blob's last reference
     db.delete(media)
+    last_reference = release_blob(db, media.blob_id)
     db.commit()
+    variant_index.invalidate()
+    
+    if last_reference:
+        delete_media_files(file_path, variant_files)
     
     return JSONResponse({"success": True})
 
@@ -491,199 +547,111 @@ async def bulk_delete_media(
         # Get media files to delete
         media_files = db.query(Media).filter(Media.id.in_(media_ids)).all()
         
-        # Delete files from filesystem
-        for media in media_files:
-            try:
-                if os.path.exists(media.file_path):
-                    os.unlink(media.file_path)
-            except:
-                pass
+        stored_files = [
+            (media.blob_id, Path(media.file_path), [variant.filename for variant in media.variants])
+            for media in media_files
+        ]
         
-        # Delete from database
+        # Delete from database (bulk deletes skip ORM cascades, so variants go explicitly)
+        db.query(MediaVariant).filter(MediaVariant.media_id.in_(media_ids)).delete(synchronize_session=False)
         db.query(Media).filter(Media.id.in_(media_ids)).delete(synchronize_session=False)
+        # Files go only with their blob's last reference (duplicates may share one)
+        unreferenced = [
+            (file_path, variant_files) for blob_id, file_path, variant_files in stored_files
+            if release_blob(db, blob_id)
+        ]
         db.commit()
+        variant_index.invalidate()
+        
+        for file_path, variant_files in unreferenced:
+            delete_media_files(file_path, variant_files)
         
         return JSONResponse({"success": True, "deleted_count": len(media_files)})
         
     except Exception as e:
         return JSONResponse({"success": False, "error": str(e)})
 
+def _media_item(media: Media, db: Session) -> dict:
+    return {
+        "id": media.id,
+        "filename": media.filename,
+        "original_name": media.original_name,
+        "title": media.title or "",
+        "description": media.description or "",
+        "url": f"/uploads/media/{media.filename}",
+        "thumb_url": f"/img/{media.id}/{PICKER_THUMB_SIZE}.webp" if derivative_cache.supports(media) else None,
+        "file_size": format_file_size(media.file_size),
+        "file_size_bytes": media.file_size or 0,
+        "alt_text": media.alt_text or "",
+        "mime_type": media.mime_type,
+        "width": media.width or 0,
+        "height": media.height or 0,
+        "created_at": format_datetime_for_site(media.created_at, db) if media.created_at else "",
+        "type": "media"
+    }
+
+def _folder_item(folder: MediaFolder, file_count: int, db: Session) -> dict:
+    return {
+        "id": folder.id,
+        "name": folder.name,
+        "description": folder.description or "",
+        "color": folder.color,
+        "file_count": file_count,
+        "created_at": format_datetime_for_site(folder.created_at, db) if folder.created_at else "",
+        "type": "folder"
+    }
+
 @router.get("/media/search")
 async def search_media(
     request: Request,
     q: str = "",
     folder_id: int = None,
-    page: int = 1,
-    per_page: int = 20,
+    cursor: Optional[str] = None,
+    per_page: int = Query(DEFAULT_MEDIA_PER_PAGE, ge=1, le=MAX_MEDIA_PER_PAGE),
     admin_user: User = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
-    """Search media files and folders by title, filename, description, alt_text, folder name"""
+    """
+    Media library page, newest first, with optional search (title, filename,
+    description, alt_text, MIME type, folder name).
+    
+    Without a query the current folder (or the root) is listed; a query from
+    the root searches every folder. Pass `next_cursor` back as `cursor` for
+    the next page. Matching folders are only returned with the first page.
+    """
+    q = q.strip()
+    searching = bool(q)
+    
     try:
-        print(f"Search request - q: '{q}', folder_id: '{folder_id}', page: {page}, per_page: {per_page}")
-        from sqlalchemy import or_, and_
-        
-        # If no search query, return current folder contents
-        if not q or not q.strip():
-            # Base query for media files
-            query = db.query(Media)
-            
-            # Apply folder filter if specified
-            if folder_id is not None:
-                query = query.filter(Media.folder_id == folder_id)
-            else:
-                query = query.filter(Media.folder_id == None)
-            
-            # Get folders in current location (for empty search)
-            if folder_id is None:
-                folders_in_current = db.query(MediaFolder).order_by(MediaFolder.name).all()
-            else:
-                folders_in_current = []  # Nested folders not implemented yet
-            
-            # Apply pagination and ordering for media files
-            offset = (page - 1) * per_page
-            all_media_files = query.order_by(Media.created_at.desc()).offset(offset).limit(per_page).all()
-            
-            # Filter out media files that don't exist on filesystem
-            media_files = []
-            for media in all_media_files:
-                if os.path.exists(media.file_path):
-                    media_files.append(media)
-                    
-            return JSONResponse({
-                "media": [{
-                    "id": media.id,
-                    "filename": media.filename,
-                    "original_name": media.original_name,
-                    "title": media.title or "",
-                    "description": media.description or "",
-                    "url": f"/uploads/media/{media.filename}",
-                    "file_size": format_file_size(media.file_size),
-                    "alt_text": media.alt_text or "",
-                    "mime_type": media.mime_type,
-                    "width": media.width or 0,
-                    "height": media.height or 0,
-                    "created_at": format_datetime_for_site(media.created_at, db) if media.created_at else "",
-                    "type": "media"
-                } for media in media_files],
-                "folders": [{
-                    "id": folder.id,
-                    "name": folder.name,
-                    "description": folder.description or "",
-                    "color": folder.color,
-                    "file_count": db.query(Media).filter(Media.folder_id == folder.id).count(),
-                    "created_at": format_datetime_for_site(folder.created_at, db) if folder.created_at else "",
-                    "type": "folder"
-                } for folder in folders_in_current],
-                "total": len(media_files) + len(folders_in_current),
-                "page": page,
-                "per_page": per_page,
-                "has_more": len(media_files) == per_page
-            })
-        
-        # Search both media files and folders when query is provided
-        search_term = f"%{q.strip()}%"
-        
-        # Search media files
-        media_query = db.query(Media)
-        if folder_id is not None:
-            media_query = media_query.filter(Media.folder_id == folder_id)
-        
-        media_query = media_query.filter(
-            or_(
-                Media.title.ilike(search_term),
-                Media.original_name.ilike(search_term),
-                Media.description.ilike(search_term),
-                Media.alt_text.ilike(search_term),
-                Media.mime_type.ilike(search_term)
-            )
+        media_files, next_cursor = load_media_page(
+            db,
+            folder_id=folder_id,
+            q=q,
+            cursor=cursor,
+            limit=per_page,
+            all_folders=searching and folder_id is None
         )
-        
-        # Search folders (only if not inside a specific folder or search across all)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    folders = []
+    if cursor is None and folder_id is None:
+        # Nested folders are not implemented, so folders only appear at the root
         folders_query = db.query(MediaFolder)
-        if not folder_id:  # Search all folders when in root
-            folders_query = folders_query.filter(
-                or_(
-                    MediaFolder.name.ilike(search_term),
-                    MediaFolder.description.ilike(search_term)
-                )
-            )
-        else:
-            # When inside a folder, don't show other folders in search results
-            folders_query = folders_query.filter(MediaFolder.id == -1)  # No results
-        
-        # Get results
-        all_media_files = media_query.order_by(Media.created_at.desc()).all()
+        if searching:
+            term = f"%{q}%"
+            folders_query = folders_query.filter(or_(MediaFolder.name.ilike(term), MediaFolder.description.ilike(term)))
         matching_folders = folders_query.order_by(MediaFolder.name).all()
-        
-        # Filter out media files that don't exist on filesystem
-        media_files = []
-        for media in all_media_files:
-            if os.path.exists(media.file_path):
-                media_files.append(media)
-        
-        # Calculate folder statistics
-        for folder in matching_folders:
-            folder.file_count = db.query(Media).filter(Media.folder_id == folder.id).count()
-        
-        print(f"Search found {len(media_files)} media files, {len(matching_folders)} folders")
-        
-        # Combine results
-        all_results = []
-        
-        # Add folders first
-        for folder in matching_folders:
-            all_results.append({
-                "id": folder.id,
-                "name": folder.name,
-                "description": folder.description or "",
-                "color": folder.color,
-                "file_count": folder.file_count,
-                "created_at": format_datetime_for_site(folder.created_at, db) if folder.created_at else "",
-                "type": "folder"
-            })
-        
-        # Add media files
-        for media in media_files:
-            all_results.append({
-                "id": media.id,
-                "filename": media.filename,
-                "original_name": media.original_name,
-                "title": media.title or "",
-                "description": media.description or "",
-                "url": f"/uploads/media/{media.filename}",
-                "file_size": format_file_size(media.file_size),
-                "alt_text": media.alt_text or "",
-                "mime_type": media.mime_type,
-                "width": media.width or 0,
-                "height": media.height or 0,
-                "created_at": format_datetime_for_site(media.created_at, db) if media.created_at else "",
-                "type": "media"
-            })
-        
-        # Apply pagination to combined results
-        offset = (page - 1) * per_page
-        paginated_results = all_results[offset:offset + per_page]
-        
-        return JSONResponse({
-            "results": paginated_results,
-            "total": len(all_results),
-            "page": page,
-            "per_page": per_page,
-            "has_more": len(all_results) > (page * per_page)
-        })
-        
-    except Exception as e:
-        print(f"Search error: {e}")
-        return JSONResponse({
-            "success": False,
-            "error": str(e),
-            "media": [],
-            "total": 0,
-            "page": 1,
-            "per_page": per_page,
-            "has_more": False
-        })
+        folder_stats = get_media_folder_stats(db) if matching_folders else {}
+        folders = [_folder_item(folder, folder_stats.get(folder.id, (0, 0))[0], db) for folder in matching_folders]
+    
+    return JSONResponse({
+        "media": [_media_item(media, db) for media in media_files],
+        "folders": folders,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+        "per_page": per_page
+    })
 
 @router.get("/media/api")
 async def get_media_api(
@@ -694,7 +662,7 @@ async def get_media_api(
     db: Session = Depends(get_db)
 ):
     offset = (page - 1) * per_page
-    media_files = db.query(Media).order_by(Media.created_at.desc()).offset(offset).limit(per_page).all()
+    media_files = db.query(Media).filter(Media.is_missing == False).order_by(Media.created_at.desc()).offset(offset).limit(per_page).all()
     
     return JSONResponse({
         "media": [{
@@ -704,6 +672,7 @@ async def get_media_api(
             "title": media.title or "",
             "description": media.description or "",
             "url": f"/uploads/media/{media.filename}",
+            "thumb_url": f"/img/{media.id}/{PICKER_THUMB_SIZE}.webp" if derivative_cache.supports(media) else None,
             "file_size": format_file_size(media.file_size),
             "alt_text": media.alt_text or "",
             "mime_type": media.mime_type,
@@ -711,6 +680,17 @@ async def get_media_api(
         } for media in media_files]
     })
 
+@router.get("/media/integrity")
+async def media_integrity_report(admin_user: User = Depends(get_admin_user), db: Session = Depends(get_db)):
+    """Last file-presence scan: missing rows and orphan files (files with no media row), plus blob sharing"""
+    return JSONResponse({**media_scanner.report(), "blob_store": blob_store_stats(db)})
+
+@router.post("/media/integrity/scan")
+async def media_integrity_scan(admin_user: User = Depends(get_admin_user), db: Session = Depends(get_db)):
+    """Reconcile media rows with uploads/media now instead of waiting for the next scan"""
+    await media_scanner.scan_now()
+    return JSONResponse({**media_scanner.report(), "blob_store": blob_store_stats(db)})
+
 # Folder Management Routes
 @router.post("/media/folders/create")
 async def create_folder(
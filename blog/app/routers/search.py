@@ -1,19 +1,27 @@
 from fastapi import APIRouter, Depends, Request, Query, HTTPException
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
-from app.core.database import get_db
-from app.core.auth import get_current_user_optional
-from app.models.models import Post, Category, Tag, PostTag, Settings
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_, and_
+from app.core.database import get_db, get_async_db
+from app.core.auth import get_current_user_optional_async
+from app.core.settings_cache import settings_cache
+from app.models.models import Post, Category, Tag, PostTag
+from app.utils.search_engine import search_engine
+from app.utils.suggestion_index import suggestion_index
+from app.utils.http_cache import site_version, make_etag, viewer_key, not_modified, set_validators, finalize
 from typing import Optional
 
 router = APIRouter(tags=["search"])
 templates = Jinja2Templates(directory="templates")
 
-def get_template_context(request: Request, db: Session, current_user=None):
+# Relationships the public result templates and JSON read
+RESULT_LOADERS = (selectinload(Post.author), selectinload(Post.category))
+
+async def get_template_context(request: Request, db: AsyncSession, current_user=None):
     """Get common template context including site settings"""
-    site_settings = db.query(Settings).first()
+    site_settings = await db.run_sync(settings_cache.get)
     context = {
         "request": request,
         "site_settings": site_settings
@@ -27,28 +35,36 @@ async def search_page(
     request: Request,
     q: str = Query("", description="Search query"),
     category: Optional[str] = Query(None, description="Category filter"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Search page with results"""
     try:
-        current_user = get_current_user_optional(request, db)
+        current_user = await get_current_user_optional_async(request, db)
+        
+        # Results only change when posts, taxonomy or settings do
+        site_token = await db.run_sync(site_version)
+        etag = make_etag("search", q, category, site_token, viewer_key(current_user))
+        unchanged = not_modified(request, etag, private=current_user is not None)
+        if unchanged:
+            return unchanged
+        
         results = []
         categories = []
         
         # Get categories safely
         try:
-            categories = db.query(Category).all()
+            categories = (await db.scalars(select(Category))).all()
         except:
             categories = []
         
         # Search if query provided
         if q.strip():
             try:
-                results = search_posts(db, q, category)
+                results = await db.run_sync(search_posts, q, category)
             except:
                 results = []
         
-        context = get_template_context(request, db, current_user)
+        context = await get_template_context(request, db, current_user)
         context.update({
             "query": q,
             "category_filter": category,
@@ -56,7 +72,8 @@ async def search_page(
             "categories": categories,
             "result_count": len(results)
         })
-        return templates.TemplateResponse("blog/search.html", context)
+        response = templates.TemplateResponse("blog/search.html", context)
+        return set_validators(response, etag, private=current_user is not None)
         
     except Exception as e:
         print(f"Search page error: {e}")
@@ -66,10 +83,11 @@ async def search_page(
 
 @router.get("/api/search")
 async def search_api(
+    request: Request,
     q: str = Query("", description="Search query"),
     category: Optional[str] = Query(None, description="Category filter"),
     limit: int = Query(10, description="Results limit"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """API endpoint for search"""
     if not q.strip():
@@ -79,9 +97,15 @@ async def search_api(
             "results": []
         })
     
-    results = search_posts(db, q, category, limit)
+    site_token = await db.run_sync(site_version)
+    etag = make_etag("api-search", q, category, limit, site_token)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
     
-    return JSONResponse({
+    results = await db.run_sync(search_posts, q, category, limit)
+    
+    response = JSONResponse({
         "success": True,
         "query": q,
         "category": category,
@@ -90,6 +114,8 @@ async def search_api(
             "title": post.title,
             "slug": post.slug,
             "excerpt": post.excerpt,
+            "title_highlight": getattr(post, "search_title", None),
+            "snippet": getattr(post, "search_snippet", None),
             "category": post.category.name if post.category else None,
             "category_slug": post.category.slug if post.category else None,
             "author": post.author.username,
@@ -98,24 +124,36 @@ async def search_api(
             "url": f"/post/{post.slug}"
         } for post in results]
     })
+    return set_validators(response, etag)
 
 def search_posts(db: Session, query: str, category_filter: Optional[str] = None, limit: int = 50):
-    """Search posts by title, content, and tags - simplified"""
+    """Search published posts by title, excerpt, content and tags (FTS5 with LIKE fallback)
+
+    Author and category are loaded eagerly so results stay usable after an
+    async caller's `run_sync` returns.
+    """
     try:
         search_pattern = f"%{query.strip()}%"
         
         # Base query for published posts
-        base_query = db.query(Post).filter(Post.is_published == True)
+        base_query = db.query(Post).options(*RESULT_LOADERS).filter(Post.is_published == True)
+        category_id = None
         
         # Category filter
         if category_filter:
             try:
                 category = db.query(Category).filter(Category.slug == category_filter).first()
                 if category:
+                    category_id = category.id
                     base_query = base_query.filter(Post.category_id == category.id)
             except:
                 pass
         
+        # Ranked full-text search when the FTS5 index is available
+        results = search_engine.search_posts(db, query, options=RESULT_LOADERS, limit=limit, published=True, category_id=category_id)
+        if results is not None:
+            return results
+        
         # Simple search in title and content
         try:
             results = base_query.filter(
@@ -136,41 +174,18 @@ def search_posts(db: Session, query: str, category_filter: Optional[str] = None,
 
 @router.get("/api/search/suggestions")
 async def search_suggestions(
+    request: Request,
     q: str = Query("", description="Search query"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get search suggestions"""
+    """Get search suggestions from the in-memory prefix index"""
     if len(q.strip()) < 2:
         return JSONResponse({"suggestions": []})
     
-    # Get post titles that match
-    post_suggestions = db.query(Post.title).filter(
-        Post.is_published == True,
-        Post.title.ilike(f"%{q}%")
-    ).limit(5).all()
-    
-    # Get category names that match
-    category_suggestions = db.query(Category.name).filter(
-        Category.name.ilike(f"%{q}%")
-    ).limit(3).all()
-    
-    suggestions = []
-    
-    # Add post titles
-    for post in post_suggestions:
-        suggestions.append({
-            "text": post.title,
-            "type": "post"
-        })
+    suggestions = await db.run_sync(suggestion_index.suggest, q)
     
-    # Add categories
-    for category in category_suggestions:
-        suggestions.append({
-            "text": category.name,
-            "type": "category"
-        })
-    
-    return JSONResponse({"suggestions": suggestions[:8]})
+    # Answered from memory, so a body hash is cheaper than a version query
+    return finalize(request, JSONResponse({"suggestions": suggestions}))
 
 # Admin search routes
 admin_router = APIRouter(prefix="/admin", tags=["admin-search"])
@@ -185,22 +200,28 @@ async def admin_search_posts(
     if not q.strip():
         return JSONResponse({"results": []})
     
-    query_obj = db.query(Post)
-    
     # Status filter
+    published = None
     if status == "published":
-        query_obj = query_obj.filter(Post.is_published == True)
+        published = True
     elif status == "draft":
-        query_obj = query_obj.filter(Post.is_published == False)
+        published = False
     
-    # Search
-    search_pattern = f"%{q}%"
-    results = query_obj.filter(
-        or_(
-            Post.title.ilike(search_pattern),
-            Post.content.ilike(search_pattern)
-        )
-    ).order_by(Post.created_at.desc()).limit(20).all()
+    results = search_engine.search_posts(db, q, limit=20, published=published)
+    
+    if results is None:
+        query_obj = db.query(Post)
+        if published is not None:
+            query_obj = query_obj.filter(Post.is_published == published)
+        
+        # Search
+        search_pattern = f"%{q}%"
+        results = query_obj.filter(
+            or_(
+                Post.title.ilike(search_pattern),
+                Post.content.ilike(search_pattern)
+            )
+        ).order_by(Post.created_at.desc()).limit(20).all()
     
     return JSONResponse({
         "results": [{
@@ -208,6 +229,7 @@ async def admin_search_posts(
             "title": post.title,
             "slug": post.slug,
             "status": "Yayında" if post.is_published else "Taslak",
+            "snippet": getattr(post, "search_snippet", None),
             "created_at": post.created_at.strftime('%d.%m.%Y'),
             "url": f"/admin/posts/{post.id}/edit"
         } for post in results]
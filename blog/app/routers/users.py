@@ -2,9 +2,14 @@ from fastapi import APIRouter, Depends, HTTPException, Request, Form
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from app.core.database import get_db
-from app.core.auth import get_current_user, get_current_user_optional, verify_password, get_password_hash
-from app.models.models import User, Post, PostLike, Comment, Settings
+from app.core.auth import get_current_user, get_current_user_optional, verify_password_async, get_password_hash_async
+from app.core.settings_cache import settings_cache
+from app.core.user_cache import user_cache
+from app.models.models import User, Post, PostLike, Comment
+from app.utils.like_counter import like_counter
 from typing import Optional
 
 router = APIRouter(tags=["users"])
@@ -12,7 +17,7 @@ templates = Jinja2Templates(directory="templates")
 
 def get_template_context(request: Request, db: Session, current_user=None):
     """Get common template context including site settings"""
-    site_settings = db.query(Settings).first()
+    site_settings = settings_cache.get(db)
     context = {
         "request": request,
         "site_settings": site_settings
@@ -51,9 +56,9 @@ async def user_profile(
         Comment.is_approved == True
     ).count()
     
-    total_likes = db.query(PostLike).join(Post).filter(
+    total_likes = db.query(func.coalesce(func.sum(Post.like_count), 0)).filter(
         Post.author_id == user.id
-    ).count()
+    ).scalar()
     
     context = get_template_context(request, db, current_user)
     context.update({
@@ -116,6 +121,7 @@ async def update_profile_settings(
         current_user.session_duration = session_duration
     
     db.commit()
+    user_cache.invalidate(current_user.username)
     
     return RedirectResponse(url="/settings?success=1", status_code=303)
 
@@ -131,7 +137,8 @@ async def change_password(
     """Change user password"""
     
     # Verify current password
-    if not verify_password(current_password, current_user.hashed_password):
+    valid, _ = await verify_password_async(current_password, current_user.hashed_password)
+    if not valid:
         available_images = [
             "/static/images/avatars/avatar1.svg",
             "/static/images/avatars/avatar2.svg",
@@ -165,8 +172,9 @@ async def change_password(
         return templates.TemplateResponse("blog/profile_settings.html", context)
     
     # Update password
-    current_user.hashed_password = get_password_hash(new_password)
+    current_user.hashed_password = await get_password_hash_async(new_password)
     db.commit()
+    user_cache.invalidate(current_user.username)
     
     return RedirectResponse(url="/settings?password_changed=1", status_code=303)
 
@@ -193,16 +201,21 @@ async def like_post(
         # Unlike
         db.delete(existing_like)
         db.commit()
+        like_counter.add(post_id, -1)
         liked = False
     else:
-        # Like
+        # Like - the unique (user_id, post_id) index rejects concurrent double likes
         new_like = PostLike(user_id=current_user.id, post_id=post_id)
         db.add(new_like)
-        db.commit()
+        try:
+            db.commit()
+            like_counter.add(post_id, 1)
+        except IntegrityError:
+            db.rollback()
         liked = True
     
-    # Get updated like count
-    like_count = db.query(PostLike).filter(PostLike.post_id == post_id).count()
+    # Counter is flushed in the background; include this worker's pending delta
+    like_count = like_counter.get_count(db, post_id)
     
     return JSONResponse({
         "success": True,
@@ -223,7 +236,7 @@ async def get_like_status(
         PostLike.post_id == post_id
     ).first() is not None
     
-    like_count = db.query(PostLike).filter(PostLike.post_id == post_id).count()
+    like_count = like_counter.get_count(db, post_id)
     
     return JSONResponse({
         "liked": liked,
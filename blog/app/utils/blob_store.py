@@ -0,0 +1,199 @@
+"""
+Content-addressed storage for media files.
+
+Each distinct stored file lives once, at
+uploads/media/blobs/<aa>/<sha256><ext> (sharded by the first two hex digits
+of the SHA-256 of the stored bytes), and is recorded in `media_blobs` with a
+reference count. Media rows point at their blob through `blob_id` and keep
+`filename`/`file_path` pointing at the blob file, so URLs, width variants
+(named after the file stem, i.e. the digest), WebP/AVIF siblings and the
+derivative cache work unchanged and are shared by every row of a blob.
+
+Blobs are found by the digest of the stored bytes and by the digest of the
+bytes as uploaded (before optimization), so uploading the same file again
+costs no disk and no image processing: the new Media row takes another
+reference and copies the variant rows. Deleting a Media row drops its
+reference; the file, its siblings and its variants are removed only when
+the count reaches zero.
+
+Rows from before the blob store (`blob_id` NULL) own their file outright.
+"""
+
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import delete, func, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.models import Media, MediaBlob, MediaVariant
+from app.utils.media_variants import delete_variant_files
+from app.utils.modern_formats import delete_siblings
+from app.utils.upload_stream import StagedUpload
+
+MEDIA_DIR = Path("uploads/media")
+BLOB_DIR = MEDIA_DIR / "blobs"
+BLOB_SHARD_LENGTH = 2
+
+
+def blob_path(sha256: str, extension: str) -> Path:
+    return BLOB_DIR / sha256[:BLOB_SHARD_LENGTH] / f"{sha256}{extension}"
+
+
+def blob_filename(blob: MediaBlob) -> str:
+    """Media.filename for a blob: its path under uploads/media (the URL suffix)"""
+    path = Path(blob.path)
+    try:
+        return path.relative_to(MEDIA_DIR).as_posix()
+    except ValueError:
+        return path.name
+
+
+def find_blob(db: Session, sha256: Optional[str]) -> Optional[MediaBlob]:
+    """Blob whose stored or uploaded bytes have this digest"""
+    if not sha256:
+        return None
+    return db.query(MediaBlob).filter(
+        or_(MediaBlob.sha256 == sha256, MediaBlob.source_sha256 == sha256)
+    ).order_by(MediaBlob.id).first()
+
+
+def acquire_blob(db: Session, blob: MediaBlob) -> bool:
+    """Take one more reference (not committed); False if the last one was dropped meanwhile"""
+    result = db.execute(
+        update(MediaBlob)
+        .where(MediaBlob.id == blob.id, MediaBlob.ref_count > 0)
+        .values(ref_count=MediaBlob.ref_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.expire(blob, ["ref_count"])
+    return result.rowcount == 1
+
+
+def store_blob(
+    db: Session,
+    staged: StagedUpload,
+    extension: str,
+    mime_type: str,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    source_sha256: Optional[str] = None
+) -> MediaBlob:
+    """
+    Move a staged file into the store and record it with one reference (not committed).
+
+    If the same content was stored concurrently, the staged copy replaces the
+    identical file and the existing blob gains the reference instead.
+    """
+    path = blob_path(staged.sha256, extension)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staged.commit(path)
+
+    blob = MediaBlob(
+        sha256=staged.sha256,
+        source_sha256=source_sha256 if source_sha256 != staged.sha256 else None,
+        path=str(path),
+        file_size=staged.size,
+        mime_type=mime_type,
+        width=width,
+        height=height,
+        ref_count=1
+    )
+    db.add(blob)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        blob = db.query(MediaBlob).filter(MediaBlob.path == str(path)).first()
+        if blob is None or not acquire_blob(db, blob):
+            raise
+    return blob
+
+
+def media_for_blob(db: Session, blob: MediaBlob, **fields) -> Media:
+    """
+    Add a Media row for a blob whose reference was already taken (not committed).
+
+    Variant rows (and the perceptual hash) are copied from an existing row of
+    the blob: the variant files are shared, so nothing is generated.
+    """
+    template = db.query(Media).filter(Media.blob_id == blob.id).order_by(Media.id).first()
+    if template is not None:
+        fields.setdefault("perceptual_hash", template.perceptual_hash)
+    media = Media(
+        filename=blob_filename(blob),
+        file_path=blob.path,
+        file_size=blob.file_size,
+        mime_type=blob.mime_type,
+        width=blob.width,
+        height=blob.height,
+        file_hash=blob.sha256,
+        blob_id=blob.id,
+        **fields
+    )
+    db.add(media)
+    db.flush()
+    if template is not None:
+        db.add_all([
+            MediaVariant(
+                media_id=media.id,
+                width=variant.width,
+                height=variant.height,
+                filename=variant.filename,
+                file_size=variant.file_size,
+                mime_type=variant.mime_type
+            )
+            for variant in template.variants
+        ])
+    return media
+
+
+def release_blob(db: Session, blob_id: Optional[int]) -> bool:
+    """
+    Drop one reference of a deleted Media row (not committed).
+
+    Returns True when the files should be removed: the last reference is gone
+    (the blob row is deleted too), or the row predates the blob store.
+    """
+    if blob_id is None:
+        return True
+    db.execute(
+        update(MediaBlob)
+        .where(MediaBlob.id == blob_id)
+        .values(ref_count=MediaBlob.ref_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+    result = db.execute(
+        delete(MediaBlob)
+        .where(MediaBlob.id == blob_id, MediaBlob.ref_count <= 0)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def delete_media_files(file_path: Path, variant_filenames: Iterable[str]) -> None:
+    """Remove a stored file, its WebP/AVIF siblings and its width variants"""
+    try:
+        file_path.unlink()
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Media delete error ({file_path}): {e}")
+    delete_siblings(file_path)
+    delete_variant_files(variant_filenames)
+
+
+def blob_store_stats(db: Session) -> Dict:
+    """Stored blobs, the media rows referencing them and the bytes sharing saved"""
+    blobs, references, stored_bytes, referenced_bytes = db.query(
+        func.count(MediaBlob.id),
+        func.coalesce(func.sum(MediaBlob.ref_count), 0),
+        func.coalesce(func.sum(MediaBlob.file_size), 0),
+        func.coalesce(func.sum(MediaBlob.file_size * MediaBlob.ref_count), 0)
+    ).one()
+    return {
+        "blobs": blobs,
+        "references": references,
+        "stored_bytes": stored_bytes,
+        "deduplicated_bytes": referenced_bytes - stored_bytes
+    }
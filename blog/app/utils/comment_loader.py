@@ -0,0 +1,107 @@
+"""
+Batched threaded comment loader.
+
+A page of approved top-level comments is fetched with keyset pagination on
+the comment id (ids follow insertion order, so this matches the
+created_at ordering), then every approved descendant of those threads is
+fetched with a single recursive CTE. Users are joined in both queries and
+the tree is assembled in memory, so a page costs a constant number of
+queries regardless of thread size or depth.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, aliased, joinedload
+from app.models.models import Comment
+
+DEFAULT_THREADS_PER_PAGE = 20
+MAX_THREADS_PER_PAGE = 100
+
+
+def _serialize(comment: Comment) -> dict:
+    return {
+        "id": comment.id,
+        "content": comment.content,
+        "user": {
+            "username": comment.user.username if comment.user else "",
+            "profile_image": comment.user.profile_image if comment.user else None
+        },
+        "created_at": comment.created_at.strftime("%d.%m.%Y %H:%M") if comment.created_at else "",
+        "replies": []
+    }
+
+
+def load_comment_threads(
+    db: Session,
+    post_id: int,
+    after_id: Optional[int] = None,
+    limit: int = DEFAULT_THREADS_PER_PAGE
+) -> Tuple[List[dict], Optional[int]]:
+    """
+    Load one page of comment threads for a post.
+
+    Args:
+        after_id: Cursor returned by the previous page (last top-level comment id)
+        limit: Number of top-level threads per page
+
+    Returns:
+        Tuple[List[dict], Optional[int]]: (threads with nested replies, next cursor or None)
+    """
+    limit = max(1, min(limit, MAX_THREADS_PER_PAGE))
+
+    roots_query = db.query(Comment).options(joinedload(Comment.user)).filter(
+        Comment.post_id == post_id,
+        Comment.is_approved == True,
+        Comment.parent_id == None
+    )
+    if after_id is not None:
+        roots_query = roots_query.filter(Comment.id > after_id)
+
+    roots = roots_query.order_by(Comment.id.asc()).limit(limit + 1).all()
+    has_more = len(roots) > limit
+    roots = roots[:limit]
+    if not roots:
+        return [], None
+
+    # All approved descendants of this page's threads, at any depth
+    child = aliased(Comment)
+    thread = select(Comment.id).where(
+        Comment.parent_id.in_([root.id for root in roots]),
+        Comment.is_approved == True
+    ).cte("comment_thread", recursive=True)
+    thread = thread.union_all(
+        select(child.id).where(
+            child.parent_id == thread.c.id,
+            child.is_approved == True
+        )
+    )
+
+    descendants = db.query(Comment).options(joinedload(Comment.user)).filter(
+        Comment.id.in_(select(thread.c.id))
+    ).order_by(Comment.id.asc()).all()
+
+    nodes: Dict[int, dict] = {}
+    threads = []
+    for root in roots:
+        nodes[root.id] = _serialize(root)
+        threads.append(nodes[root.id])
+
+    # Parents always have smaller ids than their replies, so one ordered pass is enough
+    for comment in descendants:
+        parent = nodes.get(comment.parent_id)
+        if parent is None:
+            continue
+        nodes[comment.id] = _serialize(comment)
+        parent["replies"].append(nodes[comment.id])
+
+    next_cursor = roots[-1].id if has_more else None
+    return threads, next_cursor
+
+
+def count_approved_comments(db: Session, post_id: int) -> int:
+    """Total approved comments (threads and replies) for a post"""
+    return db.query(Comment).filter(
+        Comment.post_id == post_id,
+        Comment.is_approved == True
+    ).count()
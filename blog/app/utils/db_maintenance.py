@@ -0,0 +1,112 @@
+"""
+Periodic SQLite maintenance.
+
+With WAL enabled the -wal file only shrinks back when a checkpoint runs, and
+the query planner's statistics only refresh when `PRAGMA optimize` runs, so a
+background task does both: a PASSIVE checkpoint every
+`SQLITE_CHECKPOINT_INTERVAL` seconds (it never blocks readers or writers)
+and `PRAGMA optimize` every `SQLITE_OPTIMIZE_INTERVAL` seconds.
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import text
+from app.core.database import engine, get_sqlite_pragmas, SQLITE_PRAGMA_PROFILE
+
+SQLITE_CHECKPOINT_INTERVAL = float(os.getenv("SQLITE_CHECKPOINT_INTERVAL", "300"))
+SQLITE_OPTIMIZE_INTERVAL = float(os.getenv("SQLITE_OPTIMIZE_INTERVAL", "3600"))
+
+# Pragmas read back for the admin settings page
+_REPORTED_PRAGMAS = ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size", "temp_store")
+
+
+class SQLiteMaintenance:
+    def __init__(self, checkpoint_interval: float = SQLITE_CHECKPOINT_INTERVAL, optimize_interval: float = SQLITE_OPTIMIZE_INTERVAL):
+        self.checkpoint_interval = checkpoint_interval
+        self.optimize_interval = optimize_interval
+        self.last_checkpoint: Optional[datetime] = None
+        self.last_checkpoint_result = None
+        self.last_optimize: Optional[datetime] = None
+        self._task = None
+
+    @property
+    def enabled(self) -> bool:
+        return engine.dialect.name == "sqlite" and SQLITE_PRAGMA_PROFILE != "off"
+
+    def checkpoint(self) -> None:
+        """Copy WAL frames back into the database without waiting on other connections"""
+        try:
+            with engine.connect() as conn:
+                row = conn.execute(text("PRAGMA wal_checkpoint(PASSIVE)")).first()
+            # (busy, wal frames, frames checkpointed)
+            self.last_checkpoint_result = tuple(row) if row else None
+            self.last_checkpoint = datetime.utcnow()
+        except Exception as e:
+            print(f"SQLite checkpoint error: {e}")
+
+    def optimize(self) -> None:
+        """Let SQLite refresh planner statistics where they are stale"""
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("PRAGMA optimize"))
+            self.last_optimize = datetime.utcnow()
+        except Exception as e:
+            print(f"SQLite optimize error: {e}")
+
+    def status(self) -> dict:
+        """Configured vs. effective profile plus the last maintenance runs"""
+        if engine.dialect.name != "sqlite":
+            return {"enabled": False, "dialect": engine.dialect.name}
+
+        effective = {}
+        try:
+            with engine.connect() as conn:
+                for name in _REPORTED_PRAGMAS:
+                    effective[name] = conn.execute(text(f"PRAGMA {name}")).scalar()
+        except Exception as e:
+            print(f"SQLite pragma status error: {e}")
+
+        return {
+            "enabled": self.enabled,
+            "dialect": engine.dialect.name,
+            "configured": get_sqlite_pragmas() if self.enabled else {},
+            "effective": effective,
+            "checkpoint_interval": self.checkpoint_interval,
+            "optimize_interval": self.optimize_interval,
+            "last_checkpoint": self.last_checkpoint,
+            "last_checkpoint_result": self.last_checkpoint_result,
+            "last_optimize": self.last_optimize
+        }
+
+    async def run(self) -> None:
+        loop = asyncio.get_event_loop()
+        last_checkpoint = last_optimize = time.monotonic()
+        tick = min(interval for interval in (self.checkpoint_interval, self.optimize_interval, 60) if interval > 0)
+        while True:
+            await asyncio.sleep(tick)
+            now = time.monotonic()
+            if self.checkpoint_interval > 0 and now - last_checkpoint >= self.checkpoint_interval:
+                await loop.run_in_executor(None, self.checkpoint)
+                last_checkpoint = time.monotonic()
+            if self.optimize_interval > 0 and now - last_optimize >= self.optimize_interval:
+                await loop.run_in_executor(None, self.optimize)
+                last_optimize = time.monotonic()
+
+    def start(self) -> None:
+        if self._task is None and self.enabled:
+            self._task = asyncio.get_event_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            # Leave planner statistics behind for the next start
+            self.optimize()
+
+
+# Singleton instance
+db_maintenance = SQLiteMaintenance()
@@ -1,8 +1,9 @@
 from sqlalchemy.orm import Session
-from app.models.models import Post, Category, Settings
+from app.models.models import Post, Category
+from app.core.settings_cache import settings_cache
 from slugify import slugify
 import re
-from typing import Optional, Type
+from typing import Dict, Optional, Tuple, Type
 from datetime import datetime
 import pytz
 import hashlib
@@ -92,8 +93,8 @@ def get_timezone_aware_datetime(dt: datetime, db: Session) -> datetime:
     if not dt:
         return dt
     
-    # Get timezone setting from database
-    settings = db.query(Settings).first()
+    # Get timezone setting from the cached settings snapshot
+    settings = settings_cache.get(db)
     timezone_str = settings.timezone if settings and settings.timezone else "Europe/Istanbul"
     
     try:
@@ -127,7 +128,7 @@ def calculate_file_hash(file_content: bytes) -> str:
 
 def check_duplicate_media(file_hash: str, file_size: int, db: Session):
     """Check if media file already exists based on hash and size"""
-    from app.models.models import Media
+    from app.models.models import Media, MediaBlob
     
     if not file_hash:
         return None
@@ -137,10 +138,32 @@ def check_duplicate_media(file_hash: str, file_size: int, db: Session):
     if duplicate:
         return duplicate
     
-    # Secondary check: file size (less reliable but helpful)
-    duplicates_by_size = db.query(Media).filter(Media.file_size == file_size).all()
-    for media in duplicates_by_size:
-        # Additional checks could be added here (e.g., image dimensions)
-        pass
+    # Uploads are stored optimized: match the digest they had as uploaded too
+    duplicate = db.query(Media).join(MediaBlob, Media.blob_id == MediaBlob.id).filter(
+        MediaBlob.source_sha256 == file_hash
+    ).order_by(Media.id).first()
+    if duplicate:
+        return duplicate
+    
+    # Resized or re-encoded copies are found by perceptual hash (find_similar_media)
+    return None
+
+def get_media_folder_stats(db: Session) -> Dict[Optional[int], Tuple[int, int]]:
+    """(file count, total bytes) per folder_id (None = root), missing files excluded
+    
+    One GROUP BY over the covering (folder_id, file_size) index, minus the
+    (rare) rows the media scanner marked missing, found through their own index.
+    """
+    from sqlalchemy import func
+    from app.models.models import Media
+    
+    def grouped(query):
+        return query.with_entities(
+            Media.folder_id, func.count(Media.id), func.coalesce(func.sum(Media.file_size), 0)
+        ).group_by(Media.folder_id).all()
     
-    return None
\ No newline at end of file
+    stats = {folder_id: (count, total_size) for folder_id, count, total_size in grouped(db.query(Media))}
+    for folder_id, count, total_size in grouped(db.query(Media).filter(Media.is_missing == True)):
+        present_count, present_size = stats.get(folder_id, (0, 0))
+        stats[folder_id] = (present_count - count, present_size - total_size)
+    return stats
@@ -0,0 +1,205 @@
+"""
+Conditional GET helpers (ETag / 304 Not Modified).
+
+Routes build a strong ETag from the versions of everything they render
+(row ids and `updated_at` stamps, comment ids, the settings revision and the
+viewer) and call `not_modified` right after the cheap lookups, so a
+revalidating client gets a 304 before the template is rendered. Responses
+without a cheap version go through `finalize`, which derives a weak ETag
+from a hash of the rendered body instead.
+
+No Last-Modified is sent: every page also renders the site-wide layout,
+whose taxonomy edits and hard deletes change the ETag but leave no newer
+timestamp behind, so an If-Modified-Since check would answer 304 with stale
+pages. The site version query is reused for `SITE_VERSION_TTL` seconds and
+dropped whenever the page cache is purged (every admin content write), so
+other workers see a change within the TTL.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Iterable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.core.settings_cache import settings_cache
+
+SITE_VERSION_TTL = float(os.getenv("SITE_VERSION_TTL", "5"))
+
+# Headers a 304 must repeat from the full response (RFC 9110 15.4.5)
+_NOT_MODIFIED_HEADERS = ("etag", "cache-control", "vary")
+
+# Single round trip over the tables that feed the shared layout, sidebars and listings
+_SITE_VERSION_SQL = text(
+    "SELECT "
+    "(SELECT COUNT(*) FROM posts) AS post_count, "
+    "(SELECT MAX(created_at) FROM posts) AS post_created, "
+    "(SELECT MAX(updated_at) FROM posts) AS post_updated, "
+    "(SELECT MAX(updated_at) FROM users) AS user_updated, "
+    "(SELECT MAX(updated_at) FROM pages) AS page_updated, "
+    "(SELECT group_concat(id || ':' || name || ':' || slug, '|') FROM categories) AS categories, "
+    "(SELECT group_concat(id || ':' || name || ':' || slug, '|') FROM tags) AS tags, "
+    # Tag-only post edits leave the posts row untouched
+    "(SELECT COUNT(*) || ':' || TOTAL(post_id * 31 + tag_id) || ':' || TOTAL(post_id * tag_id) FROM post_tags) AS post_tags"
+)
+
+
+class SiteVersionCache:
+    """The site version row, reused for `ttl` seconds or until invalidated"""
+
+    def __init__(self, ttl: float = SITE_VERSION_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._row: Optional[Tuple] = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db: Session) -> Tuple:
+        with self._lock:
+            if self._row is not None and time.monotonic() < self._expires_at:
+                self.hits += 1
+                return self._row
+            self.misses += 1
+            generation = self._generation
+        row = tuple(db.execute(_SITE_VERSION_SQL).first())
+        with self._lock:
+            # A write committed while this query ran may not be in `row`
+            if generation == self._generation and self.ttl > 0:
+                self._row = row
+                self._expires_at = time.monotonic() + self.ttl
+        return row
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._row = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def make_etag(*parts, weak: bool = False) -> str:
+    digest = hashlib.sha1("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:32]
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def body_etag(body: bytes) -> str:
+    """Weak validator for an already rendered body"""
+    return f'W/"{hashlib.sha1(body).hexdigest()[:32]}"'
+
+
+def viewer_key(user) -> str:
+    """Part of the version for pages whose layout depends on the logged-in user"""
+    if user is None:
+        return "anon"
+    return f"user:{user.id}:{user.is_admin}:{user.updated_at}"
+
+
+def site_version(db: Session) -> str:
+    """Version token of the content shared by public pages: posts, authors, pages, taxonomy and settings"""
+    settings_cache.get(db)
+    return make_etag(settings_cache.revision, *site_version_cache.get(db))
+
+
+def comments_version(db: Session, post_id: int) -> str:
+    """
+    Version token of a post's approved comments and their authors.
+
+    Count and id sum catch deletes and (un)approvals, including rejected
+    comments, which are hard-deleted.
+    """
+    row = db.execute(
+        text("SELECT COUNT(c.id) AS total, MAX(c.id) AS max_id, SUM(c.id) AS id_sum, "
+             "MAX(u.updated_at) AS authors_updated "
+             "FROM comments c LEFT JOIN users u ON u.id = c.user_id "
+             "WHERE c.post_id = :post_id AND c.is_approved = 1"),
+        {"post_id": post_id}
+    ).first()
+    return make_etag(post_id, row.total, row.max_id, row.id_sum, row.authors_updated)
+
+
+def _parse_etags(header: str) -> Iterable[str]:
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate:
+            yield candidate
+
+
+def is_fresh(request: Request, etag: Optional[str] = None) -> bool:
+    """True when the client's If-None-Match matches the current ETag"""
+    if request.method not in ("GET", "HEAD"):
+        return False
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None or etag is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as required for GET
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return opaque in set(_parse_etags(if_none_match))
+
+
+def set_validators(
+    response: Response,
+    etag: Optional[str] = None,
+    private: bool = False
+) -> Response:
+    if etag:
+        response.headers["ETag"] = etag
+    # Always revalidate: content changes whenever an admin edits it
+    response.headers["Cache-Control"] = "private, no-cache" if private else "public, no-cache"
+    return response
+
+
+def not_modified(
+    request: Request,
+    etag: Optional[str] = None,
+    private: bool = False
+) -> Optional[Response]:
+    """A 304 response when the client's copy matches, otherwise None"""
+    if not is_fresh(request, etag):
+        return None
+    return set_validators(Response(status_code=304), etag, private)
+
+
+def finalize(request: Request, response: Response, private: bool = False) -> Response:
+    """Add a weak body ETag to a rendered 200 response (unless it has one) and turn it into a 304 if fresh"""
+    if response.status_code != 200:
+        return response
+
+    etag = response.headers.get("etag")
+    if etag is None:
+        body = getattr(response, "body", None)
+        if body is None:
+            return response
+        etag = body_etag(body)
+        response.headers["ETag"] = etag
+    if "cache-control" not in response.headers:
+        response.headers["Cache-Control"] = "private, no-cache" if private else "public, no-cache"
+
+    if not is_fresh(request, etag):
+        return response
+
+    not_modified_response = Response(status_code=304)
+    for name in _NOT_MODIFIED_HEADERS:
+        if name in response.headers:
+            not_modified_response.headers[name] = response.headers[name]
+    return not_modified_response
+
+
+# Singleton instance
+site_version_cache = SiteVersionCache()
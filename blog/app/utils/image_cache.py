@@ -0,0 +1,196 @@
+"""
+On-demand image derivatives with a disk cache.
+
+`/img/{media_id}/{w}x{h}.{fmt}` renders a resized copy of a media image.
+Only sizes listed in `IMAGE_DERIVATIVE_SIZES` (0 = keep aspect ratio on
+that axis) and formats in `DERIVATIVE_FORMATS` are accepted, so arbitrary
+sizes cannot be used to fill the cache.
+
+Derivatives are content addressed: the file name is a hash of the source
+file's SHA-256 plus the render parameters. They are stored under
+`IMAGE_DERIVATIVE_CACHE_DIR/<2 hex>/<hash>.<ext>`. A re-uploaded image with
+the same bytes reuses the same derivatives, and a changed parameter never
+serves a stale file. Concurrent requests for the same derivative share a
+single render (single flight). The cache is kept under
+`IMAGE_DERIVATIVE_CACHE_MAX_BYTES` by evicting the least recently served
+files.
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Set, Tuple
+
+from app.models.models import Media
+from app.utils.image_workers import image_processor
+
+IMAGE_DERIVATIVE_CACHE_DIR = Path(os.getenv("IMAGE_DERIVATIVE_CACHE_DIR", "cache/images"))
+IMAGE_DERIVATIVE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_DERIVATIVE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+IMAGE_DERIVATIVE_QUALITY = int(os.getenv("IMAGE_DERIVATIVE_QUALITY", "82"))
+IMAGE_DERIVATIVE_SIZES = os.getenv(
+    "IMAGE_DERIVATIVE_SIZES",
+    "150x150,300x300,400x225,800x450,1200x630,320x0,640x0,960x0,1280x0"
+)
+
+# URL extension -> (Pillow format, MIME type)
+DERIVATIVE_FORMATS = {
+    "jpg": ("JPEG", "image/jpeg"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "png": ("PNG", "image/png"),
+    "webp": ("WEBP", "image/webp"),
+}
+SOURCE_MIME_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif", "image/bmp", "image/tiff"}
+
+# Bump when the rendering itself changes so old derivatives are not reused
+RENDER_VERSION = 1
+
+
+def parse_sizes(spec: str) -> Set[Tuple[int, int]]:
+    sizes = set()
+    for item in spec.split(","):
+        item = item.strip().lower()
+        if not item:
+            continue
+        width, _, height = item.partition("x")
+        sizes.add((int(width or 0), int(height or 0)))
+    return sizes
+
+
+class DerivativeCache:
+    def __init__(self, directory: Path = IMAGE_DERIVATIVE_CACHE_DIR, max_bytes: int = IMAGE_DERIVATIVE_CACHE_MAX_BYTES, sizes: str = IMAGE_DERIVATIVE_SIZES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.allowed_sizes = parse_sizes(sizes)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # path -> size, least recently served first
+        self._files: "OrderedDict[Path, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._scanned = False
+        self._inflight: Dict[Path, asyncio.Future] = {}
+
+    def is_allowed(self, width: int, height: int, extension: str) -> bool:
+        return (width, height) in self.allowed_sizes and extension in DERIVATIVE_FORMATS
+
+    @staticmethod
+    def supports(media: Media) -> bool:
+        return media.mime_type in SOURCE_MIME_TYPES
+
+    def cache_path(self, media: Media, width: int, height: int, extension: str) -> Path:
+        pillow_format = DERIVATIVE_FORMATS[extension][0]
+        source_key = media.file_hash or f"{media.file_path}:{media.file_size}"
+        digest = hashlib.sha256(
+            f"{source_key}:{width}x{height}:{pillow_format}:{IMAGE_DERIVATIVE_QUALITY}:{RENDER_VERSION}".encode("utf-8")
+        ).hexdigest()
+        return self.directory / digest[:2] / f"{digest}.{extension}"
+
+    async def get(self, media: Media, width: int, height: int, extension: str) -> Path:
+        """Path of the cached derivative, rendering it (once) if needed"""
+        self._ensure_scanned()
+        path = self.cache_path(media, width, height, extension)
+
+        if self._touch(path):
+            self.hits += 1
+            return path
+
+        pending = self._inflight.get(path)
+        if pending is not None:
+            # Someone is already rendering this derivative; wait for their result
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_event_loop().create_future()
+        self._inflight[path] = future
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            size = await image_processor.render_size(
+                Path(media.file_path), path, width, height, DERIVATIVE_FORMATS[extension][0], IMAGE_DERIVATIVE_QUALITY
+            )
+            self._record(path, size)
+            future.set_result(path)
+            return path
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(path, None)
+
+    def _touch(self, path: Path) -> bool:
+        """Mark `path` as recently used; False if it is not on disk"""
+        with self._lock:
+            if path in self._files:
+                if path.exists():
+                    self._files.move_to_end(path)
+                    return True
+                # Evicted by another worker
+                self._total_bytes -= self._files.pop(path)
+                return False
+        if path.exists():
+            # Rendered by another worker
+            self._record(path, path.stat().st_size)
+            return True
+        return False
+
+    def _record(self, path: Path, size: int) -> None:
+        with self._lock:
+            if path in self._files:
+                self._total_bytes -= self._files.pop(path)
+            self._files[path] = size
+            self._total_bytes += size
+            victims = []
+            while self._total_bytes > self.max_bytes and len(self._files) > 1:
+                victim, victim_size = self._files.popitem(last=False)
+                self._total_bytes -= victim_size
+                victims.append(victim)
+            self.evictions += len(victims)
+        for victim in victims:
+            try:
+                victim.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _ensure_scanned(self) -> None:
+        """Seed the LRU from files already on disk, oldest access first"""
+        if self._scanned:
+            return
+        with self._lock:
+            if self._scanned:
+                return
+            entries = []
+            if self.directory.exists():
+                for path in self.directory.glob("*/*"):
+                    if path.name.startswith("."):
+                        continue
+                    try:
+                        stat = path.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_atime, path, stat.st_size))
+            for _, path, size in sorted(entries, key=lambda entry: entry[0]):
+                self._files[path] = size
+                self._total_bytes += size
+            self._scanned = True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "rendering": len(self._inflight)
+            }
+
+
+# Singleton instance
+derivative_cache = DerivativeCache()
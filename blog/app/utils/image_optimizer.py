@@ -5,9 +5,11 @@ Resimleri kalitesini düşürmeden dosya boyutunu küçültür
 
 import os
 import io
+import math
+import uuid
 from PIL import Image, ImageOps
 from pathlib import Path
-from typing import Tuple, Optional, Union
+from typing import Iterable, List, Tuple, Optional, Union
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,11 +20,30 @@ DEFAULT_MAX_HEIGHT = 1080
 DEFAULT_QUALITY = 85
 DEFAULT_PROGRESSIVE = True
 
+# Hızlı çözme yolu: JPEG'ler draft() ile hedefin en az `reducing_gap` katı
+# boyutta çözülür, büyük küçültmelerde önce reduce() ile tam sayı oranında
+# küçültülür (Image.thumbnail ile aynı yaklaşım)
+DEFAULT_FAST_DECODE = os.getenv("IMAGE_FAST_DECODE", "true").lower() in ("1", "true", "yes")
+DEFAULT_REDUCING_GAP = float(os.getenv("IMAGE_REDUCING_GAP", "2.0"))
+
+# EXIF Orientation etiketi ve resmi düz çevirmek için gereken işlem
+EXIF_ORIENTATION_TAG = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90
+}
+
 # Desteklenen formatlar
 SUPPORTED_FORMATS = {
     'JPEG': {'extension': '.jpg', 'mode': 'RGB'},
     'PNG': {'extension': '.png', 'mode': 'RGBA'},
-    'WEBP': {'extension': '.webp', 'mode': 'RGB'}
+    'WEBP': {'extension': '.webp', 'mode': 'RGB'},
+    'AVIF': {'extension': '.avif', 'mode': 'RGB'}
 }
 
 class ImageOptimizer:
@@ -30,7 +51,8 @@ class ImageOptimizer:
                  max_width: int = DEFAULT_MAX_WIDTH,
                  max_height: int = DEFAULT_MAX_HEIGHT,
                  quality: int = DEFAULT_QUALITY,
-                 progressive: bool = DEFAULT_PROGRESSIVE):
+                 progressive: bool = DEFAULT_PROGRESSIVE,
+                 fast_decode: bool = DEFAULT_FAST_DECODE):
         """
         Resim optimizasyon sınıfı
         
@@ -39,11 +61,13 @@ class ImageOptimizer:
             max_height: Maksimum yükseklik
             quality: JPEG kalitesi (1-100)
             progressive: Progressive JPEG kullan
+            fast_decode: Hızlı çözme yolu (draft + reducing_gap); False ise tam çözünürlükte çözülür
         """
         self.max_width = max_width
         self.max_height = max_height
         self.quality = quality
         self.progressive = progressive
+        self.fast_decode = fast_decode
         
     def optimize_image(self, 
                       input_path: Union[str, Path, io.BytesIO], 
@@ -61,14 +85,15 @@ class ImageOptimizer:
             Tuple[bytes, str]: (optimize edilmiş resim bytes'ı, dosya uzantısı)
         """
         try:
-            # Resmi aç
-            if isinstance(input_path, io.BytesIO):
-                image = Image.open(input_path)
-            else:
-                image = Image.open(input_path)
-                
-            # EXIF verilerini koru ve resmi düzelt
-            image = ImageOps.exif_transpose(image)
+            # Resmi aç (henüz sadece başlık okunur)
+            image = Image.open(input_path)
+            
+            # Hedef boyutu başlıktaki (EXIF yönüne göre düzeltilmiş) boyutlardan hesapla
+            original_width, original_height = oriented_size(image)
+            new_width, new_height = self._calculate_new_dimensions(original_width, original_height)
+            
+            # Çöz ve EXIF yönünü uygula
+            image = self._decode(image, (new_width, new_height))
             
             # Format ayarlarını al
             format_info = SUPPORTED_FORMATS.get(target_format.upper(), SUPPORTED_FORMATS['JPEG'])
@@ -88,46 +113,16 @@ class ImageOptimizer:
                 else:
                     image = image.convert(target_mode)
             
-            # Boyutları kontrol et ve yeniden boyutlandır
-            original_width, original_height = image.size
-            new_width, new_height = self._calculate_new_dimensions(original_width, original_height)
-            
-            if (new_width, new_height) != (original_width, original_height):
+            # Yeniden boyutlandır (draft zaten hedefe yakın çözmüş olabilir)
+            if image.size != (new_width, new_height):
                 # Yüksek kaliteli resampling ile boyutlandır
-                image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+                image = self._resize(image, (new_width, new_height))
+            if (new_width, new_height) != (original_width, original_height):
                 logger.info(f"Resim boyutu {original_width}x{original_height} -> {new_width}x{new_height}")
             
             # Optimize edilmiş resmi kaydet
             output_buffer = io.BytesIO()
-            
-            if target_format.upper() == 'JPEG':
-                # JPEG için özel optimizasyonlar
-                save_kwargs = {
-                    'format': 'JPEG',
-                    'quality': self.quality,
-                    'progressive': self.progressive,
-                    'optimize': True
-                }
-            elif target_format.upper() == 'PNG':
-                # PNG için özel optimizasyonlar
-                save_kwargs = {
-                    'format': 'PNG',
-                    'optimize': True,
-                    'compress_level': 6  # 0-9 arası, 6 optimal
-                }
-            elif target_format.upper() == 'WEBP':
-                # WebP için özel optimizasyonlar
-                save_kwargs = {
-                    'format': 'WEBP',
-                    'quality': self.quality,
-                    'method': 6,  # 0-6 arası, 6 en iyi kalite
-                    'lossless': False,
-                    'optimize': True
-                }
-            else:
-                save_kwargs = {'format': target_format.upper()}
-            
-            image.save(output_buffer, **save_kwargs)
+            image.save(output_buffer, **self._save_kwargs(target_format))
             optimized_bytes = output_buffer.getvalue()
             output_buffer.close()
             
@@ -150,6 +145,182 @@ class ImageOptimizer:
             logger.error(f"Resim optimizasyon hatası: {e}")
             raise
     
+    def _decode(self, image: Image.Image, target_size: Tuple[int, int]) -> Image.Image:
+        """
+        Açılmış (henüz çözülmemiş) resmi çöz ve EXIF yönünü bir kez uygula
+        
+        Hızlı yolda JPEG'ler draft() ile DCT ölçeklemesiyle, `target_size`'ın
+        `reducing_gap` katından küçük olmayan en küçük boyutta çözülür (6000x4000
+        bir fotoğraf 1920x1080 için 1/2 ölçekte çözülür); kalan küçültmeyi
+        LANCZOS yapar. Yön düzeltmesi küçülmüş resme uygulanır. `target_size`
+        düzeltilmiş (dik) yöndeki boyuttur.
+        """
+        if not self.fast_decode:
+            return ImageOps.exif_transpose(image)
+        
+        orientation = exif_orientation(image)
+        if image.format == 'JPEG':
+            width, height = (round(side * DEFAULT_REDUCING_GAP) for side in target_size)
+            if orientation in (5, 6, 7, 8):
+                # draft ham (döndürülmemiş) piksel düzeninde çalışır
+                width, height = height, width
+            image.draft(None, (width, height))
+        
+        transpose = ORIENTATION_TRANSPOSE.get(orientation)
+        if transpose is not None:
+            image = image.transpose(transpose)
+        return image
+    
+    def _resize(self, image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+        """LANCZOS ile boyutlandır; hızlı yolda büyük küçültmeler önce reduce() ile yapılır"""
+        reducing_gap = DEFAULT_REDUCING_GAP if self.fast_decode else None
+        return image.resize(size, Image.Resampling.LANCZOS, reducing_gap=reducing_gap)
+    
+    def _save_kwargs(self, target_format: str) -> dict:
+        """Hedef formata göre kaydetme ayarları"""
+        if target_format.upper() == 'JPEG':
+            # JPEG için özel optimizasyonlar
+            return {
+                'format': 'JPEG',
+                'quality': self.quality,
+                'progressive': self.progressive,
+                'optimize': True
+            }
+        elif target_format.upper() == 'PNG':
+            # PNG için özel optimizasyonlar
+            return {
+                'format': 'PNG',
+                'optimize': True,
+                'compress_level': 6  # 0-9 arası, 6 optimal
+            }
+        elif target_format.upper() == 'WEBP':
+            # WebP için özel optimizasyonlar
+            return {
+                'format': 'WEBP',
+                'quality': self.quality,
+                'method': 6,  # 0-6 arası, 6 en iyi kalite
+                'lossless': False,
+                'optimize': True
+            }
+        elif target_format.upper() == 'AVIF':
+            # AVIF: aynı kalite ölçeği, orta hız (0 en yavaş/en küçük, 10 en hızlı)
+            return {
+                'format': 'AVIF',
+                'quality': self.quality,
+                'speed': 6
+            }
+        return {'format': target_format.upper()}
+    
+    def create_width_variants(self,
+                              source_path: Union[str, Path],
+                              output_dir: Union[str, Path],
+                              widths: Iterable[int]) -> List[dict]:
+        """
+        Kaynaktan daha dar her hedef genişlik için bir varyant üret
+        
+        Varyantlar kaynakla aynı formatta, `{kaynak adı}-{genişlik}w{uzantı}` adıyla
+        yazılır. Her biri bir öncekinden (daha büyük olandan) küçültülür, böylece
+        kaynak yalnızca bir kez, en büyük varyanta yetecek boyutta çözülür.
+        
+        Returns:
+            List[dict]: width, height, filename, file_size (büyükten küçüğe)
+        """
+        output_dir = Path(output_dir)
+        stem = Path(source_path).stem
+        variants = []
+        
+        with Image.open(source_path) as source:
+            source_format = (source.format or '').upper()
+            if source_format not in SUPPORTED_FORMATS:
+                return []
+            extension = SUPPORTED_FORMATS[source_format]['extension']
+            
+            source_width, source_height = oriented_size(source)
+            targets = [width for width in sorted(set(widths), reverse=True) if width < source_width]
+            if not targets:
+                return []
+            
+            def height_for(width: int) -> int:
+                return max(1, round(source_height * width / source_width))
+            
+            image = self._decode(source, (targets[0], height_for(targets[0])))
+            if image.mode not in ('RGB', 'RGBA', 'L'):
+                image = image.convert('RGBA' if source_format == 'PNG' else 'RGB')
+            
+            current = image
+            for width in targets:
+                height = height_for(width)
+                if current.size != (width, height):
+                    current = self._resize(current, (width, height))
+                
+                filename = f"{stem}-{width}w{extension}"
+                output_path = output_dir / filename
+                save_atomically(current, output_path, **self._save_kwargs(source_format))
+                
+                variants.append({
+                    'width': width,
+                    'height': height,
+                    'filename': filename,
+                    'file_size': output_path.stat().st_size
+                })
+        
+        return variants
+    
+    def render_size(self,
+                    source_path: Union[str, Path],
+                    output_path: Union[str, Path],
+                    width: int,
+                    height: int,
+                    target_format: str = 'JPEG') -> int:
+        """
+        İstenen boyutta bir türev resim üret
+        
+        width ve height birlikte verilirse resim ortadan kırpılarak tam o boyuta
+        getirilir; biri 0 ise en-boy oranı korunur. Resim hiçbir zaman büyütülmez.
+        Çıktı önce geçici dosyaya yazılır, sonra atomik olarak yerine taşınır.
+        
+        Returns:
+            int: Yazılan dosyanın boyutu (bytes)
+        """
+        output_path = Path(output_path)
+        format_info = SUPPORTED_FORMATS.get(target_format.upper(), SUPPORTED_FORMATS['JPEG'])
+        
+        with Image.open(source_path) as source:
+            source_width, source_height = oriented_size(source)
+            
+            # Büyütme yapma: istenen boyutu kaynağa sığdır
+            if width and height:
+                if width > source_width or height > source_height:
+                    ratio = min(source_width / width, source_height / height)
+                    width, height = max(1, int(width * ratio)), max(1, int(height * ratio))
+                # Kırpmadan önce kısa kenarı hedefe oturtacak boyutta çözmek yeterli
+                cover = max(width / source_width, height / source_height)
+                decode_size = (math.ceil(source_width * cover), math.ceil(source_height * cover))
+            else:
+                scale = min(1.0, (width / source_width) if width else 1.0, (height / source_height) if height else 1.0)
+                decode_size = (max(1, round(source_width * scale)), max(1, round(source_height * scale)))
+            
+            image = self._decode(source, decode_size)
+            
+            # Hedef renk modu (şeffaflık JPEG'de beyaz zemine düşer)
+            if image.mode != format_info['mode']:
+                if format_info['mode'] == 'RGB' and image.mode in ('RGBA', 'LA', 'P'):
+                    rgba = image.convert('RGBA')
+                    background = Image.new('RGB', rgba.size, (255, 255, 255))
+                    background.paste(rgba, mask=rgba.split()[-1])
+                    image = background
+                else:
+                    image = image.convert(format_info['mode'])
+            
+            if width and height:
+                image = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+            elif image.size != decode_size:
+                image = self._resize(image, decode_size)
+            
+            save_atomically(image, output_path, **self._save_kwargs(target_format))
+        
+        return output_path.stat().st_size
+    
     def _calculate_new_dimensions(self, width: int, height: int) -> Tuple[int, int]:
         """
         Maksimum boyutlara göre yeni boyutları hesapla
@@ -254,6 +425,110 @@ def optimize_uploaded_image(image_bytes: bytes,
     return optimized_bytes, extension
 
 
+def optimize_uploaded_file(file_path: Union[str, Path],
+                           filename: str,
+                           max_width: int = DEFAULT_MAX_WIDTH,
+                           max_height: int = DEFAULT_MAX_HEIGHT,
+                           quality: int = DEFAULT_QUALITY) -> Tuple[bytes, str]:
+    """
+    Diske yazılmış (stage edilmiş) bir yüklemeyi optimize et
+    
+    optimize_uploaded_image ile aynı, ancak girdiyi belleğe almadan dosyadan okur.
+    """
+    file_extension = Path(filename).suffix.lower()
+    if file_extension in ['.jpg', '.jpeg']:
+        target_format = 'JPEG'
+    elif file_extension == '.png':
+        target_format = 'PNG'
+    elif file_extension == '.webp':
+        target_format = 'WEBP'
+    else:
+        target_format = 'JPEG'
+    
+    optimizer = ImageOptimizer(
+        max_width=max_width,
+        max_height=max_height,
+        quality=quality
+    )
+    return optimizer.optimize_image(file_path, target_format=target_format)
+
+
+def save_atomically(image: Image.Image, output_path: Path, **save_kwargs) -> None:
+    """
+    Resmi aynı dizinde benzersiz bir geçici dosyaya yaz, sonra yerine taşı
+    
+    Aynı çıktıyı eşzamanlı üreten süreçler (worker'lar, zaman aşımı sonrası
+    tekrarlar) birbirinin yarım dosyasını taşıyamaz; hata olursa geçici dosya silinir.
+    """
+    temp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    try:
+        image.save(temp_path, **save_kwargs)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        try:
+            temp_path.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def exif_orientation(image: Image.Image) -> int:
+    """EXIF Orientation değeri (1 = düz); başlıktan okunur"""
+    try:
+        return int(image.getexif().get(EXIF_ORIENTATION_TAG, 1))
+    except Exception:
+        return 1
+
+
+def oriented_size(image: Image.Image) -> Tuple[int, int]:
+    """EXIF yönü uygulandıktan sonraki (görünen) boyutlar, resmi çözmeden"""
+    width, height = image.size
+    if exif_orientation(image) in (5, 6, 7, 8):
+        return height, width
+    return width, height
+
+
+def read_image_size(file_path: Union[str, Path, io.BytesIO]) -> Tuple[Optional[int], Optional[int]]:
+    """Resmin görünen boyutlarını sadece başlıktan oku (piksel verisi çözülmez)"""
+    try:
+        with Image.open(file_path) as img:
+            return oriented_size(img)
+    except Exception:
+        return None, None
+
+
+# Algısal hash: (HASH_SIZE + 1) x HASH_SIZE gri küçük resim -> HASH_SIZE * HASH_SIZE bit
+HASH_SIZE = 8
+
+
+def difference_hash(file_path: Union[str, Path, io.BytesIO]) -> Optional[str]:
+    """
+    Resmin 64 bitlik fark hash'i (dHash, 16 haneli hex); okunamazsa None.
+
+    Her bit, küçültülmüş gri resimde bir pikselin sağ komşusundan parlak
+    olup olmadığıdır. Yeniden boyutlandırılmış veya yeniden kodlanmış
+    kopyaların hash'leri birkaç bit içinde kalır (Hamming mesafesi).
+    """
+    try:
+        with Image.open(file_path) as img:
+            orientation = exif_orientation(img)
+            # JPEG'ler küçük ölçekte çözülür; hash için tam çözünürlük gerekmez
+            img.draft("L", ((HASH_SIZE + 1) * 8, HASH_SIZE * 8))
+            gray = img.convert("L")
+            if orientation in ORIENTATION_TRANSPOSE:
+                gray = gray.transpose(ORIENTATION_TRANSPOSE[orientation])
+            pixels = list(gray.resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BOX).getdata())
+    except Exception:
+        return None
+
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return format(value, f"0{HASH_SIZE * HASH_SIZE // 4}x")
+
+
 # Farklı kullanım senaryoları için preset'ler
 PRESETS = {
     'thumbnail': ImageOptimizer(max_width=300, max_height=300, quality=80),
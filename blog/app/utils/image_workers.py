@@ -0,0 +1,274 @@
+"""
+Process-pool image processing for uploads.
+
+Pillow resizing and re-encoding is CPU bound and holds the GIL for most of
+its run, so it goes to a ProcessPoolExecutor of `IMAGE_WORKERS` processes
+instead of the event loop or the default thread pool. A job is handed to
+the executor only when one of the workers is free, so callers queue on an
+asyncio semaphore without blocking the loop, and `IMAGE_JOB_TIMEOUT`
+measures the job's run (plus worker start-up for the first jobs), not time
+spent waiting. A job that runs longer raises ImageJobTimeout for the
+caller. The worker cannot be interrupted and finishes in the background:
+its slot stays taken until then, and its output is discarded. Jobs that
+write files therefore write to a unique path that the caller adopts only on
+success (see `optimize_file`).
+
+Job functions are module-level so they can be pickled into the workers,
+and they take and return paths or bytes, never ORM objects.
+"""
+
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypeVar, Union
+
+from PIL import Image
+from app.utils.image_optimizer import ImageOptimizer, optimize_uploaded_file, optimize_uploaded_image, difference_hash
+
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "0")) or max(1, (os.cpu_count() or 2) - 1)
+IMAGE_JOB_TIMEOUT = float(os.getenv("IMAGE_JOB_TIMEOUT", "30"))
+# spawn keeps the app's threads, engines and sockets out of the workers. Workers import
+# only this module's job functions; `python main.py` runs under uvicorn's entry point
+# so they do not re-run main.py as __mp_main__ either.
+IMAGE_WORKER_START_METHOD = os.getenv("IMAGE_WORKER_START_METHOD", "spawn")
+
+T = TypeVar("T")
+
+
+class ImageJobTimeout(Exception):
+    pass
+
+
+def optimize_file_job(path: str, output_path: str, filename: str, max_width: int, max_height: int, quality: int) -> Tuple[str, int, str]:
+    """Worker job: write the optimized image at `path` to `output_path`, return (extension, size, sha256)"""
+    optimized_bytes, extension = optimize_uploaded_file(path, filename, max_width=max_width, max_height=max_height, quality=quality)
+    with open(output_path, "wb") as out:
+        out.write(optimized_bytes)
+    return extension, len(optimized_bytes), hashlib.sha256(optimized_bytes).hexdigest()
+
+
+def _remove_file(path: Union[str, Path]) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def create_variants_job(path: str, output_dir: str, widths: Sequence[int], quality: int) -> List[dict]:
+    """Worker job: write the width variants of the image at `path` into `output_dir`"""
+    return ImageOptimizer(quality=quality).create_width_variants(path, output_dir, widths)
+
+
+def render_size_job(path: str, output_path: str, width: int, height: int, target_format: str, quality: int) -> int:
+    """Worker job: write a resized derivative of `path` to `output_path`, return its size"""
+    return ImageOptimizer(quality=quality).render_size(path, output_path, width, height, target_format)
+
+
+def encode_siblings_job(path: str, formats: Sequence[str], quality: int) -> Dict[str, int]:
+    """Worker job: write `{path}.{ext}` re-encodings that are smaller than `path`; returns {ext: size}
+
+    Images with transparency are skipped (the RGB encoders would flatten them).
+    """
+    with Image.open(path) as source:
+        if "A" in source.mode or "transparency" in source.info:
+            return {}
+    source_size = os.path.getsize(path)
+    optimizer = ImageOptimizer(quality=quality)
+    written = {}
+    try:
+        for extension in formats:
+            output_path = f"{path}.{extension}"
+            size = optimizer.render_size(path, output_path, 0, 0, extension.upper())
+            if size < source_size:
+                written[extension] = size
+            else:
+                _remove_file(output_path)
+    finally:
+        if not os.path.exists(path):
+            # Deleted while encoding: the delete removes the source before its siblings,
+            # so a sibling renamed into place after that sweep is removed here
+            for extension in written:
+                _remove_file(f"{path}.{extension}")
+            written = {}
+    return written
+
+
+class ImageProcessor:
+    def __init__(self, workers: int = IMAGE_WORKERS, timeout: float = IMAGE_JOB_TIMEOUT):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.waiting = 0
+        self.running = 0
+        # Timed-out jobs still running in a worker
+        self.abandoned = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(IMAGE_WORKER_START_METHOD)
+                )
+            return self._executor
+
+    def _reset_executor(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func: Callable[..., T], *args, on_abandon: Optional[Callable[[], None]] = None, **kwargs) -> T:
+        """
+        Run `func` in a worker process once a worker is free.
+
+        `on_abandon` is called (in the executor's thread) when a job that
+        timed out finally finishes, to clean up whatever it wrote.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        loop = asyncio.get_event_loop()
+        self.running += 1
+        release_slot = True
+        try:
+            job = self._get_executor().submit(partial(func, *args, **kwargs))
+            future = asyncio.wrap_future(job)
+            try:
+                done, _ = await asyncio.wait({future}, timeout=self.timeout if self.timeout > 0 else None)
+            except asyncio.CancelledError:
+                # The request went away; the worker still finishes the job
+                release_slot = not self._abandon(loop, job, future, on_abandon)
+                raise
+            if not done:
+                self.timeouts += 1
+                release_slot = not self._abandon(loop, job, future, on_abandon)
+                raise ImageJobTimeout(f"Image job exceeded {self.timeout}s")
+            result = future.result()
+            self.completed += 1
+            return result
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a decompression bomb); start a fresh pool for the next job
+            self.failed += 1
+            self._reset_executor()
+            raise
+        except ImageJobTimeout:
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.running -= 1
+            if release_slot:
+                self._slots.release()
+
+    def _abandon(self, loop: asyncio.AbstractEventLoop, job, future: asyncio.Future, on_abandon: Optional[Callable[[], None]]) -> bool:
+        """Stop waiting for a job; True if it is still running and keeps its slot until it ends"""
+        # Consume the late result so asyncio does not log it as never retrieved
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        if job.cancel() or job.done():
+            if on_abandon is not None:
+                on_abandon()
+            return False
+        self.abandoned += 1
+        job.add_done_callback(lambda _: self._finish_abandoned(loop, on_abandon))
+        return True
+
+    def _finish_abandoned(self, loop: asyncio.AbstractEventLoop, on_abandon: Optional[Callable[[], None]]) -> None:
+        """Done callback of a timed-out job: clean up, then free its worker slot"""
+        if on_abandon is not None:
+            try:
+                on_abandon()
+            except Exception as e:
+                print(f"Image job cleanup error: {e!r}")
+        try:
+            loop.call_soon_threadsafe(self._release_abandoned_slot)
+        except RuntimeError:
+            # The loop shut down while the job ran; nothing waits for the slot any more
+            pass
+
+    def _release_abandoned_slot(self) -> None:
+        self.abandoned -= 1
+        self._slots.release()
+
+    async def optimize_file(self, path: Path, filename: str, max_width: int, max_height: int, quality: int) -> Tuple[str, int, str]:
+        """
+        Optimize a staged upload; returns (extension, size, sha256).
+
+        The worker writes to a fresh hidden path next to `path`, which replaces
+        `path` only when the job succeeds in time. On failure or timeout `path`
+        is left as it was.
+        """
+        output_path = path.with_name(f".{path.name.lstrip('.')}.{uuid.uuid4().hex}.opt")
+        try:
+            result = await self.run(
+                optimize_file_job, str(path), str(output_path), filename, max_width, max_height, quality,
+                on_abandon=partial(_remove_file, output_path)
+            )
+        except ImageJobTimeout:
+            raise
+        except BaseException:
+            _remove_file(output_path)
+            raise
+        os.replace(output_path, path)
+        return result
+
+    async def optimize_bytes(self, image_bytes: bytes, filename: str, max_width: int, max_height: int, quality: int) -> Tuple[bytes, str]:
+        """optimize_uploaded_image on the pool"""
+        return await self.run(optimize_uploaded_image, image_bytes, filename, max_width=max_width, max_height=max_height, quality=quality)
+
+    async def create_variants(self, path: Path, output_dir: Path, widths: Sequence[int], quality: int) -> List[dict]:
+        """Width variants of a stored image; see ImageOptimizer.create_width_variants"""
+        return await self.run(create_variants_job, str(path), str(output_dir), tuple(widths), quality)
+
+    async def render_size(self, path: Path, output_path: Path, width: int, height: int, target_format: str, quality: int) -> int:
+        """A resized derivative; see ImageOptimizer.render_size"""
+        return await self.run(render_size_job, str(path), str(output_path), width, height, target_format, quality)
+
+    async def encode_siblings(self, path: Path, formats: Sequence[str], quality: int) -> Dict[str, int]:
+        """Smaller modern-format copies next to a stored image; see encode_siblings_job"""
+        return await self.run(encode_siblings_job, str(path), tuple(formats), quality)
+
+    async def perceptual_hash(self, path: Path) -> Optional[str]:
+        """dHash of an image file (None if unreadable); see difference_hash"""
+        return await self.run(difference_hash, str(path))
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "timeout": self.timeout,
+            "running": self.running,
+            "abandoned": self.abandoned,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+# Singleton instance
+image_processor = ImageProcessor()
@@ -0,0 +1,155 @@
+"""
+EXPLAIN QUERY PLAN audit over the application's hot queries.
+
+The catalog below mirrors the filters and orderings the routers actually
+run (built with the same ORM expressions, compiled for the live dialect).
+Each plan is checked for full table scans and temporary sort B-trees, so a
+missing or unusable index shows up before it shows up in latency. Small
+lookup tables that are read whole on purpose are listed in `allowed_scans`.
+"""
+
+import re
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, or_, text
+from sqlalchemy.orm import Query, Session
+from app.models.models import Post, Category, PostTag, Comment, PostLike, Media, MediaBlob, AIUsage
+from app.utils.media_library import media_page_query, encode_cursor, DEFAULT_MEDIA_PER_PAGE
+
+# SQLite >= 3.36 prints "SCAN posts", older versions "SCAN TABLE posts"
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+_TEMP_BTREE = "USE TEMP B-TREE"
+
+SAMPLE_ID = 1
+
+
+class AuditQuery:
+    def __init__(self, name: str, build: Callable[[Session], Query], allowed_scans: Sequence[str] = ()):
+        self.name = name
+        self.build = build
+        self.allowed_scans = tuple(allowed_scans)
+
+
+class AuditResult:
+    def __init__(self, name: str, plan: List[str], full_scans: List[str], temp_sorts: int, error: Optional[str] = None):
+        self.name = name
+        self.plan = plan
+        self.full_scans = full_scans
+        self.temp_sorts = temp_sorts
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.full_scans
+
+
+QUERY_CATALOG: List[AuditQuery] = [
+    AuditQuery("homepage", lambda db: db.query(Post).filter(
+        Post.is_published == True
+    ).order_by(Post.created_at.desc()).limit(10)),
+    AuditQuery("post_detail", lambda db: db.query(Post).filter(
+        Post.slug == "example", Post.is_published == True
+    )),
+    AuditQuery("post_tags", lambda db: db.query(PostTag).filter(PostTag.post_id == SAMPLE_ID)),
+    AuditQuery("category_posts", lambda db: db.query(Post).filter(
+        Post.category_id == SAMPLE_ID, Post.is_published == True
+    ).order_by(Post.created_at.desc())),
+    AuditQuery("tag_posts", lambda db: db.query(Post).join(PostTag).filter(
+        PostTag.tag_id == SAMPLE_ID, Post.is_published == True
+    ).order_by(Post.created_at.desc())),
+    AuditQuery("author_profile_posts", lambda db: db.query(Post).filter(
+        Post.author_id == SAMPLE_ID, Post.is_published == True
+    ).order_by(Post.created_at.desc()).limit(10)),
+    AuditQuery("sidebar_categories", lambda db: db.query(
+        Category.id, func.count(Post.id)
+    ).outerjoin(Post, (Post.category_id == Category.id) & (Post.is_published == True)).group_by(Category.id),
+        allowed_scans=("categories",)),
+    AuditQuery("comment_thread_roots", lambda db: db.query(Comment).filter(
+        Comment.post_id == SAMPLE_ID, Comment.is_approved == True, Comment.parent_id == None,
+        Comment.id > 0
+    ).order_by(Comment.id.asc()).limit(21)),
+    AuditQuery("comment_replies", lambda db: db.query(Comment.id).filter(
+        Comment.parent_id.in_([SAMPLE_ID, SAMPLE_ID + 1]), Comment.is_approved == True
+    )),
+    AuditQuery("comment_count", lambda db: db.query(func.count(Comment.id)).filter(
+        Comment.post_id == SAMPLE_ID, Comment.is_approved == True
+    )),
+    AuditQuery("pending_comments", lambda db: db.query(func.count(Comment.id)).filter(
+        Comment.is_approved == False
+    )),
+    AuditQuery("like_status", lambda db: db.query(PostLike).filter(
+        PostLike.user_id == SAMPLE_ID, PostLike.post_id == SAMPLE_ID
+    )),
+    AuditQuery("post_like_count", lambda db: db.query(func.count(PostLike.id)).filter(
+        PostLike.post_id == SAMPLE_ID
+    )),
+    AuditQuery("media_in_folder", lambda db: db.query(Media).filter(
+        Media.folder_id == SAMPLE_ID
+    ).order_by(Media.created_at.desc())),
+    AuditQuery("media_root_folder", lambda db: db.query(Media).filter(
+        Media.folder_id == None
+    ).order_by(Media.created_at.desc())),
+    AuditQuery("media_recent", lambda db: db.query(Media).order_by(Media.created_at.desc()).limit(20)),
+    AuditQuery("media_folder_stats", lambda db: db.query(
+        Media.folder_id, func.count(Media.id), func.coalesce(func.sum(Media.file_size), 0)
+    ).group_by(Media.folder_id)),
+    AuditQuery("media_missing_stats", lambda db: db.query(
+        Media.folder_id, func.count(Media.id), func.coalesce(func.sum(Media.file_size), 0)
+    ).filter(Media.is_missing == True).group_by(Media.folder_id)),
+    AuditQuery("media_page_folder", lambda db: media_page_query(
+        db, folder_id=SAMPLE_ID, cursor=encode_cursor("2025-01-01 00:00:00", SAMPLE_ID)
+    ).limit(DEFAULT_MEDIA_PER_PAGE + 1)),
+    AuditQuery("media_page_root", lambda db: media_page_query(
+        db, cursor=encode_cursor("2025-01-01 00:00:00", SAMPLE_ID)
+    ).limit(DEFAULT_MEDIA_PER_PAGE + 1)),
+    AuditQuery("media_page_search_all", lambda db: media_page_query(
+        db, q="photo", all_folders=True
+    ).limit(DEFAULT_MEDIA_PER_PAGE + 1)),
+    AuditQuery("media_duplicate_hash", lambda db: db.query(Media).filter(Media.file_hash == "0" * 64)),
+    AuditQuery("media_blob_lookup", lambda db: db.query(MediaBlob).filter(
+        or_(MediaBlob.sha256 == "0" * 64, MediaBlob.source_sha256 == "0" * 64)
+    ).order_by(MediaBlob.id).limit(1)),
+    AuditQuery("media_blob_references", lambda db: db.query(Media).filter(Media.blob_id == SAMPLE_ID).order_by(Media.id).limit(1)),
+    AuditQuery("ai_usage_by_type", lambda db: db.query(func.count(AIUsage.id)).filter(
+        AIUsage.user_id == SAMPLE_ID, AIUsage.usage_type == "content"
+    )),
+    AuditQuery("ai_usage_last", lambda db: db.query(AIUsage).filter(
+        AIUsage.user_id == SAMPLE_ID
+    ).order_by(AIUsage.created_at.desc()).limit(1)),
+]
+
+
+def explain(db: Session, query: Query) -> List[str]:
+    """EXPLAIN QUERY PLAN detail lines for an ORM query"""
+    compiled = query.statement.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True})
+    rows = db.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+    # Columns: id, parent, notused, detail
+    return [row[-1] for row in rows]
+
+
+def audit_query(db: Session, entry: AuditQuery) -> AuditResult:
+    try:
+        plan = explain(db, entry.build(db))
+    except Exception as e:
+        return AuditResult(entry.name, [], [], 0, error=str(e))
+
+    full_scans = []
+    for detail in plan:
+        match = _FULL_SCAN.match(detail)
+        if match and match.group(1) not in entry.allowed_scans:
+            full_scans.append(match.group(1))
+    temp_sorts = sum(1 for detail in plan if _TEMP_BTREE in detail)
+    return AuditResult(entry.name, plan, full_scans, temp_sorts)
+
+
+def run_audit(db: Session, catalog: Sequence[AuditQuery] = QUERY_CATALOG) -> List[AuditResult]:
+    if db.bind.dialect.name != "sqlite":
+        raise RuntimeError("The index audit only understands SQLite query plans")
+    return [audit_query(db, entry) for entry in catalog]
+
+
+def summarize(results: Sequence[AuditResult]) -> Tuple[int, int]:
+    """(queries with full scans or errors, queries needing a temp sort)"""
+    failing = sum(1 for result in results if not result.ok)
+    sorting = sum(1 for result in results if result.temp_sorts)
+    return failing, sorting
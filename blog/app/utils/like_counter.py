@@ -0,0 +1,128 @@
+"""
+Write-behind aggregation for Post.like_count.
+
+Like/unlike requests only record a +1/-1 delta in memory after their
+post_likes row is committed; a background task collects the posts touched
+and rewrites their counters from post_likes in one batched UPDATE every
+`LIKE_FLUSH_INTERVAL` seconds, so a burst of likes on a popular post costs a
+single recount instead of one COUNT(*) and one locked update per click.
+Flushes write absolute counts, not deltas, so they are idempotent: a
+recount, another worker's flush or a retry can never apply a like twice.
+The pending deltas only serve reads until the next flush. A periodic
+reconciliation recounts every post, repairing counters whose flush was lost
+(e.g. a worker killed with posts pending).
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.models.models import Post
+
+LIKE_FLUSH_INTERVAL = float(os.getenv("LIKE_FLUSH_INTERVAL", "2"))
+LIKE_RECONCILE_INTERVAL = float(os.getenv("LIKE_RECONCILE_INTERVAL", "3600"))
+
+
+class LikeCounterBuffer:
+    def __init__(self, flush_interval: float = LIKE_FLUSH_INTERVAL, reconcile_interval: float = LIKE_RECONCILE_INTERVAL):
+        self.flush_interval = flush_interval
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[int, int] = {}
+        self._task = None
+
+    def add(self, post_id: int, delta: int) -> None:
+        """Queue a like (+1) or unlike (-1) for the post"""
+        with self._lock:
+            value = self._pending.get(post_id, 0) + delta
+            if value:
+                self._pending[post_id] = value
+            else:
+                self._pending.pop(post_id, None)
+
+    def pending(self, post_id: int) -> int:
+        return self._pending.get(post_id, 0)
+
+    def get_count(self, db: Session, post_id: int) -> int:
+        """Stored counter plus this worker's not-yet-flushed delta"""
+        stored = db.query(Post.like_count).filter(Post.id == post_id).scalar() or 0
+        return max(0, stored + self.pending(post_id))
+
+    def flush(self) -> int:
+        """Recount every post with pending deltas in one transaction; returns the number of posts updated"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            db = SessionLocal()
+            try:
+                db.execute(
+                    text(
+                        "UPDATE posts SET like_count = "
+                        "(SELECT COUNT(*) FROM post_likes WHERE post_likes.post_id = posts.id) "
+                        "WHERE id = :post_id"
+                    ),
+                    [{"post_id": post_id} for post_id in batch]
+                )
+                db.commit()
+                return len(batch)
+            except Exception as e:
+                print(f"Like counter flush error: {e}")
+                db.rollback()
+                # Put the posts back so the next flush recounts them
+                with self._lock:
+                    for post_id, delta in batch.items():
+                        self._pending[post_id] = self._pending.get(post_id, 0) + delta
+                return 0
+            finally:
+                db.close()
+
+    def reconcile(self) -> None:
+        """Recompute every like_count from post_likes"""
+        with self._flush_lock:
+            db = SessionLocal()
+            try:
+                # Pending deltas stay queued: their flush recounts again, which is harmless
+                db.execute(text(
+                    "UPDATE posts SET like_count = "
+                    "(SELECT COUNT(*) FROM post_likes WHERE post_likes.post_id = posts.id)"
+                ))
+                db.commit()
+            except Exception as e:
+                print(f"Like counter reconcile error: {e}")
+                db.rollback()
+            finally:
+                db.close()
+
+    async def run(self) -> None:
+        """Background loop: flush periodically, reconcile less often"""
+        loop = asyncio.get_event_loop()
+        last_reconcile = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await loop.run_in_executor(None, self.flush)
+            if self.reconcile_interval > 0 and time.monotonic() - last_reconcile >= self.reconcile_interval:
+                await loop.run_in_executor(None, self.reconcile)
+                last_reconcile = time.monotonic()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_event_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.flush()
+
+
+# Singleton instance
+like_counter = LikeCounterBuffer()
@@ -0,0 +1,115 @@
+"""
+Keyset pagination for the admin media library.
+
+Pages are ordered newest first by (created_at, id) and continue after an
+opaque cursor that encodes the last row's key, so every page is a single
+indexed range read (ix_media_folder_created / ix_media_created, with the
+rowid as tie-breaker) however deep the user scrolls. Search filters run in
+the same query, so nothing is filtered or sliced in Python. Rows the media
+scanner marked missing are left out the same way (no per-row stat()).
+
+created_at is compared as the text SQLite stored (CURRENT_TIMESTAMP has no
+fractional seconds). Binding a parsed datetime instead would render
+"... 14:11:00.000000", which sorts after the stored "... 14:11:00" and
+would repeat rows that share the cursor's second.
+"""
+
+import base64
+from typing import List, Optional, Tuple
+
+from sqlalchemy import String, and_, or_, type_coerce
+from sqlalchemy.orm import Query, Session
+from app.models.models import Media
+
+DEFAULT_MEDIA_PER_PAGE = 48
+MAX_MEDIA_PER_PAGE = 200
+
+# Stored created_at text, for ordering, cursors and comparisons
+_created_key = type_coerce(Media.created_at, String)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at: str, media_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at}|{media_id}".encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, _, media_id = raw.rpartition("|")
+        return created_at, int(media_id)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor("Invalid media cursor")
+
+
+def search_filter(q: str):
+    """Case-insensitive substring match over the fields the library searches"""
+    term = f"%{q.strip()}%"
+    return or_(
+        Media.title.ilike(term),
+        Media.original_name.ilike(term),
+        Media.description.ilike(term),
+        Media.alt_text.ilike(term),
+        Media.mime_type.ilike(term)
+    )
+
+
+def media_page_query(
+    db: Session,
+    folder_id: Optional[int] = None,
+    q: Optional[str] = None,
+    cursor: Optional[str] = None,
+    all_folders: bool = False
+) -> Query:
+    """(Media, stored created_at) rows after `cursor`, newest first (unlimited)"""
+    query = db.query(Media, _created_key).filter(Media.is_missing == False)
+    if not all_folders:
+        query = query.filter(Media.folder_id == folder_id)
+    if q and q.strip():
+        query = query.filter(search_filter(q))
+    if cursor:
+        created_at, media_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            _created_key < created_at,
+            and_(_created_key == created_at, Media.id < media_id)
+        ))
+    return query.order_by(_created_key.desc(), Media.id.desc())
+
+
+def load_media_page(
+    db: Session,
+    folder_id: Optional[int] = None,
+    q: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_MEDIA_PER_PAGE,
+    all_folders: bool = False
+) -> Tuple[List[Media], Optional[str]]:
+    """
+    Load one page of media, newest first.
+
+    Args:
+        folder_id: Folder to list; None means the root (unfiled) media unless `all_folders`
+        q: Optional search text
+        cursor: `next_cursor` of the previous page
+        all_folders: Ignore folder_id and list every folder (search from the root)
+
+    Returns:
+        Tuple[List[Media], Optional[str]]: (media rows, next cursor or None)
+
+    Raises:
+        InvalidCursor: The cursor could not be decoded
+    """
+    limit = max(1, min(limit, MAX_MEDIA_PER_PAGE))
+
+    rows = media_page_query(db, folder_id, q, cursor, all_folders).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last_media, last_created = rows[-1]
+        next_cursor = encode_cursor(last_created, last_media.id)
+    return [media for media, _ in rows], next_cursor
@@ -0,0 +1,226 @@
+"""
+Background reconciliation of media rows against uploads/media.
+
+List endpoints filter on `Media.is_missing` instead of stat()ing every row
+per request (slow on network filesystems). This scanner keeps the column
+honest: every `MEDIA_SCAN_INTERVAL` seconds, and shortly after changes in
+the directory when watchfiles (inotify on Linux, shipped with
+uvicorn[standard]) is installed, it lists the directory and the blob store
+shards (blobs/<aa>/) once, compares the paths with the media rows and flips
+`is_missing` for rows whose file disappeared or came back. Files with no row
+are reported as orphans; they are never deleted automatically.
+
+Hidden files (staged `.upload-*.part` uploads, `.tmp` renders), the
+variants/ directory and WebP/AVIF siblings (`<file>.webp`, `<file>.avif`)
+are not media files and are ignored.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import update
+
+from app.core.database import SessionLocal
+from app.models.models import Media
+from app.utils.modern_formats import MODERN_FORMATS, NEGOTIABLE_EXTENSIONS
+from app.utils.blob_store import MEDIA_DIR, BLOB_DIR
+
+try:
+    from watchfiles import awatch
+except ImportError:  # optional: fall back to periodic scans only
+    awatch = None
+
+MEDIA_SCAN_INTERVAL = float(os.getenv("MEDIA_SCAN_INTERVAL", "900"))
+MEDIA_SCAN_WATCH = os.getenv("MEDIA_SCAN_WATCH", "true").lower() in ("1", "true", "yes")
+# Changes are coalesced for this long before the triggered rescan
+MEDIA_SCAN_DEBOUNCE = float(os.getenv("MEDIA_SCAN_DEBOUNCE", "5"))
+MEDIA_SCAN_ORPHAN_REPORT_LIMIT = int(os.getenv("MEDIA_SCAN_ORPHAN_REPORT_LIMIT", "200"))
+
+_UPDATE_BATCH = 500
+
+
+def is_media_file_name(name: str) -> bool:
+    """False for temp files and modern-format siblings that live next to media files"""
+    if name.startswith("."):
+        return False
+    stem, extension = os.path.splitext(name)
+    if extension[1:].lower() in MODERN_FORMATS and os.path.splitext(stem)[1].lower() in NEGOTIABLE_EXTENSIONS:
+        return False
+    return True
+
+
+class MediaScanner:
+    def __init__(self, directory: Path = MEDIA_DIR, interval: float = MEDIA_SCAN_INTERVAL, watch: bool = MEDIA_SCAN_WATCH):
+        self.directory = directory
+        self.interval = interval
+        self.watch = watch and awatch is not None
+        self.scans = 0
+        self.last_scan: Optional[datetime] = None
+        self.last_duration = 0.0
+        self.last_result: Dict = {}
+        self._lock = threading.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _scan_files(self, directory: Path, prefix: str, files: Dict[str, int]) -> None:
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not is_media_file_name(entry.name):
+                        continue
+                    try:
+                        if entry.is_file():
+                            files[f"{prefix}{entry.name}"] = entry.stat().st_size
+                    except FileNotFoundError:
+                        continue
+        except FileNotFoundError:
+            pass
+
+    def _list_directory(self) -> Dict[str, int]:
+        """Media file path relative to the directory -> size, for the top level and the blob shards"""
+        files: Dict[str, int] = {}
+        self._scan_files(self.directory, "", files)
+        blob_dir = self.directory / BLOB_DIR.relative_to(MEDIA_DIR)
+        try:
+            with os.scandir(blob_dir) as shards:
+                shard_names = [shard.name for shard in shards if shard.is_dir() and not shard.name.startswith(".")]
+        except FileNotFoundError:
+            shard_names = []
+        for name in shard_names:
+            self._scan_files(blob_dir / name, f"{blob_dir.relative_to(self.directory).as_posix()}/{name}/", files)
+        return files
+
+    def scan(self) -> Dict:
+        """Reconcile once; returns the report also kept in `last_result`"""
+        with self._lock:
+            started = time.monotonic()
+            directory = self.directory.resolve()
+            db = SessionLocal()
+            try:
+                # Rows first: a row committed after this point cannot be marked
+                # missing, and its file was written before the row existed
+                rows = db.query(Media.id, Media.file_path, Media.is_missing).all()
+                on_disk = self._list_directory()
+
+                now_missing: List[int] = []
+                found_again: List[int] = []
+                referenced: Set[str] = set()
+                for media_id, file_path, is_missing in rows:
+                    path = Path(file_path)
+                    try:
+                        key = path.resolve().relative_to(directory).as_posix()
+                    except ValueError:
+                        key = None
+                    if key is not None:
+                        referenced.add(key)
+                    # Double-check misses so a file moved in mid-scan is not flagged;
+                    # legacy rows stored elsewhere are checked individually
+                    present = key in on_disk or path.exists()
+                    if is_missing and present:
+                        found_again.append(media_id)
+                    elif not is_missing and not present:
+                        now_missing.append(media_id)
+
+                for ids, value in ((now_missing, True), (found_again, False)):
+                    for start in range(0, len(ids), _UPDATE_BATCH):
+                        db.execute(
+                            update(Media).where(Media.id.in_(ids[start:start + _UPDATE_BATCH])).values(is_missing=value)
+                        )
+                db.commit()
+
+                orphans = sorted(name for name in on_disk if name not in referenced)
+                missing_total = sum(1 for _, _, is_missing in rows if is_missing) + len(now_missing) - len(found_again)
+                result = {
+                    "rows": len(rows),
+                    "files": len(on_disk),
+                    "missing": missing_total,
+                    "newly_missing": len(now_missing),
+                    "found_again": len(found_again),
+                    "orphan_files": len(orphans),
+                    "orphan_bytes": sum(on_disk[name] for name in orphans),
+                    "orphans": orphans[:MEDIA_SCAN_ORPHAN_REPORT_LIMIT]
+                }
+            except Exception as e:
+                db.rollback()
+                print(f"Media scan error: {e}")
+                result = {"error": str(e)}
+            finally:
+                db.close()
+
+            self.scans += 1
+            self.last_scan = datetime.utcnow()
+            self.last_duration = time.monotonic() - started
+            self.last_result = result
+            if result.get("newly_missing") or result.get("found_again"):
+                print(f"Media scan: {result['newly_missing']} missing, {result['found_again']} found again")
+            return result
+
+    async def scan_now(self) -> Dict:
+        return await asyncio.get_event_loop().run_in_executor(None, self.scan)
+
+    def request_scan(self) -> None:
+        """Run a scan soon (used by the directory watcher)"""
+        if self._wake is not None:
+            self._wake.set()
+
+    def report(self) -> Dict:
+        return {
+            "directory": str(self.directory),
+            "interval": self.interval,
+            "watching": self.watch,
+            "scans": self.scans,
+            "last_scan": self.last_scan.isoformat() if self.last_scan else None,
+            "last_duration": round(self.last_duration, 3),
+            **self.last_result
+        }
+
+    async def run(self) -> None:
+        """Scan at startup, then on the interval or when the watcher asks"""
+        while True:
+            await self.scan_now()
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval if self.interval > 0 else None)
+                # Let a burst of changes (bulk upload/delete) settle first
+                await asyncio.sleep(MEDIA_SCAN_DEBOUNCE)
+            except asyncio.TimeoutError:
+                pass
+
+    async def watch_directory(self) -> None:
+        directory = self.directory.resolve()
+        blob_dir = (self.directory / BLOB_DIR.relative_to(MEDIA_DIR)).resolve()
+
+        def relevant(change, path: str) -> bool:
+            path = Path(path)
+            parent = path.parent.resolve()
+            return (parent == directory or parent.parent == blob_dir) and is_media_file_name(path.name)
+
+        try:
+            async for _ in awatch(self.directory, watch_filter=relevant):
+                self.request_scan()
+        except Exception as e:
+            print(f"Media directory watch stopped: {e}")
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._wake = asyncio.Event()
+        loop = asyncio.get_event_loop()
+        self._tasks.append(loop.create_task(self.run()))
+        if self.watch:
+            self._tasks.append(loop.create_task(self.watch_directory()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+
+# Singleton instance
+media_scanner = MediaScanner()
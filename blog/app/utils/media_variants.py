@@ -0,0 +1,198 @@
+"""
+Responsive width variants for uploaded images.
+
+Each JPEG/PNG/WebP upload gets resized copies at `MEDIA_VARIANT_WIDTHS`
+(only widths narrower than the stored image) in uploads/media/variants,
+generated once on the image worker pool and recorded in `media_variants`.
+
+Templates call `srcset_attrs(url, sizes)` with the image URL they already
+have (e.g. `post.featured_image`). It looks the URL up in a process-wide
+index of media filename -> variants and emits `srcset`/`sizes`
+attributes, or nothing for URLs without variants. Lookups only read the
+in-memory snapshot, so rendering never queries the database. A background
+task started with the app reloads it off the event loop when the table's
+(count, max id) changes, checked every `MEDIA_VARIANT_INDEX_CHECK_INTERVAL`
+seconds so variants made or removed by another worker show up too, and
+right away after `invalidate`.
+"""
+
+import asyncio
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from markupsafe import Markup, escape
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.models import Media, MediaVariant
+from app.utils.image_optimizer import ImageOptimizer
+from app.utils.image_workers import image_processor
+from app.utils.modern_formats import delete_siblings
+
+MEDIA_VARIANT_WIDTHS = tuple(sorted({
+    int(width) for width in os.getenv("MEDIA_VARIANT_WIDTHS", "320,640,960,1280,1920").split(",") if width.strip()
+}))
+MEDIA_VARIANT_QUALITY = int(os.getenv("MEDIA_VARIANT_QUALITY", "82"))
+MEDIA_VARIANT_INDEX_CHECK_INTERVAL = float(os.getenv("MEDIA_VARIANT_INDEX_CHECK_INTERVAL", "30"))
+
+MEDIA_URL_PREFIX = "/uploads/media/"
+VARIANT_DIR = Path("uploads/media/variants")
+VARIANT_URL_PREFIX = "/uploads/media/variants/"
+VARIANT_MIME_TYPES = {"image/jpeg", "image/png", "image/webp"}
+
+
+def supports_variants(media: Media) -> bool:
+    return media.mime_type in VARIANT_MIME_TYPES
+
+
+def _variant_rows(media: Media, generated: List[dict]) -> List[MediaVariant]:
+    return [
+        MediaVariant(
+            media_id=media.id,
+            width=variant["width"],
+            height=variant["height"],
+            filename=variant["filename"],
+            file_size=variant["file_size"],
+            mime_type=media.mime_type
+        )
+        for variant in generated
+    ]
+
+
+async def generate_variants(media: Media, db: Session) -> List[MediaVariant]:
+    """Create and record the width variants of a committed Media row (on the worker pool)"""
+    if not supports_variants(media):
+        return []
+    VARIANT_DIR.mkdir(parents=True, exist_ok=True)
+    generated = await image_processor.create_variants(Path(media.file_path), VARIANT_DIR, MEDIA_VARIANT_WIDTHS, MEDIA_VARIANT_QUALITY)
+    rows = _variant_rows(media, generated)
+    if rows:
+        db.add_all(rows)
+        db.commit()
+        variant_index.invalidate()
+    return rows
+
+
+def generate_variants_sync(media: Media, db: Session) -> List[MediaVariant]:
+    """In-process variant generation for scripts (backfills)"""
+    if not supports_variants(media):
+        return []
+    VARIANT_DIR.mkdir(parents=True, exist_ok=True)
+    generated = ImageOptimizer(quality=MEDIA_VARIANT_QUALITY).create_width_variants(media.file_path, VARIANT_DIR, MEDIA_VARIANT_WIDTHS)
+    existing = {variant.width for variant in media.variants}
+    rows = [row for row in _variant_rows(media, generated) if row.width not in existing]
+    if rows:
+        db.add_all(rows)
+        db.commit()
+        variant_index.invalidate()
+    return rows
+
+
+def delete_variant_files(filenames: Iterable[str]) -> None:
+    """Remove variant files (and their WebP/AVIF siblings) from disk; rows go with their Media row"""
+    for filename in filenames:
+        path = VARIANT_DIR / filename
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Variant delete error ({filename}): {e}")
+        delete_siblings(path)
+
+
+class MediaVariantIndex:
+    def __init__(self, check_interval: float = MEDIA_VARIANT_INDEX_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        # media filename -> (original width, [(variant width, variant filename), ...])
+        self._entries: Dict[str, Tuple[Optional[int], List[Tuple[int, str]]]] = {}
+        self._stamp = None
+        self._loaded = False
+        self._task = None
+        self._loop = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def get(self, filename: str) -> Optional[Tuple[Optional[int], List[Tuple[int, str]]]]:
+        """Snapshot lookup; never touches the database"""
+        return self._entries.get(filename)
+
+    def invalidate(self) -> None:
+        """Reload on the next pass, woken now if the app is running (safe from any thread)"""
+        with self._lock:
+            self._loaded = False
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wakeup.set)
+
+    def refresh(self) -> None:
+        """Reload the snapshot if the table changed (blocking; run off the event loop)"""
+        with self._lock:
+            db = SessionLocal()
+            try:
+                stamp = tuple(db.query(func.count(MediaVariant.id), func.max(MediaVariant.id)).one())
+                if not self._loaded or stamp != self._stamp:
+                    entries: Dict[str, Tuple[Optional[int], List[Tuple[int, str]]]] = {}
+                    rows = db.query(Media.filename, Media.width, MediaVariant.width, MediaVariant.filename).join(
+                        MediaVariant, MediaVariant.media_id == Media.id
+                    ).order_by(Media.id, MediaVariant.width).all()
+                    for media_filename, media_width, variant_width, variant_filename in rows:
+                        entry = entries.setdefault(media_filename, (media_width, []))
+                        entry[1].append((variant_width, variant_filename))
+                    self._entries = entries
+                    self._stamp = stamp
+                self._loaded = True
+            except Exception as e:
+                print(f"Media variant index refresh error: {e}")
+            finally:
+                db.close()
+
+    async def run(self) -> None:
+        """Background loop: refresh now, then every check interval or when invalidated"""
+        loop = asyncio.get_event_loop()
+        while True:
+            self._wakeup.clear()
+            await loop.run_in_executor(None, self.refresh)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.check_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._task is None:
+            self._loop = asyncio.get_event_loop()
+            self._wakeup = asyncio.Event()
+            self._task = self._loop.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self._loop = None
+
+
+def srcset_attrs(url: Optional[str], sizes: str = "100vw") -> Markup:
+    """`srcset`/`sizes` attributes for an uploaded image URL, or nothing if it has no variants (as of the last refresh)"""
+    if not url or not url.startswith(MEDIA_URL_PREFIX):
+        return Markup("")
+    entry = variant_index.get(url[len(MEDIA_URL_PREFIX):])
+    if not entry:
+        return Markup("")
+
+    original_width, variants = entry
+    candidates = [f"{VARIANT_URL_PREFIX}{filename} {width}w" for width, filename in variants]
+    if original_width:
+        candidates.append(f"{url} {original_width}w")
+    return Markup(f'srcset="{escape(", ".join(candidates))}" sizes="{escape(sizes)}"')
+
+
+def register_template_helpers(templates) -> None:
+    """Expose the srcset helper to a Jinja2Templates instance"""
+    templates.env.globals["srcset_attrs"] = srcset_attrs
+
+
+# Singleton instance
+variant_index = MediaVariantIndex()
@@ -0,0 +1,160 @@
+"""
+WebP/AVIF siblings for uploaded images and Accept-based serving.
+
+After an upload is stored (original plus width variants), a background task
+re-encodes each file as `<file>.webp` and `<file>.avif` (AVIF only when the
+installed Pillow can write it) on the image worker pool. A sibling is kept
+only if it is smaller than the file it shadows.
+
+`NegotiatingStaticFiles` replaces the plain StaticFiles mount for /uploads.
+For JPEG/PNG/WebP paths under media/, it serves the smallest sibling whose
+type the client lists in `Accept`. Those responses always carry
+`Vary: Accept`, so shared caches keep one copy per format.
+"""
+
+import asyncio
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+
+import anyio
+from PIL import Image
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from app.utils.image_workers import image_processor, encode_siblings_job
+
+MODERN_IMAGE_QUALITY = int(os.getenv("MODERN_IMAGE_QUALITY", "75"))
+
+# URL extension -> MIME type, in preference order for equal sizes
+MODERN_FORMATS = {"avif": "image/avif", "webp": "image/webp"}
+NEGOTIABLE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+NEGOTIABLE_PREFIX = "media/"
+
+
+def enabled_formats() -> List[str]:
+    """Modern formats this Pillow build can encode, filtered by MODERN_IMAGE_FORMATS"""
+    Image.init()
+    configured = [name.strip().lower() for name in os.getenv("MODERN_IMAGE_FORMATS", "avif,webp").split(",") if name.strip()]
+    return [name for name in configured if name in MODERN_FORMATS and name.upper() in Image.SAVE]
+
+
+MODERN_IMAGE_FORMATS = enabled_formats()
+
+
+def sibling_formats(path: Path) -> List[str]:
+    """Formats worth producing for `path` (never its own format)"""
+    suffix = path.suffix.lower()
+    if suffix not in NEGOTIABLE_EXTENSIONS:
+        return []
+    return [name for name in MODERN_IMAGE_FORMATS if f".{name}" != suffix]
+
+
+def sibling_path(path: Path, extension: str) -> Path:
+    return path.with_name(f"{path.name}.{extension}")
+
+
+def delete_siblings(path: Path) -> None:
+    for extension in MODERN_FORMATS:
+        try:
+            sibling_path(path, extension).unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SiblingEncoder:
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+
+    def schedule(self, paths: Iterable[Path]) -> None:
+        """Encode siblings for `paths` in the background (the request does not wait)"""
+        paths = [path for path in paths if sibling_formats(path)]
+        if not paths:
+            return
+        task = asyncio.get_event_loop().create_task(self._encode(paths))
+        # Keep a reference until done so the task is not garbage collected
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _encode(self, paths: List[Path]) -> None:
+        for path in paths:
+            try:
+                await image_processor.encode_siblings(path, sibling_formats(path), MODERN_IMAGE_QUALITY)
+            except Exception as e:
+                print(f"Modern format encode error ({path}): {e!r}")
+
+    def encode_sync(self, path: Path) -> Dict[str, int]:
+        """In-process encoding for scripts (backfills)"""
+        formats = sibling_formats(path)
+        if not formats:
+            return {}
+        return encode_siblings_job(str(path), formats, MODERN_IMAGE_QUALITY)
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+
+def accepted_formats(accept: str) -> Set[str]:
+    """Modern extensions the Accept header allows (q=0 means refused)"""
+    accepted = set()
+    for part in accept.split(","):
+        fields = [field.strip() for field in part.split(";")]
+        media_type = fields[0].lower()
+        quality = 1.0
+        for field in fields[1:]:
+            if field.lower().startswith("q="):
+                try:
+                    quality = float(field[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality <= 0:
+            continue
+        for extension, mime_type in MODERN_FORMATS.items():
+            if media_type == mime_type:
+                accepted.add(extension)
+    return accepted
+
+
+class NegotiatingStaticFiles(StaticFiles):
+    async def get_response(self, path: str, scope: Scope):
+        normalized = path.replace("\\", "/")
+        if not normalized.startswith(NEGOTIABLE_PREFIX) or Path(normalized).suffix.lower() not in NEGOTIABLE_EXTENSIONS:
+            return await super().get_response(path, scope)
+
+        accept = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept":
+                accept = value.decode("latin-1")
+                break
+
+        response = None
+        if scope["method"] in ("GET", "HEAD"):
+            response = await self._best_sibling(path, accepted_formats(accept), scope)
+        if response is None:
+            response = await super().get_response(path, scope)
+        response.headers["Vary"] = "Accept"
+        return response
+
+    async def _best_sibling(self, path: str, accepted: Set[str], scope: Scope):
+        if not accepted:
+            return None
+        best = None
+        for extension in MODERN_FORMATS:
+            if extension not in accepted:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, f"{path}.{extension}")
+            if stat_result is None:
+                continue
+            if best is None or stat_result.st_size < best[2].st_size:
+                best = (extension, full_path, stat_result)
+        if best is None:
+            return None
+        extension, full_path, stat_result = best
+        response = self.file_response(full_path, stat_result, scope)
+        response.headers["content-type"] = MODERN_FORMATS[extension]
+        return response
+
+
+# Singleton instance
+sibling_encoder = SiblingEncoder()
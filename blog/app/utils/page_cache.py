@@ -0,0 +1,185 @@
+"""
+Rendered HTML cache for anonymous readers.
+
+Public pages are cached by path and query string once rendered. Requests
+carrying an `access_token` cookie always bypass the cache, since their pages
+include per-user navigation. Entries expire after `PAGE_CACHE_TTL` seconds,
+are evicted LRU once `PAGE_CACHE_MAX_ENTRIES` / `PAGE_CACHE_MAX_BYTES` is
+exceeded, and can be purged by tag (e.g. "post:12", "category:3", "home")
+when admin edits content. Purges also drop the cached site version (see
+http_cache), since they mark exactly the writes that change it.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+
+from fastapi import Request
+from fastapi.responses import HTMLResponse, Response
+
+from app.utils.http_cache import site_version_cache
+
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "60"))
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "1000"))
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Tag attached to pages that render the shared sidebar/category counts
+SIDEBAR_TAG = "sidebar"
+
+# Validators replayed on cache hits so conditional requests still work
+REPLAYED_HEADERS = ("etag", "cache-control")
+
+
+class CachedPage:
+    __slots__ = ("body", "media_type", "expires_at", "tags", "headers")
+
+    def __init__(self, body: bytes, media_type: str, expires_at: float, tags: Set[str], headers: Dict[str, str]):
+        self.body = body
+        self.media_type = media_type
+        self.expires_at = expires_at
+        self.tags = tags
+        self.headers = headers
+
+
+class PageCache:
+    def __init__(self,
+                 ttl: float = PAGE_CACHE_TTL,
+                 max_entries: int = PAGE_CACHE_MAX_ENTRIES,
+                 max_bytes: int = PAGE_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = ttl > 0 and max_entries > 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedPage]" = OrderedDict()
+        self._tag_index: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def is_cacheable_request(request: Request) -> bool:
+        return request.method == "GET" and not request.cookies.get("access_token")
+
+    @staticmethod
+    def make_key(request: Request) -> str:
+        query = request.url.query
+        return f"{request.url.path}?{query}" if query else request.url.path
+
+    def get(self, request: Request) -> Optional[Response]:
+        """Return the cached page for this request, or None on miss/bypass"""
+        if not self.enabled:
+            return None
+        if not self.is_cacheable_request(request):
+            self.bypasses += 1
+            return None
+
+        key = self.make_key(request)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                if entry is not None:
+                    self._remove_locked(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        headers = dict(entry.headers)
+        headers["X-Cache"] = "HIT"
+        return Response(content=entry.body, media_type=entry.media_type, headers=headers)
+
+    def store(self, request: Request, response: Response, tags: Iterable[str] = ()) -> Response:
+        """Cache a rendered 200 response for anonymous GETs and return it unchanged"""
+        if not self.enabled or not self.is_cacheable_request(request) or response.status_code != 200:
+            return response
+
+        body = getattr(response, "body", None)
+        if not body or len(body) > self.max_bytes:
+            return response
+
+        key = self.make_key(request)
+        entry = CachedPage(
+            body=bytes(body),
+            media_type=response.media_type or HTMLResponse.media_type,
+            expires_at=time.monotonic() + self.ttl,
+            tags=set(tags),
+            headers={name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers}
+        )
+        with self._lock:
+            self._remove_locked(key)
+            self._entries[key] = entry
+            self._bytes += len(entry.body)
+            for tag in entry.tags:
+                self._tag_index.setdefault(tag, set()).add(key)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest_key = next(iter(self._entries))
+                self._remove_locked(oldest_key)
+                self.evictions += 1
+
+        response.headers["X-Cache"] = "MISS"
+        return response
+
+    def purge_tags(self, *tags: str) -> int:
+        """Drop every entry carrying any of the given tags (and the cached site version)"""
+        site_version_cache.invalidate()
+        removed = 0
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tag_index.get(tag, ())):
+                    if self._remove_locked(key):
+                        removed += 1
+        return removed
+
+    @staticmethod
+    def post_tags(post) -> List[str]:
+        """Cache tags affected by a post: its page, category, tags, the homepage and list pages"""
+        tags = [f"post:{post.id}", "home", "archive", "categories", SIDEBAR_TAG]
+        if post.category_id:
+            tags.append(f"category:{post.category_id}")
+        tags.extend(f"tag:{post_tag.tag_id}" for post_tag in post.tags or [])
+        return tags
+
+    def purge_post(self, post, extra_tags: Iterable[str] = ()) -> int:
+        """Purge everything a post appears on; pass the pre-edit tags as `extra_tags`"""
+        return self.purge_tags(*self.post_tags(post), *extra_tags)
+
+    def clear(self) -> None:
+        site_version_cache.invalidate()
+        with self._lock:
+            self._entries.clear()
+            self._tag_index.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def _remove_locked(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+        return True
+
+
+# Singleton instance
+page_cache = PageCache()
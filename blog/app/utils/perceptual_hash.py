@@ -0,0 +1,224 @@
+"""
+Near-duplicate lookup over the media library's perceptual hashes.
+
+Images get a 64-bit difference hash at upload (`difference_hash` in
+image_optimizer, run on the image worker pool) stored in
+`Media.perceptual_hash`. Resized, re-encoded or lightly edited copies hash
+within a few bits of the original, so an image counts as a near duplicate
+when the Hamming distance is at most `MEDIA_PHASH_MAX_DISTANCE` (of 64).
+
+Lookups use multi-index hashing: the 64 bits are split into
+floor(MEDIA_PHASH_MAX_DISTANCE / 2) + 1 chunks, each indexed in its own
+dict. Two hashes within distance k differ in at most floor(k / chunks) bits
+in at least one chunk (pigeonhole), so probing every chunk value within
+that radius finds all matches exactly while verifying only a small fraction
+of the library. (A BK-tree visits most of its nodes at these radii, since
+64-bit hashes are too spread out for its triangle-inequality pruning; on
+50k random hashes it was slower than a linear scan.) Like the variant index,
+the table is an in-memory snapshot that lookups only read: a background task
+started with the app rebuilds it off the event loop when the column's
+(count, max id) changes, checked every `MEDIA_PHASH_INDEX_CHECK_INTERVAL`
+seconds and right after `invalidate`. Rows deleted since the last build are
+dropped when results are loaded.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from itertools import combinations
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.models import Media
+from app.utils.image_optimizer import HASH_SIZE
+
+MEDIA_PHASH_MAX_DISTANCE = int(os.getenv("MEDIA_PHASH_MAX_DISTANCE", "10"))
+MEDIA_PHASH_INDEX_CHECK_INTERVAL = float(os.getenv("MEDIA_PHASH_INDEX_CHECK_INTERVAL", "30"))
+
+HASH_BITS = HASH_SIZE * HASH_SIZE
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class MultiIndexHashTable:
+    """Exact Hamming-radius lookup over `bits`-bit hashes; each hash keeps every id that has it"""
+
+    def __init__(self, bits: int = HASH_BITS, max_distance: int = MEDIA_PHASH_MAX_DISTANCE):
+        chunk_count = max(1, max_distance // 2 + 1)
+        width, extra = divmod(bits, chunk_count)
+        # (shift, width) per chunk, covering all bits
+        self.chunks: List[Tuple[int, int]] = []
+        shift = 0
+        for index in range(chunk_count):
+            chunk_width = width + (1 if index < extra else 0)
+            self.chunks.append((shift, chunk_width))
+            shift += chunk_width
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in self.chunks]
+        self._ids: Dict[int, List[int]] = {}
+        self.size = 0
+
+    @property
+    def hashes(self) -> int:
+        return len(self._ids)
+
+    def add(self, value: int, item_id: int) -> None:
+        self.size += 1
+        ids = self._ids.get(value)
+        if ids is not None:
+            ids.append(item_id)
+            return
+        self._ids[value] = [item_id]
+        for (shift, width), table in zip(self.chunks, self._tables):
+            table.setdefault((value >> shift) & ((1 << width) - 1), []).append(value)
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, int]]:
+        """(distance, id) pairs within `max_distance`, nearest first"""
+        radius = max_distance // len(self.chunks)
+        candidates = set()
+        for (shift, width), table in zip(self.chunks, self._tables):
+            chunk = (value >> shift) & ((1 << width) - 1)
+            for flipped in range(radius + 1):
+                for positions in combinations(range(width), flipped):
+                    key = chunk
+                    for position in positions:
+                        key ^= 1 << position
+                    candidates.update(table.get(key, ()))
+
+        matches = []
+        for candidate in candidates:
+            distance = hamming_distance(value, candidate)
+            if distance <= max_distance:
+                matches.extend((distance, item_id) for item_id in self._ids[candidate])
+        matches.sort()
+        return matches
+
+
+class PerceptualIndex:
+    def __init__(self, check_interval: float = MEDIA_PHASH_INDEX_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._table = MultiIndexHashTable()
+        self._stamp = None
+        self._loaded = False
+        self._task = None
+        self._loop = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.builds = 0
+        self.last_build_duration = 0.0
+
+    def search(self, perceptual_hash: str, max_distance: int = MEDIA_PHASH_MAX_DISTANCE) -> List[Tuple[int, int]]:
+        """(distance, media id) pairs within `max_distance` of a hex hash, nearest first (snapshot only)"""
+        return self._table.search(int(perceptual_hash, 16), max_distance)
+
+    def invalidate(self) -> None:
+        """Rebuild on the next pass, woken now if the app is running (safe from any thread)"""
+        with self._lock:
+            self._loaded = False
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wakeup.set)
+
+    def refresh(self) -> None:
+        """Rebuild the table if the column changed (blocking; run off the event loop)"""
+        with self._lock:
+            db = SessionLocal()
+            try:
+                stamp = tuple(db.query(func.count(Media.perceptual_hash), func.max(Media.id)).one())
+                if not self._loaded or stamp != self._stamp:
+                    started = time.monotonic()
+                    table = MultiIndexHashTable()
+                    rows = db.query(Media.id, Media.perceptual_hash).filter(Media.perceptual_hash != None).all()
+                    for media_id, perceptual_hash in rows:
+                        table.add(int(perceptual_hash, 16), media_id)
+                    self._table = table
+                    self._stamp = stamp
+                    self.builds += 1
+                    self.last_build_duration = time.monotonic() - started
+                self._loaded = True
+            except Exception as e:
+                print(f"Perceptual index refresh error: {e}")
+            finally:
+                db.close()
+
+    async def run(self) -> None:
+        """Background loop: refresh now, then every check interval or when invalidated"""
+        loop = asyncio.get_event_loop()
+        while True:
+            self._wakeup.clear()
+            await loop.run_in_executor(None, self.refresh)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.check_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._task is None:
+            self._loop = asyncio.get_event_loop()
+            self._wakeup = asyncio.Event()
+            self._task = self._loop.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self._loop = None
+
+    def stats(self) -> dict:
+        return {
+            "media": self._table.size,
+            "hashes": self._table.hashes,
+            "chunks": len(self._table.chunks),
+            "builds": self.builds,
+            "last_build_duration": round(self.last_build_duration, 3),
+            "max_distance": MEDIA_PHASH_MAX_DISTANCE
+        }
+
+
+def find_similar_media(
+    db: Session,
+    perceptual_hash: Optional[str],
+    max_distance: int = MEDIA_PHASH_MAX_DISTANCE,
+    limit: int = 5,
+    exclude_ids: Sequence[int] = ()
+) -> List[Tuple[Media, int]]:
+    """
+    Existing media that look like an image with this hash, nearest first.
+
+    Returns:
+        List[Tuple[Media, int]]: (media, Hamming distance), one row per stored file
+    """
+    if not perceptual_hash:
+        return []
+    matches = [(distance, media_id) for distance, media_id in perceptual_index.search(perceptual_hash, max_distance)
+               if media_id not in exclude_ids]
+    if not matches:
+        return []
+
+    # Candidates are few; deleted and missing rows drop out here
+    media_by_id = {
+        media.id: media for media in db.query(Media).filter(
+            Media.id.in_([media_id for _, media_id in matches[:limit * 4]]),
+            Media.is_missing == False
+        )
+    }
+    similar = []
+    seen_files = set()
+    for distance, media_id in matches:
+        media = media_by_id.get(media_id)
+        if media is None or media.file_path in seen_files:
+            continue
+        seen_files.add(media.file_path)
+        similar.append((media, distance))
+        if len(similar) >= limit:
+            break
+    return similar
+
+
+# Singleton instance
+perceptual_index = PerceptualIndex()
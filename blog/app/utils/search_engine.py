@@ -0,0 +1,239 @@
+"""
+SQLite FTS5 full-text search for posts.
+
+`posts_fts` indexes title, excerpt, HTML-stripped content and tag names,
+keyed by post id (rowid). Results are ranked with BM25 and come back with a
+highlighted title and a content snippet. When FTS5 is not available (non
+SQLite database or a SQLite build without FTS5) `search` returns None and
+callers fall back to their LIKE queries.
+"""
+
+import html
+import re
+from typing import Iterable, List, Optional, Sequence
+
+from sqlalchemy import text, or_
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.models.models import Post, Tag, PostTag
+from app.utils.helpers import strip_html_tags
+
+FTS_TABLE = "posts_fts"
+
+# Column weights for bm25(): title, excerpt, content, tags
+BM25_WEIGHTS = (10.0, 5.0, 1.0, 3.0)
+SNIPPET_TOKENS = 24
+
+# Control characters used as highlight markers so the text can be escaped
+# before the <mark> tags are inserted
+_MARK_OPEN = "\x02"
+_MARK_CLOSE = "\x03"
+
+
+def build_match_query(query: str) -> str:
+    """Turn free user input into a safe FTS5 prefix query (all terms must match)"""
+    terms = re.findall(r"\w+", query or "", flags=re.UNICODE)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _render_marked(value: Optional[str]) -> str:
+    escaped = html.escape(value or "")
+    return escaped.replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+
+class SearchHit:
+    def __init__(self, post_id: int, rank: float, title_html: str, snippet_html: str):
+        self.post_id = post_id
+        self.rank = rank
+        self.title_html = title_html
+        self.snippet_html = snippet_html
+
+
+class PostSearchEngine:
+    def __init__(self):
+        self.available = False
+
+    def ensure_schema(self, engine: Engine) -> None:
+        """Create the FTS5 table if needed and populate it on first creation"""
+        if engine.dialect.name != "sqlite":
+            self.available = False
+            return
+
+        try:
+            with engine.begin() as conn:
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {"name": FTS_TABLE}
+                ).first() is not None
+                if not exists:
+                    conn.execute(text(
+                        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                        "title, excerpt, content, tags, "
+                        "tokenize = 'unicode61 remove_diacritics 2')"
+                    ))
+            self.available = True
+        except SQLAlchemyError as e:
+            print(f"FTS5 search index unavailable, falling back to LIKE search: {e}")
+            self.available = False
+            return
+
+        if not exists:
+            from app.core.database import SessionLocal
+            db = SessionLocal()
+            try:
+                count = self.rebuild(db)
+                print(f"Search index created with {count} posts")
+            finally:
+                db.close()
+
+    def index_post(self, db: Session, post: Post) -> None:
+        """Insert or replace a post in the index (call before the surrounding commit)"""
+        if not self.available:
+            return
+
+        db.flush()
+        if post.is_deleted:
+            self.remove_post(db, post.id)
+            return
+
+        tag_names = [row.name for row in db.query(Tag.name).join(PostTag, PostTag.tag_id == Tag.id).filter(
+            PostTag.post_id == post.id
+        ).all()]
+
+        db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": post.id})
+        self._insert(db, post, tag_names)
+
+    def _insert(self, db: Session, post: Post, tag_names: List[str]) -> None:
+        db.execute(
+            text(f"INSERT INTO {FTS_TABLE} (rowid, title, excerpt, content, tags) "
+                 "VALUES (:id, :title, :excerpt, :content, :tags)"),
+            {
+                "id": post.id,
+                "title": post.title or "",
+                "excerpt": strip_html_tags(post.excerpt or ""),
+                "content": strip_html_tags(post.content or ""),
+                "tags": " ".join(tag_names)
+            }
+        )
+
+    def index_posts(self, db: Session, post_ids: Iterable[int]) -> None:
+        """Re-index several posts, e.g. after a tag rename"""
+        if not self.available:
+            return
+
+        ids = list(post_ids)
+        if not ids:
+            return
+        for post in db.query(Post).filter(Post.id.in_(ids)).all():
+            self.index_post(db, post)
+
+    def remove_post(self, db: Session, post_id: int) -> None:
+        if not self.available:
+            return
+
+        db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": post_id})
+
+    def rebuild(self, db: Session) -> int:
+        """Drop every index entry and re-index all non-deleted posts"""
+        if not self.available:
+            return 0
+
+        tags_by_post = {}
+        for row in db.query(PostTag.post_id, Tag.name).join(Tag, Tag.id == PostTag.tag_id).all():
+            tags_by_post.setdefault(row.post_id, []).append(row.name)
+
+        posts = db.query(Post).filter(or_(Post.is_deleted == False, Post.is_deleted == None)).all()
+
+        db.execute(text(f"DELETE FROM {FTS_TABLE}"))
+        for post in posts:
+            self._insert(db, post, tags_by_post.get(post.id, []))
+        db.commit()
+        return len(posts)
+
+    def search(
+        self,
+        db: Session,
+        query: str,
+        limit: int = 50,
+        published: Optional[bool] = True,
+        category_id: Optional[int] = None
+    ) -> Optional[List[SearchHit]]:
+        """
+        Rank posts matching `query` with BM25.
+
+        Args:
+            published: True/False filters on Post.is_published, None disables the filter
+            category_id: Optional category restriction
+
+        Returns:
+            Hits ordered by relevance, or None when the index is unavailable
+        """
+        if not self.available:
+            return None
+
+        match_query = build_match_query(query)
+        if not match_query:
+            return []
+
+        filters = ["p.is_deleted IS NOT 1"]
+        params = {"match": match_query, "limit": limit}
+        if published is not None:
+            filters.append("p.is_published = :published")
+            params["published"] = published
+        if category_id is not None:
+            filters.append("p.category_id = :category_id")
+            params["category_id"] = category_id
+
+        weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+        sql = text(
+            f"SELECT {FTS_TABLE}.rowid AS post_id, "
+            f"bm25({FTS_TABLE}, {weights}) AS score, "
+            f"highlight({FTS_TABLE}, 0, :mark_open, :mark_close) AS title_marked, "
+            f"snippet({FTS_TABLE}, 2, :mark_open, :mark_close, '…', {SNIPPET_TOKENS}) AS snippet_marked "
+            f"FROM {FTS_TABLE} JOIN posts p ON p.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH :match AND {' AND '.join(filters)} "
+            "ORDER BY score LIMIT :limit"
+        )
+        params.update({"mark_open": _MARK_OPEN, "mark_close": _MARK_CLOSE})
+
+        try:
+            rows = db.execute(sql, params).all()
+        except SQLAlchemyError as e:
+            print(f"FTS search error: {e}")
+            return None
+
+        return [SearchHit(
+            post_id=row.post_id,
+            rank=row.score,
+            title_html=_render_marked(row.title_marked),
+            snippet_html=_render_marked(row.snippet_marked)
+        ) for row in rows]
+
+    def search_posts(self, db: Session, query: str, options: Sequence = (), **kwargs) -> Optional[List[Post]]:
+        """Like `search`, but returns Post objects in rank order with `search_title`/`search_snippet` set
+
+        `options` are loader options (e.g. selectinload) applied to the Post query, for
+        callers that read relationships after the session can no longer lazy load.
+        """
+        hits = self.search(db, query, **kwargs)
+        if hits is None:
+            return None
+        if not hits:
+            return []
+
+        post_query = db.query(Post).options(*options).filter(Post.id.in_([hit.post_id for hit in hits]))
+        posts_by_id = {post.id: post for post in post_query.all()}
+        results = []
+        for hit in hits:
+            post = posts_by_id.get(hit.post_id)
+            if post is None:
+                continue
+            post.search_title = hit.title_html
+            post.search_snippet = hit.snippet_html
+            results.append(post)
+        return results
+
+
+# Singleton instance
+search_engine = PostSearchEngine()
@@ -0,0 +1,97 @@
+"""
+Public sidebar data provider.
+
+Builds category post counts and used-tag counts with one GROUP BY query
+each, plus the recent posts list, and caches the result until content
+changes (or `SIDEBAR_CACHE_TTL` seconds pass, which bounds staleness across
+workers).
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, and_
+from sqlalchemy.orm import Session
+from app.models.models import Post, Category, Tag, PostTag
+
+SIDEBAR_CACHE_TTL = float(os.getenv("SIDEBAR_CACHE_TTL", "60"))
+SIDEBAR_RECENT_POSTS = 5
+
+
+class SidebarProvider:
+    def __init__(self, ttl: float = SIDEBAR_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, Any]] = None
+        self._loaded_at = 0.0
+
+    def get(self, db: Session) -> Dict[str, Any]:
+        """Return cached sidebar data: categories, popular_posts and tags"""
+        data = self._data
+        if data is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return data
+
+        with self._lock:
+            if self._data is None or time.monotonic() - self._loaded_at >= self.ttl:
+                self._data = self._build(db)
+                self._loaded_at = time.monotonic()
+            return self._data
+
+    def invalidate(self) -> None:
+        """Drop cached data; call after publishing, unpublishing or deleting posts"""
+        with self._lock:
+            self._data = None
+
+    def _build(self, db: Session) -> Dict[str, Any]:
+        category_rows = db.query(
+            Category.id,
+            Category.name,
+            Category.slug,
+            Category.description,
+            func.count(Post.id).label("post_count")
+        ).outerjoin(
+            Post, and_(Post.category_id == Category.id, Post.is_published == True)
+        ).group_by(Category.id).order_by(Category.id).all()
+
+        recent_rows = db.query(
+            Post.id, Post.title, Post.slug, Post.created_at
+        ).filter(
+            Post.is_published == True
+        ).order_by(Post.created_at.desc()).limit(SIDEBAR_RECENT_POSTS).all()
+
+        tag_rows = db.query(
+            Tag.id,
+            Tag.name,
+            Tag.slug,
+            func.count(PostTag.id).label("post_count")
+        ).join(PostTag, PostTag.tag_id == Tag.id).join(
+            Post, and_(Post.id == PostTag.post_id, Post.is_published == True)
+        ).group_by(Tag.id).order_by(func.count(PostTag.id).desc(), Tag.name).all()
+
+        return {
+            "categories": [{
+                "id": row.id,
+                "name": row.name,
+                "slug": row.slug,
+                "description": row.description,
+                "post_count": row.post_count
+            } for row in category_rows],
+            "popular_posts": [{
+                "id": row.id,
+                "title": row.title,
+                "slug": row.slug,
+                "created_at": row.created_at
+            } for row in recent_rows],
+            "tags": [{
+                "id": row.id,
+                "name": row.name,
+                "slug": row.slug,
+                "post_count": row.post_count
+            } for row in tag_rows]
+        }
+
+
+# Singleton instance
+sidebar_provider = SidebarProvider()
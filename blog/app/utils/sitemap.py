@@ -0,0 +1,272 @@
+"""
+Sharded, streamed and disk-cached XML sitemaps.
+
+`/sitemap.xml` is a sitemap index pointing at one shard for static pages,
+categories, pages and tags plus one shard per `SITEMAP_SHARD_SIZE` block of
+post ids (the sitemap protocol allows at most 50,000 URLs per file). Each
+shard has a fingerprint built from the rows in its window (count, max id,
+newest `updated_at`); rendered shards are cached under `SITEMAP_CACHE_DIR`
+keyed by that fingerprint, so only shards whose window changed are
+regenerated. Output is produced by generators and written to the cache
+while it is streamed, so memory use does not grow with the archive.
+"""
+
+import glob
+import hashlib
+import os
+import re
+import uuid
+import zlib
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, List, Optional
+from xml.sax.saxutils import escape
+
+from sqlalchemy import or_, text
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.models.models import Post, Category, Page, Tag
+
+# Protocol limit per sitemap file
+MAX_URLS_PER_SHARD = 50000
+
+SITEMAP_SHARD_SIZE = min(int(os.getenv("SITEMAP_SHARD_SIZE", str(MAX_URLS_PER_SHARD))), MAX_URLS_PER_SHARD)
+SITEMAP_CACHE_DIR = os.getenv("SITEMAP_CACHE_DIR", "cache/sitemaps")
+SITEMAP_GZIP = os.getenv("SITEMAP_GZIP", "false").lower() in ("1", "true", "yes")
+
+PAGES_SHARD = "pages"
+CHUNK_SIZE = 64 * 1024
+YIELD_PER = 1000
+
+_POST_SHARD_NAME = re.compile(r"posts-(\d+)")
+
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+_URLSET_OPEN = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+_INDEX_OPEN = '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+
+
+class SitemapShard:
+    def __init__(self, name: str, fingerprint: str, lastmod: Optional[str]):
+        self.name = name
+        self.fingerprint = fingerprint
+        self.lastmod = lastmod
+
+
+def _date(value) -> Optional[str]:
+    """YYYY-MM-DD from a datetime or an SQLite timestamp string"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d')
+    return str(value)[:10]
+
+
+def _url(loc: str, changefreq: str, priority: str, lastmod=None) -> str:
+    lastmod_tag = f"<lastmod>{_date(lastmod)}</lastmod>" if lastmod else ""
+    return (f"<url><loc>{escape(loc)}</loc>{lastmod_tag}"
+            f"<changefreq>{changefreq}</changefreq><priority>{priority}</priority></url>\n")
+
+
+def _batched(pieces: Iterable[str]) -> Iterator[bytes]:
+    """Join many small XML fragments into CHUNK_SIZE-ish byte chunks"""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer).encode("utf-8")
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _read_file(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+class SitemapGenerator:
+    def __init__(self,
+                 cache_dir: str = SITEMAP_CACHE_DIR,
+                 shard_size: int = SITEMAP_SHARD_SIZE,
+                 gzip_enabled: bool = SITEMAP_GZIP):
+        self.cache_dir = cache_dir
+        self.shard_size = shard_size
+        self.gzip_enabled = gzip_enabled
+
+    # Shard discovery
+
+    def list_shards(self, db: Session) -> List[SitemapShard]:
+        """The pages shard plus one shard per non-empty post id window"""
+        shards = [self._pages_shard(db)]
+        rows = db.execute(
+            text("SELECT id / :size AS bucket, COUNT(*) AS total, MAX(id) AS max_id, "
+                 "MAX(COALESCE(updated_at, created_at)) AS lastmod "
+                 "FROM posts WHERE is_published = 1 AND is_deleted IS NOT 1 "
+                 "GROUP BY bucket ORDER BY bucket"),
+            {"size": self.shard_size}
+        ).all()
+        for row in rows:
+            shards.append(SitemapShard(
+                name=f"posts-{row.bucket}",
+                fingerprint=f"{row.total}:{row.max_id}:{row.lastmod}",
+                lastmod=_date(row.lastmod)
+            ))
+        return shards
+
+    def get_shard(self, db: Session, name: str) -> Optional[SitemapShard]:
+        """Fingerprint a single shard by name, or None if it does not exist"""
+        if name == PAGES_SHARD:
+            return self._pages_shard(db)
+
+        match = _POST_SHARD_NAME.fullmatch(name)
+        if not match:
+            return None
+        bucket = int(match.group(1))
+        row = db.execute(
+            text("SELECT COUNT(*) AS total, MAX(id) AS max_id, "
+                 "MAX(COALESCE(updated_at, created_at)) AS lastmod "
+                 "FROM posts WHERE id >= :low AND id < :high "
+                 "AND is_published = 1 AND is_deleted IS NOT 1"),
+            {"low": bucket * self.shard_size, "high": (bucket + 1) * self.shard_size}
+        ).first()
+        if not row.total:
+            return None
+        return SitemapShard(name, f"{row.total}:{row.max_id}:{row.lastmod}", _date(row.lastmod))
+
+    def _pages_shard(self, db: Session) -> SitemapShard:
+        row = db.execute(text(
+            "SELECT "
+            "(SELECT group_concat(id || ':' || slug, '|') FROM categories) AS categories, "
+            "(SELECT group_concat(id || ':' || slug, '|') FROM tags) AS tags, "
+            "(SELECT COUNT(*) FROM pages WHERE is_published = 1 AND is_deleted IS NOT 1) AS page_count, "
+            "(SELECT MAX(COALESCE(updated_at, created_at)) FROM pages "
+            " WHERE is_published = 1 AND is_deleted IS NOT 1) AS lastmod"
+        )).first()
+        fingerprint = hashlib.sha1(
+            f"{row.categories}\x1f{row.tags}\x1f{row.page_count}\x1f{row.lastmod}".encode("utf-8")
+        ).hexdigest()
+        return SitemapShard(PAGES_SHARD, fingerprint, _date(row.lastmod))
+
+    # Rendering
+
+    def index_chunks(self, shards: List[SitemapShard], base_url: str) -> Iterator[bytes]:
+        extension = ".xml.gz" if self.gzip_enabled else ".xml"
+
+        def pieces():
+            yield _XML_HEADER
+            yield _INDEX_OPEN
+            for shard in shards:
+                lastmod_tag = f"<lastmod>{shard.lastmod}</lastmod>" if shard.lastmod else ""
+                yield f"<sitemap><loc>{escape(base_url)}/sitemap-{shard.name}{extension}</loc>{lastmod_tag}</sitemap>\n"
+            yield "</sitemapindex>\n"
+
+        return _batched(pieces())
+
+    def shard_chunks(self, shard: SitemapShard, base_url: str, gzipped: bool = False) -> Iterator[bytes]:
+        """Stream a shard from the disk cache, rendering (and caching) it first if its window changed"""
+        path = self._cache_path(shard, base_url, gzipped)
+        if gzipped:
+            return self._cached(path, shard, lambda: gzip_chunks(self.shard_chunks(shard, base_url)))
+        return self._cached(path, shard, lambda: _batched(self._render(shard, base_url)))
+
+    def _render(self, shard: SitemapShard, base_url: str) -> Iterator[str]:
+        db = SessionLocal()
+        try:
+            yield _XML_HEADER
+            yield _URLSET_OPEN
+            if shard.name == PAGES_SHARD:
+                yield from self._render_pages(db, base_url)
+            else:
+                bucket = int(_POST_SHARD_NAME.fullmatch(shard.name).group(1))
+                yield from self._render_posts(db, base_url, bucket)
+            yield "</urlset>\n"
+        finally:
+            db.close()
+
+    def _render_pages(self, db: Session, base_url: str) -> Iterator[str]:
+        yield _url(f"{base_url}/", "daily", "1.0")
+        yield _url(f"{base_url}/about", "monthly", "0.8")
+        yield _url(f"{base_url}/categories", "weekly", "0.8")
+
+        for row in db.query(Category.slug).order_by(Category.id).yield_per(YIELD_PER):
+            yield _url(f"{base_url}/category/{row.slug}", "weekly", "0.7")
+
+        pages = db.query(Page.slug, Page.updated_at, Page.created_at).filter(
+            Page.is_published == True,
+            or_(Page.is_deleted == False, Page.is_deleted == None)
+        ).order_by(Page.id).yield_per(YIELD_PER)
+        for row in pages:
+            yield _url(f"{base_url}/{row.slug}", "monthly", "0.6", row.updated_at or row.created_at)
+
+        for row in db.query(Tag.slug).order_by(Tag.id).yield_per(YIELD_PER):
+            yield _url(f"{base_url}/tag/{row.slug}", "weekly", "0.5")
+
+    def _render_posts(self, db: Session, base_url: str, bucket: int) -> Iterator[str]:
+        posts = db.query(Post.slug, Post.updated_at, Post.created_at).filter(
+            Post.id >= bucket * self.shard_size,
+            Post.id < (bucket + 1) * self.shard_size,
+            Post.is_published == True,
+            or_(Post.is_deleted == False, Post.is_deleted == None)
+        ).order_by(Post.id).yield_per(YIELD_PER)
+        for row in posts:
+            yield _url(f"{base_url}/post/{row.slug}", "monthly", "0.9", row.updated_at or row.created_at)
+
+    # Disk cache
+
+    def _cache_path(self, shard: SitemapShard, base_url: str, gzipped: bool) -> str:
+        key = hashlib.sha1(f"{base_url}\x1f{shard.fingerprint}".encode("utf-8")).hexdigest()[:16]
+        extension = ".xml.gz" if gzipped else ".xml"
+        return os.path.join(self.cache_dir, f"{shard.name}-{key}{extension}")
+
+    def _cached(self, path: str, shard: SitemapShard, produce: Callable[[], Iterator[bytes]]) -> Iterator[bytes]:
+        if os.path.exists(path):
+            yield from _read_file(path)
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        completed = False
+        try:
+            with open(temp_path, "wb") as f:
+                for chunk in produce():
+                    f.write(chunk)
+                    yield chunk
+            os.replace(temp_path, path)
+            completed = True
+        finally:
+            # Client disconnects close the generator mid-way; never publish a partial file
+            if not completed and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        if completed:
+            self._prune(shard, path)
+
+    def _prune(self, shard: SitemapShard, current_path: str) -> None:
+        """Remove files rendered for older fingerprints of this shard"""
+        extension = ".xml.gz" if current_path.endswith(".gz") else ".xml"
+        for path in glob.glob(os.path.join(self.cache_dir, f"{shard.name}-*{extension}")):
+            if path == current_path:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# Singleton instance
+sitemap_generator = SitemapGenerator()
@@ -0,0 +1,161 @@
+"""
+In-memory prefix index for search suggestions.
+
+Published post titles, category names and tag names are folded
+(Turkish-aware lowercase, diacritics removed) and stored as a sorted array
+of word-start keys, so `/api/search/suggestions` is answered with a bisect
+instead of LIKE scans. Admin writes update entries incrementally; a periodic
+reload (`SUGGESTION_INDEX_TTL`) picks up changes made by other workers.
+"""
+
+import bisect
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from app.models.models import Post, Category, Tag
+
+SUGGESTION_INDEX_TTL = float(os.getenv("SUGGESTION_INDEX_TTL", "300"))
+
+# Per-type limits, in the order suggestions are returned
+SUGGESTION_LIMITS = (("post", 5), ("category", 3), ("tag", 3))
+MAX_SUGGESTIONS = 8
+
+_WORD_START = re.compile(r"\w+", re.UNICODE)
+
+
+def fold_text(value: str) -> str:
+    """Lowercase with Turkish I/İ rules, then strip diacritics and dotless i"""
+    value = (value or "").replace("I", "ı").replace("İ", "i").lower()
+    value = value.replace("ı", "i")
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _word_keys(text: str) -> List[str]:
+    """Every suffix of the folded text that begins at a word boundary"""
+    folded = fold_text(text)
+    return sorted({folded[match.start():] for match in _WORD_START.finditer(folded)})
+
+
+class SuggestionIndex:
+    def __init__(self, ttl: float = SUGGESTION_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._keys: List[Tuple[str, str, int]] = []
+        self._entries: Dict[Tuple[str, int], str] = {}
+        self._loaded_at: Optional[float] = None
+
+    def suggest(self, db: Session, query: str) -> List[dict]:
+        """Return up to MAX_SUGGESTIONS matches whose words start with `query`"""
+        self._ensure_loaded(db)
+
+        prefix = fold_text(query.strip())
+        if not prefix:
+            return []
+
+        wanted = dict(SUGGESTION_LIMITS)
+        found: Dict[str, List[str]] = {kind: [] for kind in wanted}
+        seen = set()
+
+        keys = self._keys
+        position = bisect.bisect_left(keys, (prefix,))
+        while position < len(keys):
+            key, kind, entry_id = keys[position]
+            if not key.startswith(prefix):
+                break
+            position += 1
+            if (kind, entry_id) in seen or len(found[kind]) >= wanted[kind]:
+                continue
+            text = self._entries.get((kind, entry_id))
+            if text is None:
+                continue
+            seen.add((kind, entry_id))
+            found[kind].append(text)
+            if all(len(found[k]) >= limit for k, limit in SUGGESTION_LIMITS):
+                break
+
+        suggestions = []
+        for kind, _ in SUGGESTION_LIMITS:
+            suggestions.extend({"text": text, "type": kind} for text in found[kind])
+        return suggestions[:MAX_SUGGESTIONS]
+
+    def upsert(self, kind: str, entry_id: int, text: Optional[str]) -> None:
+        """Add or replace one entry; a falsy text removes it"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self._remove_locked(kind, entry_id)
+            if text:
+                self._add_locked(kind, entry_id, text)
+
+    def remove(self, kind: str, entry_id: int) -> None:
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self._remove_locked(kind, entry_id)
+
+    def sync_post(self, post: Post) -> None:
+        """Index a post title only while it is published and not deleted"""
+        visible = post.is_published and not post.is_deleted
+        self.upsert("post", post.id, post.title if visible else None)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_loaded(self, db: Session) -> None:
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.ttl:
+            return
+
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return
+
+            entries: Dict[Tuple[str, int], str] = {}
+            for row in db.query(Post.id, Post.title).filter(
+                Post.is_published == True,
+                or_(Post.is_deleted == False, Post.is_deleted == None)
+            ).all():
+                entries[("post", row.id)] = row.title
+            for row in db.query(Category.id, Category.name).all():
+                entries[("category", row.id)] = row.name
+            for row in db.query(Tag.id, Tag.name).all():
+                entries[("tag", row.id)] = row.name
+
+            keys = []
+            for (kind, entry_id), text in entries.items():
+                keys.extend((key, kind, entry_id) for key in _word_keys(text))
+            keys.sort()
+
+            self._entries = entries
+            self._keys = keys
+            self._loaded_at = time.monotonic()
+
+    def _add_locked(self, kind: str, entry_id: int, text: str) -> None:
+        self._entries[(kind, entry_id)] = text
+        keys = list(self._keys)
+        for key in _word_keys(text):
+            bisect.insort(keys, (key, kind, entry_id))
+        self._keys = keys
+
+    def _remove_locked(self, kind: str, entry_id: int) -> None:
+        text = self._entries.pop((kind, entry_id), None)
+        if text is None:
+            return
+        keys = list(self._keys)
+        for key in _word_keys(text):
+            position = bisect.bisect_left(keys, (key, kind, entry_id))
+            if position < len(keys) and keys[position] == (key, kind, entry_id):
+                del keys[position]
+        self._keys = keys
+
+
+# Singleton instance
+suggestion_index = SuggestionIndex()
@@ -0,0 +1,116 @@
+"""
+Streaming upload staging.
+
+Uploaded files are copied in `UPLOAD_CHUNK_SIZE` chunks to a hidden temp
+file next to their final location. The SHA-256 digest and the byte count
+are computed while the chunks are copied, and the size limit is enforced
+mid-stream, so an upload never has to be held in memory. `commit` renames
+the temp file into place with os.replace (atomic on the same filesystem),
+so readers never see a half-written media file.
+"""
+
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from typing import Optional, Tuple
+
+import aiofiles
+from fastapi import UploadFile
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+TEMP_PREFIX = ".upload-"
+TEMP_SUFFIX = ".part"
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds {limit} bytes")
+        self.limit = limit
+
+
+class StagedUpload:
+    def __init__(self, path: Path, size: int, sha256: str):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.committed = False
+
+    def mark_rewritten(self, size: int, sha256: str) -> None:
+        """Record the size and digest after the staged file was rewritten in place (e.g. optimized)"""
+        self.size = size
+        self.sha256 = sha256
+
+    def commit(self, destination: Path) -> Path:
+        """Atomically move the staged file to `destination`"""
+        os.replace(self.path, destination)
+        self.path = destination
+        self.committed = True
+        return destination
+
+    def discard(self) -> None:
+        """Remove the temp file unless it was committed"""
+        if not self.committed:
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+async def stage_upload(upload: UploadFile, directory: Path, max_size: int, chunk_size: int = UPLOAD_CHUNK_SIZE) -> StagedUpload:
+    """Stream `upload` into a temp file in `directory`, hashing as it goes
+
+    Raises UploadTooLarge (after removing the partial file) once more than
+    `max_size` bytes have been read.
+    """
+    temp_path = directory / f"{TEMP_PREFIX}{uuid.uuid4().hex}{TEMP_SUFFIX}"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as out:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(max_size)
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        try:
+            temp_path.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+    return StagedUpload(temp_path, size, digest.hexdigest())
+
+
+def stage_bytes(content: bytes, directory: Path) -> StagedUpload:
+    """Write in-memory content (e.g. a download) to a temp file in `directory`, like stage_upload"""
+    temp_path = directory / f"{TEMP_PREFIX}{uuid.uuid4().hex}{TEMP_SUFFIX}"
+    try:
+        temp_path.write_bytes(content)
+    except BaseException:
+        try:
+            temp_path.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+    return StagedUpload(temp_path, len(content), hashlib.sha256(content).hexdigest())
+
+
+async def hash_upload(upload: UploadFile, max_size: Optional[int] = None, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Tuple[str, int]:
+    """(SHA-256 hex digest, size) of an upload without keeping or storing it"""
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            raise UploadTooLarge(max_size)
+        digest.update(chunk)
+    return digest.hexdigest(), size
@@ -0,0 +1,49 @@
+"""
+Run EXPLAIN QUERY PLAN over the app's hot queries and flag full table scans
+
+Usage: python audit_indexes.py [--verbose]
+Exits with status 1 when any query needs a full scan, so it can run in CI.
+"""
+
+import sys
+
+from app.core.database import SessionLocal, engine
+from app.models import models
+from app.utils.index_audit import run_audit, summarize
+
+def audit_indexes(verbose: bool = False):
+    """Print the plan verdict for each catalog query"""
+    models.Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        results = run_audit(db)
+    finally:
+        db.close()
+
+    for result in results:
+        if result.error:
+            status = "ERROR"
+        elif result.full_scans:
+            status = "SCAN "
+        else:
+            status = "OK   "
+        note = ""
+        if result.full_scans:
+            note = f" full scan of {', '.join(result.full_scans)}"
+        if result.temp_sorts:
+            note += " (temp sort)"
+        print(f"[{status}] {result.name}{note}")
+
+        if result.error:
+            print(f"        {result.error}")
+        elif verbose or not result.ok:
+            for detail in result.plan:
+                print(f"        {detail}")
+
+    failing, sorting = summarize(results)
+    print(f"\n{len(results)} queries audited, {failing} with full scans or errors, {sorting} with temp sorts")
+    return failing == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if audit_indexes(verbose="--verbose" in sys.argv) else 1)
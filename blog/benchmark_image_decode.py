@@ -0,0 +1,107 @@
+"""
+Compare the ImageOptimizer fast decode path (draft + reducing_gap) with the
+full-resolution path on speed, decoded size and output quality
+
+Usage: python benchmark_image_decode.py [--runs N] [image ...]
+Without images a 24MP test JPEG (EXIF orientation 6) is generated.
+Quality is the PSNR of the fast output against the full-resolution output;
+above ~40 dB the difference is not visible.
+"""
+
+import argparse
+import io
+import math
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, ImageChops, ImageStat
+
+from app.utils.image_optimizer import ImageOptimizer, oriented_size
+
+def optimize_job(optimizer, path, out_dir):
+    return optimizer.optimize_image(path, target_format="JPEG")[0]
+
+def variants_job(optimizer, path, out_dir):
+    variants = optimizer.create_width_variants(path, out_dir, (320, 640, 960, 1280, 1920))
+    return (Path(out_dir) / variants[0]["filename"]).read_bytes() if variants else b""
+
+def thumbnail_job(optimizer, path, out_dir):
+    out_path = Path(out_dir) / "thumb.jpg"
+    optimizer.render_size(path, out_path, 300, 300, "JPEG")
+    return out_path.read_bytes()
+
+# Each job takes (optimizer, source path, output dir) and returns the bytes to compare
+JOBS = [
+    ("optimize 1920x1080", optimize_job),
+    ("width variants", variants_job),
+    ("thumbnail 300x300", thumbnail_job),
+]
+
+def make_test_image(directory: str) -> str:
+    """6000x4000 photo-like JPEG stored sideways (EXIF orientation 6)"""
+    size = (6000, 4000)
+    texture = Image.effect_noise((600, 400), 64).resize(size, Image.Resampling.BICUBIC)
+    grain = Image.effect_noise(size, 12)
+    gradient = Image.linear_gradient("L").resize(size)
+    image = Image.merge("RGB", (gradient, texture, ImageChops.add(texture, grain, scale=2.0)))
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    path = os.path.join(directory, "test-24mp.jpg")
+    image.save(path, "JPEG", quality=92, exif=exif)
+    return path
+
+def decoded_megabytes(optimizer: ImageOptimizer, path: str, target) -> float:
+    """Size of the pixel buffer the decoder produces for `target`"""
+    with Image.open(path) as source:
+        image = optimizer._decode(source, target)
+        image.load()
+        return image.width * image.height * len(image.getbands()) / (1024 * 1024)
+
+def psnr(reference: bytes, candidate: bytes) -> float:
+    with Image.open(io.BytesIO(reference)) as a, Image.open(io.BytesIO(candidate)) as b:
+        if a.size != b.size:
+            return float("nan")
+        diff = ImageChops.difference(a.convert("RGB"), b.convert("RGB"))
+        mse = sum(rms ** 2 for rms in ImageStat.Stat(diff).rms) / 3
+    return float("inf") if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+def best_time(job, optimizer, path, out_dir, runs: int):
+    best, output = None, b""
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = job(optimizer, path, out_dir)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+def benchmark(paths, runs: int):
+    slow = ImageOptimizer(fast_decode=False)
+    fast = ImageOptimizer(fast_decode=True)
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        if not paths:
+            paths = [make_test_image(out_dir)]
+
+        for path in paths:
+            with Image.open(path) as source:
+                width, height = oriented_size(source)
+            target = slow._calculate_new_dimensions(width, height)
+            print(f"\n{Path(path).name}: {width}x{height}, {os.path.getsize(path) / 1024:.0f} KB")
+            print(f"  decoded for {target[0]}x{target[1]}: "
+                  f"full {decoded_megabytes(slow, path, target):.1f} MB, fast {decoded_megabytes(fast, path, target):.1f} MB")
+
+            for label, job in JOBS:
+                slow_time, slow_output = best_time(job, slow, path, out_dir, runs)
+                fast_time, fast_output = best_time(job, fast, path, out_dir, runs)
+                print(f"  {label:<20} full {slow_time * 1000:7.1f} ms  fast {fast_time * 1000:7.1f} ms  "
+                      f"({slow_time / fast_time:4.1f}x)  PSNR {psnr(slow_output, fast_output):5.1f} dB  "
+                      f"size {len(slow_output) / 1024:.0f} -> {len(fast_output) / 1024:.0f} KB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("images", nargs="*")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    benchmark(args.images, max(1, args.runs))
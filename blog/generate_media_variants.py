@@ -0,0 +1,51 @@
+"""
+Generate responsive width variants (and their WebP/AVIF siblings) for images
+uploaded before variants existed
+
+Usage: python generate_media_variants.py
+Safe to re-run: widths that already have a variant are skipped; siblings are re-encoded.
+"""
+
+from pathlib import Path
+
+from app.core.database import SessionLocal, engine
+from app.models import models
+from app.models.models import Media
+from app.utils.media_variants import generate_variants_sync, supports_variants, MEDIA_VARIANT_WIDTHS, VARIANT_DIR
+from app.utils.modern_formats import sibling_encoder, MODERN_IMAGE_FORMATS
+
+def generate_media_variants():
+    """Create missing variants for every stored JPEG/PNG/WebP"""
+    models.Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        media_files = db.query(Media).order_by(Media.id).all()
+        created = 0
+        siblings = 0
+        for media in media_files:
+            if not supports_variants(media):
+                continue
+            try:
+                rows = generate_variants_sync(media, db)
+            except Exception as e:
+                db.rollback()
+                print(f"[SKIP] {media.filename}: {e}")
+                continue
+            created += len(rows)
+            if rows:
+                print(f"[OK]   {media.filename}: {', '.join(str(row.width) for row in rows)}")
+
+            for path in [Path(media.file_path)] + [VARIANT_DIR / variant.filename for variant in media.variants]:
+                try:
+                    siblings += len(sibling_encoder.encode_sync(path))
+                except Exception as e:
+                    print(f"[SKIP] {path.name} siblings: {e}")
+
+        print(f"\n{created} variants created (widths {', '.join(map(str, MEDIA_VARIANT_WIDTHS))})")
+        print(f"{siblings} WebP/AVIF siblings written ({', '.join(MODERN_IMAGE_FORMATS) or 'none available'})")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    generate_media_variants()
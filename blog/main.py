@@ -1,23 +1,47 @@
+import os
+import sys
+
+if __name__ == "__main__":
+    # `python main.py` hands over to uvicorn's own entry point before the app is built:
+    # processes spawned later (uvicorn's reload server, the image workers) re-run the
+    # launching script as __mp_main__, and each would rebuild the app, create tables and
+    # configure the AI client again. With uvicorn as __main__ they import none of this file.
+    os.execv(sys.executable, [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--app-dir", os.path.dirname(os.path.abspath(__file__)),
+        "--host", "127.0.0.1", "--port", "8000", "--reload"
+    ])
+
 from fastapi import FastAPI, Request, Depends, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from fastapi.exceptions import RequestValidationError
-from sqlalchemy.orm import Session
-from app.core.database import engine, get_db
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import engine, async_engine, get_async_db
+from app.core.settings_cache import settings_cache
+from app.core.password_pool import password_pool
 from app.models import models
-from app.routers import auth, blog, admin, media, users
+from app.routers import auth, blog, admin, media, users, images
 from app.routers.comments import get_comments_routers
 from app.routers.search import get_search_routers
+from app.utils.search_engine import search_engine
+from app.utils.like_counter import like_counter
+from app.utils.db_maintenance import db_maintenance
+from app.utils.media_scanner import media_scanner
+from app.utils.page_cache import page_cache
+from app.utils.image_workers import image_processor
+from app.utils.modern_formats import NegotiatingStaticFiles
+from app.utils.http_cache import site_version, make_etag, viewer_key, not_modified, set_validators, finalize
 from app.utils.ai_content import ai_generator  # Ensure AI is initialized at startup
-import os
-
-models.Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="AI Blog", version="1.0.0")
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Uploaded images are served as WebP/AVIF when the client accepts them
+app.mount("/uploads", NegotiatingStaticFiles(directory="uploads"), name="uploads")
 
 templates = Jinja2Templates(directory="templates")
 
@@ -28,6 +52,13 @@ import json
 templates.env.filters['strip_html'] = strip_html_tags
 templates.env.filters['excerpt'] = get_excerpt
 templates.env.filters['from_json'] = lambda x: json.loads(x) if x else []
+
+# srcset helper for every template environment that renders uploaded images
+from app.routers import search as search_router
+from app.utils.media_variants import register_template_helpers, variant_index
+from app.utils.perceptual_hash import perceptual_index
+for image_templates in (templates, blog.templates, search_router.templates, users.templates, media.templates):
+    register_template_helpers(image_templates)
 # Timezone filter - requires database session, will be handled in templates
 
 # Global template context processor - simplified
@@ -45,27 +76,35 @@ async def add_site_settings_to_templates(request, call_next):
 original_template_response = templates.TemplateResponse
 
 def template_response_with_settings(name: str, context: dict, status_code: int = 200, **kwargs):
-    # Add site settings if not already present and if db session available
+    # Add site settings from the process-wide snapshot if not already present
     if "site_settings" not in context and "request" in context:
-        try:
-            from app.core.database import SessionLocal
-            from app.models.models import Settings
-            db = SessionLocal()
-            try:
-                context["site_settings"] = db.query(Settings).first()
-            except Exception as e:
-                print(f"Error loading site settings: {e}")
-                context["site_settings"] = None
-            finally:
-                db.close()
-        except Exception as e:
-            print(f"Database connection error: {e}")
-            context["site_settings"] = None
+        context["site_settings"] = settings_cache.get()
     
     return original_template_response(name, context, status_code=status_code, **kwargs)
 
 templates.TemplateResponse = template_response_with_settings
 
+@app.on_event("startup")
+async def start_background_tasks():
+    models.Base.metadata.create_all(bind=engine)
+    search_engine.ensure_schema(engine)
+    like_counter.start()
+    db_maintenance.start()
+    media_scanner.start()
+    variant_index.start()
+    perceptual_index.start()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await like_counter.stop()
+    await db_maintenance.stop()
+    await media_scanner.stop()
+    await variant_index.stop()
+    await perceptual_index.stop()
+    await async_engine.dispose()
+    password_pool.shutdown()
+    image_processor.shutdown()
+
 # Router include order matters. Register admin-related routers BEFORE the
 # blog router that exposes a catch-all path like `/{slug}` to prevent
 # unintended matches such as `/admin` being treated as a page slug.
@@ -73,6 +112,7 @@ app.include_router(auth.router)
 app.include_router(admin.router)
 app.include_router(media.router)
 app.include_router(users.router)
+app.include_router(images.router)
 
 # Include search routers BEFORE blog router (important for /search route)
 search_routers = get_search_routers()
@@ -87,27 +127,46 @@ for router in comment_routers:
 # Blog router MUST be last due to catch-all /{slug} route
 app.include_router(blog.router)
 
-from app.core.auth import get_current_user_optional, get_admin_user
+from app.core.auth import get_current_user_optional, get_current_user_optional_async, get_admin_user
 from app.core.database import SessionLocal
 
 def get_template_context(request: Request, db: Session, current_user=None):
     """Get common template context including site settings"""
-    site_settings = db.query(models.Settings).first()
+    site_settings = settings_cache.get(db)
     context = {
         "request": request,
-        "site_settings": site_settings
+        "site_settings": site_settings,
+        "format_datetime": lambda dt, fmt="%d.%m.%Y %H:%M": format_datetime_for_site(dt, db, fmt) if dt else ""
     }
     if current_user is not None:
         context["current_user"] = current_user
     return context
 
 @app.get("/", response_class=HTMLResponse)
-async def homepage(request: Request, db: Session = Depends(get_db)):
-    posts = db.query(models.Post).filter(models.Post.is_published == True).order_by(models.Post.created_at.desc()).limit(10).all()
-    current_user = get_current_user_optional(request, db)
-    context = get_template_context(request, db, current_user)
+async def homepage(request: Request, db: AsyncSession = Depends(get_async_db)):
+    cached = page_cache.get(request)
+    if cached:
+        return finalize(request, cached)
+    
+    current_user = await get_current_user_optional_async(request, db)
+    site_token = await db.run_sync(site_version)
+    etag = make_etag("home", site_token, viewer_key(current_user))
+    unchanged = not_modified(request, etag, private=current_user is not None)
+    if unchanged:
+        return unchanged
+    
+    posts = (await db.scalars(
+        select(models.Post)
+        .options(selectinload(models.Post.author))
+        .where(models.Post.is_published == True)
+        .order_by(models.Post.created_at.desc())
+        .limit(10)
+    )).all()
+    context = await blog.get_template_context(request, db, current_user)
     context["posts"] = posts
-    return templates.TemplateResponse("blog/index.html", context)
+    response = templates.TemplateResponse("blog/index.html", context)
+    set_validators(response, etag, private=current_user is not None)
+    return page_cache.store(request, response, ["home"])
 
 
 
@@ -135,7 +194,3 @@ async def internal_error_handler(request: Request, exc: Exception):
         return templates.TemplateResponse("500.html", {"request": request}, status_code=500)
     finally:
         db.close()
-
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""
+Migration script to add the composite indexes declared in the models to an
+existing database and refresh the query planner statistics
+"""
+
+import sqlite3
+from pathlib import Path
+
+# (index name, table, columns) - keep in sync with __table_args__ in app/models/models.py
+INDEXES = [
+    ("ix_posts_published_created", "posts", ("is_published", "created_at")),
+    ("ix_posts_category_published_created", "posts", ("category_id", "is_published", "created_at")),
+    ("ix_posts_author_created", "posts", ("author_id", "created_at")),
+    ("ix_post_tags_post_tag", "post_tags", ("post_id", "tag_id")),
+    ("ix_post_tags_tag_post", "post_tags", ("tag_id", "post_id")),
+    ("ix_comments_post_thread", "comments", ("post_id", "is_approved", "parent_id", "created_at")),
+    ("ix_comments_parent_approved", "comments", ("parent_id", "is_approved")),
+    ("ix_comments_approved_created", "comments", ("is_approved", "created_at")),
+    ("ix_comments_user_id", "comments", ("user_id",)),
+    ("ix_post_likes_post_user", "post_likes", ("post_id", "user_id")),
+    ("ix_media_folder_created", "media", ("folder_id", "created_at")),
+    ("ix_media_created", "media", ("created_at",)),
+    ("ix_media_file_hash", "media", ("file_hash",)),
+    ("ix_media_file_size", "media", ("file_size",)),
+    ("ix_media_folder_size", "media", ("folder_id", "file_size")),
+    ("ix_media_missing", "media", ("is_missing",)),
+    ("ix_media_blob", "media", ("blob_id",)),
+    ("ix_media_blobs_sha256", "media_blobs", ("sha256",)),
+    ("ix_media_blobs_source_sha256", "media_blobs", ("source_sha256",)),
+    ("ix_ai_usage_user_type", "ai_usage", ("user_id", "usage_type")),
+    ("ix_ai_usage_user_created", "ai_usage", ("user_id", "created_at")),
+]
+
+def migrate_indexes():
+    """Create missing indexes and run ANALYZE"""
+
+    db_path = Path("blog.db")
+    if not db_path.exists():
+        print("Database file not found!")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        tables = {row[0] for row in cursor.fetchall()}
+
+        for name, table, columns in INDEXES:
+            if table not in tables:
+                print(f"Table '{table}' not found, skipping {name}")
+                continue
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+            print(f"Ensured index {name} on {table}({', '.join(columns)})")
+
+        # Give the planner row estimates for the new indexes
+        cursor.execute("ANALYZE")
+        print("Updated planner statistics")
+
+        conn.commit()
+        conn.close()
+
+        print("Migration completed successfully!")
+        return True
+
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    migrate_indexes()
@@ -0,0 +1,105 @@
+"""
+Migration script to add the content-addressed blob store (media_blobs table,
+media.blob_id) and register existing media files as blobs
+
+Existing files are not moved: posts link to their URLs. Each stored file
+becomes a blob at its current path, referenced by the rows that use it, so
+deletes go through reference counting from now on. New uploads are stored
+under uploads/media/blobs/ and share blobs with identical content.
+"""
+
+import hashlib
+import os
+import sqlite3
+from pathlib import Path
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def migrate_media_blobs():
+    """Create media_blobs, add media.blob_id and backfill one blob per stored file"""
+
+    db_path = Path("blog.db")
+    if not db_path.exists():
+        print("Database file not found!")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS media_blobs (
+                id INTEGER NOT NULL PRIMARY KEY,
+                sha256 VARCHAR(64) NOT NULL,
+                source_sha256 VARCHAR(64),
+                path VARCHAR(300) NOT NULL UNIQUE,
+                file_size INTEGER NOT NULL,
+                mime_type VARCHAR(100) NOT NULL,
+                width INTEGER,
+                height INTEGER,
+                ref_count INTEGER NOT NULL DEFAULT 1,
+                created_at DATETIME DEFAULT (CURRENT_TIMESTAMP)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_media_blobs_id ON media_blobs (id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_media_blobs_sha256 ON media_blobs (sha256)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_media_blobs_source_sha256 ON media_blobs (source_sha256)")
+        print("Ensured media_blobs table")
+
+        cursor.execute("PRAGMA table_info(media)")
+        columns = [column[1] for column in cursor.fetchall()]
+
+        if 'blob_id' not in columns:
+            cursor.execute("ALTER TABLE media ADD COLUMN blob_id INTEGER REFERENCES media_blobs (id)")
+            print("Added 'blob_id' column to media table")
+        else:
+            print("'blob_id' column already exists")
+
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_media_blob ON media (blob_id)")
+        print("Ensured index ix_media_blob")
+
+        cursor.execute("""
+            SELECT file_path, MIN(file_hash), MIN(file_size), MIN(mime_type), MIN(width), MIN(height), COUNT(*)
+            FROM media WHERE blob_id IS NULL GROUP BY file_path
+        """)
+        registered = 0
+        skipped = 0
+        for file_path, file_hash, file_size, mime_type, width, height, references in cursor.fetchall():
+            if not os.path.exists(file_path):
+                # Rows without a file keep owning their (missing) path
+                skipped += 1
+                continue
+            sha256 = file_hash or file_sha256(file_path)
+            cursor.execute("SELECT id FROM media_blobs WHERE path = ?", (file_path,))
+            existing = cursor.fetchone()
+            if existing:
+                blob_id = existing[0]
+                cursor.execute("UPDATE media_blobs SET ref_count = ref_count + ? WHERE id = ?", (references, blob_id))
+            else:
+                cursor.execute(
+                    "INSERT INTO media_blobs (sha256, path, file_size, mime_type, width, height, ref_count) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (sha256, file_path, file_size, mime_type, width, height, references)
+                )
+                blob_id = cursor.lastrowid
+            cursor.execute("UPDATE media SET blob_id = ? WHERE file_path = ? AND blob_id IS NULL", (blob_id, file_path))
+            registered += 1
+
+        print(f"Registered {registered} stored files as blobs ({skipped} missing files left as they are)")
+
+        conn.commit()
+        conn.close()
+
+        print("Migration completed successfully!")
+        return True
+
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    migrate_media_blobs()
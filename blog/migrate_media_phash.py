@@ -0,0 +1,66 @@
+"""
+Migration script to add the perceptual_hash field and compute it for
+existing images (used by near-duplicate detection on upload)
+"""
+
+import os
+import sqlite3
+from pathlib import Path
+
+from app.utils.image_optimizer import difference_hash
+
+def migrate_media_phash():
+    """Add perceptual_hash column and hash existing image files once per stored file"""
+
+    db_path = Path("blog.db")
+    if not db_path.exists():
+        print("Database file not found!")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("PRAGMA table_info(media)")
+        columns = [column[1] for column in cursor.fetchall()]
+
+        if 'perceptual_hash' not in columns:
+            cursor.execute("ALTER TABLE media ADD COLUMN perceptual_hash VARCHAR(16)")
+            print("Added 'perceptual_hash' column to media table")
+        else:
+            print("'perceptual_hash' column already exists")
+
+        # Rows sharing a blob share the file, so each file is decoded once
+        cursor.execute("""
+            SELECT DISTINCT file_path FROM media
+            WHERE perceptual_hash IS NULL AND mime_type LIKE 'image/%'
+        """)
+        file_paths = [row[0] for row in cursor.fetchall()]
+        print(f"Processing {len(file_paths)} image files...")
+
+        updated_count = 0
+        for file_path in file_paths:
+            if not os.path.exists(file_path):
+                continue
+            perceptual_hash = difference_hash(file_path)
+            if perceptual_hash:
+                cursor.execute(
+                    "UPDATE media SET perceptual_hash = ? WHERE file_path = ? AND perceptual_hash IS NULL",
+                    (perceptual_hash, file_path)
+                )
+                updated_count += 1
+
+        print(f"Hashed {updated_count} image files")
+
+        conn.commit()
+        conn.close()
+
+        print("Migration completed successfully!")
+        return True
+
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    migrate_media_phash()
@@ -0,0 +1,51 @@
+"""
+Migration script to add the is_missing flag to media (maintained by the
+background media scanner) and mark rows whose file is already gone
+"""
+
+import os
+import sqlite3
+from pathlib import Path
+
+def migrate_media_presence():
+    """Add is_missing column and its index, then flag missing files once"""
+
+    db_path = Path("blog.db")
+    if not db_path.exists():
+        print("Database file not found!")
+        return False
+
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("PRAGMA table_info(media)")
+        columns = [column[1] for column in cursor.fetchall()]
+
+        if 'is_missing' not in columns:
+            cursor.execute("ALTER TABLE media ADD COLUMN is_missing BOOLEAN NOT NULL DEFAULT 0")
+            print("Added 'is_missing' column to media table")
+        else:
+            print("'is_missing' column already exists")
+
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_media_missing ON media (is_missing)")
+        print("Ensured index ix_media_missing")
+
+        # Initial reconciliation; the app's scanner keeps it current afterwards
+        cursor.execute("SELECT id, file_path FROM media")
+        missing = [(media_id,) for media_id, file_path in cursor.fetchall() if not os.path.exists(file_path)]
+        cursor.executemany("UPDATE media SET is_missing = 1 WHERE id = ?", missing)
+        print(f"Marked {len(missing)} media rows as missing")
+
+        conn.commit()
+        conn.close()
+
+        print("Migration completed successfully!")
+        return True
+
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    migrate_media_presence()
@@ -0,0 +1,64 @@
+"""
+Migration script to add posts.like_count, enforce one like per user per post
+and backfill the counters from post_likes
+"""
+
+import sqlite3
+from pathlib import Path
+
+def migrate_post_like_counts():
+    """Add like_count column, dedupe likes, add unique index and recount"""
+    
+    db_path = Path("blog.db")
+    if not db_path.exists():
+        print("Database file not found!")
+        return False
+    
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        # Add like_count column if it doesn't exist
+        cursor.execute("PRAGMA table_info(posts)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        if 'like_count' not in columns:
+            cursor.execute("ALTER TABLE posts ADD COLUMN like_count INTEGER NOT NULL DEFAULT 0")
+            print("Added 'like_count' column to posts table")
+        else:
+            print("'like_count' column already exists")
+        
+        # Remove duplicate likes, keeping the oldest row per (user_id, post_id)
+        cursor.execute("""
+            DELETE FROM post_likes
+            WHERE id NOT IN (
+                SELECT MIN(id) FROM post_likes GROUP BY user_id, post_id
+            )
+        """)
+        print(f"Removed {cursor.rowcount} duplicate likes")
+        
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_post_likes_user_post ON post_likes(user_id, post_id)"
+        )
+        print("Created unique index on post_likes(user_id, post_id)")
+        
+        # Backfill counters
+        cursor.execute("""
+            UPDATE posts SET like_count = (
+                SELECT COUNT(*) FROM post_likes WHERE post_likes.post_id = posts.id
+            )
+        """)
+        print(f"Recounted likes for {cursor.rowcount} posts")
+        
+        conn.commit()
+        conn.close()
+        
+        print("Migration completed successfully!")
+        return True
+        
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    migrate_post_like_counts()
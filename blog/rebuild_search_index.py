@@ -0,0 +1,31 @@
+"""
+Rebuild the FTS5 post search index from the posts table
+"""
+
+from app.core.database import SessionLocal, engine
+from app.models import models
+from app.utils.search_engine import search_engine
+
+def rebuild_search_index():
+    """Recreate every posts_fts entry from existing posts"""
+    models.Base.metadata.create_all(bind=engine)
+    search_engine.ensure_schema(engine)
+    
+    if not search_engine.available:
+        print("FTS5 is not available for this database, nothing to rebuild")
+        return False
+    
+    db = SessionLocal()
+    try:
+        count = search_engine.rebuild(db)
+        print(f"Search index rebuilt with {count} posts")
+        return True
+    except Exception as e:
+        print(f"Rebuild failed: {e}")
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_search_index()
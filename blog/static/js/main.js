@@ -106,9 +106,9 @@ document.addEventListener('DOMContentLoaded', function() {
                             <div class="p-3 hover:bg-cream-50 cursor-pointer border-b border-cream-100 last:border-b-0 transition-smooth" 
                                  onclick="selectNavbarSuggestion('${suggestion.text}')">
                                 <div class="flex items-center gap-3">
-                                    <i data-lucide="${suggestion.type === 'post' ? 'file-text' : 'folder'}" class="w-4 h-4 text-brown-500"></i>
+                                    <i data-lucide="${suggestion.type === 'post' ? 'file-text' : suggestion.type === 'tag' ? 'tag' : 'folder'}" class="w-4 h-4 text-brown-500"></i>
                                     <span class="text-brown-900">${suggestion.text}</span>
-                                    <span class="text-xs text-brown-500 ml-auto">${suggestion.type === 'post' ? 'Yazı' : 'Kategori'}</span>
+                                    <span class="text-xs text-brown-500 ml-auto">${suggestion.type === 'post' ? 'Yazı' : suggestion.type === 'tag' ? 'Etiket' : 'Kategori'}</span>
                                 </div>
                             </div>
                         `).join('');